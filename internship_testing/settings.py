@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -27,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в профиль попали запросы всех остальных middleware
+    'testing.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +66,27 @@ DATABASES = {
     }
 }
 
+# Профиль SQLite: 'default' — как в Django, 'production' — для одновременных отправок
+# (WAL, busy timeout, BEGIN IMMEDIATE; см. testing/backends/sqlite3)
+SQLITE_PROFILE = config('SQLITE_PROFILE', default='default')
+if SQLITE_PROFILE == 'production':
+    SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=30, cast=int)
+    DATABASES['default'].update({
+        'ENGINE': 'testing.backends.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': SQLITE_BUSY_TIMEOUT * 1000,
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 2 ** 20, cast=int),
+                # Отрицательное значение — размер кэша страниц в КиБ
+                'cache_size': -config('SQLITE_CACHE_KIB', default=64 * 1024, cast=int),
+                'temp_store': 'MEMORY',
+            },
+        },
+    })
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -92,6 +116,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кэши: default — данные (payload вопросов и т.п.), template_fragments — HTML-фрагменты шаблонов.
+# Для нескольких процессов укажите общий бэкенд (Redis, Memcached, FileBased).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='default'),
+    },
+    'template_fragments': {
+        'BACKEND': config('FRAGMENT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('FRAGMENT_CACHE_LOCATION', default='template_fragments'),
+    },
+}
+
 AUTH_USER_MODEL = 'testing.User'
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap4"
@@ -99,7 +136,55 @@ CRISPY_TEMPLATE_PACK = "bootstrap4"
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Проверка отправленных попыток: 'sync' — в запросе, 'async' — через manage.py grading_worker,
+# 'group' — в запросе, но запись идёт через общий поток с групповым коммитом (testing/group_commit.py)
+GRADING_MODE = config('GRADING_MODE', default='sync')
+GROUP_COMMIT_MAX_BATCH = config('GROUP_COMMIT_MAX_BATCH', default=64, cast=int)
+GROUP_COMMIT_MAX_DELAY_MS = config('GROUP_COMMIT_MAX_DELAY_MS', default=5, cast=int)
+
+# Профилирование запросов (testing/profiling.py): Server-Timing и сводка на странице teacher/performance/
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=DEBUG, cast=bool)
+REQUEST_PROFILING_DUPLICATE_THRESHOLD = config('REQUEST_PROFILING_DUPLICATE_THRESHOLD', default=5, cast=int)
+
+# Уведомления о результатах (testing/notifications.py, manage.py notification_worker).
+# Лимиты — сообщений в секунду на процесс обработчика, 0 — без ограничения
+TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
+NOTIFICATION_TELEGRAM_SENDER = config('NOTIFICATION_TELEGRAM_SENDER',
+                                      default='testing.notifications.TelegramBotSender')
+NOTIFICATION_RATE_LIMITS = {
+    'email': config('NOTIFICATION_EMAIL_RATE', default=10, cast=float),
+    'telegram': config('NOTIFICATION_TELEGRAM_RATE', default=25, cast=float),
+}
+NOTIFICATION_MAX_TRIES = config('NOTIFICATION_MAX_TRIES', default=5, cast=int)
+NOTIFICATION_RETRY_BASE_DELAY = config('NOTIFICATION_RETRY_BASE_DELAY', default=30, cast=int)
+
+# Метрики Prometheus (testing/metrics.py) на /metrics/. Процессы сбрасывают значения в общий
+# файл SQLite METRICS_DB не реже раза в METRICS_FLUSH_INTERVAL секунд; у всех воркеров путь должен совпадать.
+# По умолчанию файл лежит во временном каталоге, а не в дереве исходников; тесты берут свой (testing/tests/runner.py)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DB = config('METRICS_DB', default=os.path.join(tempfile.gettempdir(), 'internship_testing_metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+TEST_RUNNER = 'testing.tests.runner.TestRunner'
+
 LOGIN_REDIRECT_URL = 'testing:teacher_dashboard'
 LOGOUT_REDIRECT_URL = 'testing:test_list'
 LOGIN_URL = 'testing:login'
 
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'testing': {
+            'handlers': ['console'],
+            'level': config('TESTING_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
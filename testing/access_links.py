@@ -0,0 +1,129 @@
+"""
+Разрешение ссылки доступа test/<access_link>/ в краткое описание теста.
+
+Два уровня кэша: LRU в памяти процесса (живёт ACCESS_LINK_LOCAL_TTL секунд,
+чтобы изменения из других процессов доходили без общей шины) и общий кэш
+Django. Неизвестные ссылки тоже кэшируются (отрицательный кэш), чтобы
+перебор ссылок ботами не доходил до БД. Сигналы Test и изменения
+счётчиков вопросов сбрасывают запись в общем кэше и в LRU своего процесса.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Test
+
+ACCESS_LINK_CACHE_TIMEOUT = 60 * 60
+ACCESS_LINK_NEGATIVE_TIMEOUT = 60
+ACCESS_LINK_LOCAL_TTL = 5
+ACCESS_LINK_LOCAL_SIZE = 1024
+
+# Отметка «ссылки нет» в кэшах (None в кэше Django неотличим от промаха)
+MISSING = 'missing'
+
+
+class TestSummary:
+    """Неизменяемое для шаблона представление теста для страницы регистрации"""
+    __slots__ = ('id', 'title', 'description', 'start_date', 'end_date', 'is_active',
+                 'passing_threshold', 'question_count', 'access_link')
+
+    def __init__(self, id, title, description, start_date, end_date, is_active,
+                 passing_threshold, question_count, access_link):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.start_date = start_date
+        self.end_date = end_date
+        self.is_active = is_active
+        self.passing_threshold = passing_threshold
+        self.question_count = question_count
+        self.access_link = access_link
+
+    @property
+    def pk(self):
+        return self.id
+
+    def is_available(self):
+        now = timezone.now()
+        return self.is_active and self.start_date <= now <= self.end_date
+
+
+class LocalLRU:
+    """Небольшой потокобезопасный LRU с временем жизни записей"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = LocalLRU(ACCESS_LINK_LOCAL_SIZE, ACCESS_LINK_LOCAL_TTL)
+
+
+def access_link_cache_key(access_link):
+    return f'testing:access_link:{access_link}'
+
+
+def load_summary(access_link):
+    row = Test.objects.filter(access_link=access_link).values(*TestSummary.__slots__).first()
+    return TestSummary(**row) if row is not None else None
+
+
+def resolve_access_link(access_link):
+    """TestSummary по ссылке доступа или None, если такой ссылки нет"""
+    summary = _local.get(access_link)
+    if summary is None:
+        key = access_link_cache_key(access_link)
+        summary = cache.get(key)
+        if summary is None:
+            summary = load_summary(access_link)
+            if summary is None:
+                summary = MISSING
+                cache.set(key, summary, ACCESS_LINK_NEGATIVE_TIMEOUT)
+            else:
+                cache.set(key, summary, ACCESS_LINK_CACHE_TIMEOUT)
+        _local.set(access_link, summary)
+    return None if summary == MISSING else summary
+
+
+def invalidate_access_link(*access_links):
+    links = [link for link in access_links if link]
+    for link in links:
+        _local.delete(link)
+    cache.delete_many([access_link_cache_key(link) for link in links])
+
+
+def invalidate_test_summary(test_id):
+    """Сброс по id теста, когда меняются поля summary без сигнала Test (счётчики)"""
+    invalidate_access_link(*Test.objects.filter(pk=test_id).values_list('access_link', flat=True))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Test, Question, Student, Attempt, Answer
+from .models import (User, Test, TestVersion, Question, Student, Attempt, Answer, GradingJob, Invitation,
+                     Notification, RegradeJob)
+from .grading_queue import retry_failed_jobs
 
 
 @admin.register(User)
@@ -15,6 +17,7 @@ class UserAdmin(BaseUserAdmin):
 @admin.register(Test)
 class TestAdmin(admin.ModelAdmin):
     list_display = ['title', 'creator', 'start_date', 'end_date', 'is_active', 'access_link']
+    list_select_related = ['creator']
     list_filter = ['is_active', 'start_date', 'notification_type']
     search_fields = ['title', 'description']
     readonly_fields = ['access_link', 'created_at']
@@ -29,13 +32,33 @@ class TestAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(TestVersion)
+class TestVersionAdmin(admin.ModelAdmin):
+    list_display = ['test', 'number', 'question_count', 'total_points', 'created_at']
+    list_select_related = ['test']
+    readonly_fields = ['test', 'number', 'question_count', 'total_points', 'created_at']
+
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['order_number', 'question_text', 'question_type', 'test', 'points']
+    list_display = ['order_number', 'question_text', 'question_type', 'test', 'points', 'added_in', 'removed_in']
+    list_select_related = ['test']
     list_filter = ['question_type', 'test']
     search_fields = ['question_text']
     ordering = ['test', 'order_number']
 
+    def has_change_permission(self, request, obj=None):
+        # Исключённые строки принадлежат только старым версиям: просмотр без правки
+        return super().has_change_permission(request, obj) and (obj is None or obj.removed_in is None)
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and (obj is None or obj.removed_in is None)
+
+    def delete_queryset(self, request, queryset):
+        # Вопросы опубликованных версий не удаляются, а исключаются из следующих (Question.delete)
+        for question in queryset.current():
+            question.delete()
+
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -47,13 +70,59 @@ class StudentAdmin(admin.ModelAdmin):
 @admin.register(Attempt)
 class AttemptAdmin(admin.ModelAdmin):
     list_display = ['student', 'test', 'start_time', 'score', 'passed', 'result_sent']
+    list_select_related = ['student', 'test']
     list_filter = ['passed', 'result_sent', 'test']
     search_fields = ['student__name', 'student__email']
-    readonly_fields = ['start_time', 'end_time', 'score', 'passed']
+    readonly_fields = ['version', 'start_time', 'end_time', 'score', 'passed']
 
 
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ['attempt', 'question', 'is_correct', 'points_earned']
+    list_select_related = ['attempt__student', 'attempt__test', 'question']
     list_filter = ['is_correct', 'question__question_type']
-    readonly_fields = ['is_correct', 'points_earned']
+    readonly_fields = ['answer_mask', 'is_correct', 'points_earned']
+
+
+@admin.register(GradingJob)
+class GradingJobAdmin(admin.ModelAdmin):
+    list_display = ['attempt', 'status', 'tries', 'created_at', 'finished_at']
+    list_select_related = ['attempt__student', 'attempt__test']
+    list_filter = ['status']
+    readonly_fields = ['attempt', 'student_answers', 'created_at', 'started_at', 'finished_at', 'error']
+    actions = ['retry_failed']
+
+    @admin.action(description='Повторить проверку (задания с ошибкой)')
+    def retry_failed(self, request, queryset):
+        requeued = retry_failed_jobs(queryset)
+        self.message_user(request, f'Возвращено в очередь: {requeued}')
+
+
+@admin.register(RegradeJob)
+class RegradeJobAdmin(admin.ModelAdmin):
+    list_display = ['question', 'status', 'tries', 'created_at', 'finished_at']
+    list_select_related = ['question']
+    list_filter = ['status']
+    readonly_fields = ['question', 'created_at', 'started_at', 'finished_at', 'error']
+    actions = ['retry_failed']
+
+    @admin.action(description='Повторить перепроверку (задания с ошибкой)')
+    def retry_failed(self, request, queryset):
+        requeued = retry_failed_jobs(queryset)
+        self.message_user(request, f'Возвращено в очередь: {requeued}')
+
+
+@admin.register(Invitation)
+class InvitationAdmin(admin.ModelAdmin):
+    list_display = ['student', 'test', 'created_at', 'used_at']
+    list_select_related = ['student', 'test']
+    search_fields = ['student__email_normalized', 'token']
+    readonly_fields = ['token', 'attempt', 'created_at', 'used_at']
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['attempt', 'channel', 'status', 'tries', 'next_attempt_at', 'sent_at']
+    list_select_related = ['attempt__student', 'attempt__test']
+    list_filter = ['channel', 'status']
+    readonly_fields = ['attempt', 'created_at', 'claimed_at', 'sent_at', 'error']
@@ -0,0 +1,353 @@
+"""
+Скомпилированные ключи ответов.
+
+JSON correct_answer каждого вопроса один раз переводится в неизменяемую
+структуру (frozenset, нормализованные строки, множества по строкам матрицы),
+после чего проверка ответа сводится к сравнению множеств или строк.
+
+Ответы на вопросы с выбором (один/несколько вариантов, матрица) кроме JSON
+кодируются целочисленной маской: бит на вариант в порядке options, у матрицы
+строка r занимает биты [r·k, (r+1)·k), где k — число столбцов. Маска хранится
+в Answer.answer_mask; проверка — сравнение масок или popcount пересечения.
+Ответ, который в маску не укладывается (неизвестный вариант, больше MASK_BITS
+ячеек), проверяется по множествам, как раньше.
+Ключи кэшируются в памяти процесса по id версии теста (TestVersion): версия
+неизменяема, поэтому ключ не нужно сбрасывать — редкие старые версии просто
+вытесняются из LRU.
+"""
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+ANSWER_KEY_CACHE_SIZE = 256
+# Answer.answer_mask — знаковый BigIntegerField
+MASK_BITS = 63
+
+# Латинские идентификаторы столбцов матрицы -> кириллица
+MATRIX_COLUMN_TRANSLATION = {
+    "A": "А",
+    "B": "Б",
+    "C": "В",
+    "D": "Г",
+    "E": "Д",
+    "F": "Е",
+}
+
+
+_COLUMN_TABLE = str.maketrans(MATRIX_COLUMN_TRANSLATION)
+
+
+def translate_column_id(col_id):
+    """Приводит идентификатор столбца матрицы к кириллице"""
+    return col_id.translate(_COLUMN_TABLE)
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def option_bits(options):
+    """{id варианта: бит} по порядку options; None — вариантов больше MASK_BITS"""
+    items = (options or {}).get('options') or []
+    if len(items) > MASK_BITS:
+        return None
+    return {str(item.get('id')): 1 << index for index, item in enumerate(items)}
+
+
+def encode_choices(bits, values):
+    """Маска выбранных вариантов; None — значение вне раскладки вопроса"""
+    if bits is None:
+        return None
+    mask = 0
+    for value in values:
+        bit = bits.get(str(value))
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def normalize_text(value):
+    return str(value).strip().lower()
+
+
+def resolve_matrix_answer_type(options, correct_answer):
+    """Тип ответа матрицы: 'multiple', если так указано или в ключе есть строки через запятую"""
+    if options.get('answer_type') == 'multiple':
+        return 'multiple'
+    for row in correct_answer.get('matrix', {}).values():
+        if any(',' in col for col in row):
+            return 'multiple'
+    return 'single'
+
+
+class QuestionKey:
+    """Ключ одного вопроса: grade() возвращает (is_correct, points_earned)"""
+    __slots__ = ('points', 'question_type')
+
+    def __init__(self, points):
+        self.points = points
+        self.question_type = None
+
+    def grade(self, student_answer):
+        is_correct = self.is_correct(student_answer)
+        return is_correct, self.points if is_correct else 0
+
+    def evaluate(self, student_answer):
+        """(is_correct, points_earned, answer_mask); маски нет у вопросов без выбора"""
+        return (*self.grade(student_answer), None)
+
+    def is_correct(self, student_answer):
+        raise NotImplementedError
+
+
+class ChoiceKey(QuestionKey):
+    """Выбор вариантов: ответ верен, если его маска совпадает с маской ключа"""
+    __slots__ = ('answers', 'bits', 'mask')
+
+    def __init__(self, points, correct, options=None):
+        super().__init__(points)
+        self.answers = frozenset(str(v) for v in self.correct_values(correct))
+        self.bits = option_bits(options)
+        self.mask = encode_choices(self.bits, self.correct_values(correct))
+
+    def encode(self, student_answer):
+        return encode_choices(self.bits, self.selected_values(student_answer))
+
+    def evaluate(self, student_answer):
+        answer_mask = self.encode(student_answer)
+        if answer_mask is None or self.mask is None:
+            is_correct = self.is_correct(student_answer)
+        else:
+            is_correct = answer_mask == self.mask
+        return is_correct, self.points if is_correct else 0, answer_mask
+
+    def grade(self, student_answer):
+        return self.evaluate(student_answer)[:2]
+
+    def is_correct(self, student_answer):
+        return frozenset(str(v) for v in self.selected_values(student_answer)) == self.answers
+
+
+class SingleChoiceKey(ChoiceKey):
+    __slots__ = ()
+
+    @staticmethod
+    def correct_values(correct):
+        return [correct.get('answer')]
+
+    @staticmethod
+    def selected_values(student_answer):
+        answer = student_answer.get('answer')
+        # Без ответа — пустая маска; множество {'None'} с ключом тоже не совпадает
+        return [] if answer in (None, '') else [answer]
+
+    def is_correct(self, student_answer):
+        return frozenset([str(student_answer.get('answer'))]) == self.answers
+
+
+class MultipleChoiceKey(ChoiceKey):
+    __slots__ = ()
+
+    @staticmethod
+    def correct_values(correct):
+        return correct.get('answers', [])
+
+    @staticmethod
+    def selected_values(student_answer):
+        return student_answer.get('answers', [])
+
+
+class TextKey(QuestionKey):
+    __slots__ = ('answer',)
+
+    def __init__(self, points, correct, options=None):
+        super().__init__(points)
+        self.answer = normalize_text(correct.get('answer', ''))
+
+    def is_correct(self, student_answer):
+        return normalize_text(student_answer.get('answer', '')) == self.answer
+
+
+class MatchingKey(QuestionKey):
+    __slots__ = ('pairs',)
+
+    def __init__(self, points, correct, options=None):
+        super().__init__(points)
+        self.pairs = self._freeze(correct.get('pairs'))
+
+    @staticmethod
+    def _freeze(pairs):
+        if not isinstance(pairs, dict):
+            return pairs
+        return frozenset((k, str(v)) for k, v in pairs.items())
+
+    def is_correct(self, student_answer):
+        return self._freeze(student_answer.get('pairs')) == self.pairs
+
+
+class OrderingKey(QuestionKey):
+    __slots__ = ('order',)
+
+    def __init__(self, points, correct, options=None):
+        super().__init__(points)
+        self.order = tuple(correct.get('order') or ())
+
+    def is_correct(self, student_answer):
+        return tuple(student_answer.get('order') or ()) == self.order
+
+
+class MatrixKey(QuestionKey):
+    """
+    Матрица: для каждой строки множество правильных столбцов.
+    Баллы начисляются пропорционально угаданным ячейкам ключа; при
+    множественном выборе каждая лишняя отметка в строке ключа вычитает одну
+    ячейку, балл не опускается ниже нуля. Строки, которых нет в ключе, не
+    учитываются вовсе (как и в исходной проверке): отметки в них не штрафуются.
+    Проверка по маске и по множествам (_correct_cells) считает одинаково.
+    """
+    __slots__ = ('rows', 'multiple', 'total_cells', 'row_offsets', 'col_bits', 'mask', 'rows_mask')
+
+    def __init__(self, points, correct, options=None):
+        super().__init__(points)
+        options = options or {}
+        self.multiple = resolve_matrix_answer_type(options, correct) == 'multiple'
+        rows = {}
+        for row_id, cols in correct.get('matrix', {}).items():
+            row = set()
+            for col in cols:
+                if self.multiple:
+                    row.update(translate_column_id(c.strip().upper()) for c in col.split(',') if c.strip())
+                else:
+                    row.add(translate_column_id(col.strip().upper()))
+            rows[str(row_id)] = frozenset(row)
+        self.rows = MappingProxyType(rows)
+        self.total_cells = sum(len(cols) for cols in rows.values())
+        self._build_layout(options)
+
+    def _build_layout(self, options):
+        """Раскладка битов по options и маска ключа; mask = None — матрица в маску не укладывается"""
+        row_ids = [str(row.get('id')) for row in options.get('rows', [])]
+        cols = options.get('cols', [])
+        self.row_offsets = self.col_bits = self.mask = self.rows_mask = None
+        if not row_ids or not cols or len(row_ids) * len(cols) > MASK_BITS:
+            return
+        width = len(cols)
+        self.row_offsets = {row_id: index * width for index, row_id in enumerate(row_ids)}
+        self.col_bits = {translate_column_id(str(col.get('id')).strip().upper()): 1 << index
+                         for index, col in enumerate(cols)}
+        mask = rows_mask = 0
+        for row_id, row_cols in self.rows.items():
+            offset = self.row_offsets.get(row_id)
+            if offset is None:
+                return
+            rows_mask |= ((1 << width) - 1) << offset
+            for col in row_cols:
+                bit = self.col_bits.get(col)
+                if bit is None:
+                    return
+                mask |= bit << offset
+        self.mask, self.rows_mask = mask, rows_mask
+
+    def encode(self, student_answer):
+        if self.row_offsets is None:
+            return None
+        student_matrix = student_answer.get('matrix') or {}
+        mask = 0
+        for row_id, offset in self.row_offsets.items():
+            for col in student_matrix.get(row_id) or ():
+                bit = self.col_bits.get(col)
+                if bit is None:
+                    return None
+                mask |= bit << offset
+        return mask
+
+    def evaluate(self, student_answer):
+        answer_mask = self.encode(student_answer)
+        if not self.total_cells:
+            return False, 0, answer_mask
+        if answer_mask is None or self.mask is None:
+            correct_cells = self._correct_cells(student_answer)
+        else:
+            correct_cells = popcount(answer_mask & self.mask)
+            if self.multiple:
+                # Лишние отметки считаются только в строках ключа
+                correct_cells -= popcount(answer_mask & self.rows_mask & ~self.mask)
+        is_correct = correct_cells == self.total_cells
+        return is_correct, max(0, self.points * (correct_cells / self.total_cells)), answer_mask
+
+    def grade(self, student_answer):
+        return self.evaluate(student_answer)[:2]
+
+    def _correct_cells(self, student_answer):
+        student_matrix = student_answer.get('matrix') or {}
+        correct_cells = 0
+        for row_id, cols in self.rows.items():
+            selected = frozenset(student_matrix.get(row_id) or ())
+            correct_cells += len(cols & selected)
+            if self.multiple:
+                correct_cells -= len(selected - cols)
+        return correct_cells
+
+
+QUESTION_KEY_TYPES = {
+    'single_choice': SingleChoiceKey,
+    'multiple_choice': MultipleChoiceKey,
+    'text_input': TextKey,
+    'number_input': TextKey,
+    'matching': MatchingKey,
+    'ordering': OrderingKey,
+    'matrix': MatrixKey,
+}
+
+
+def compile_question(question):
+    """Компилирует ключ одного вопроса"""
+    key = QUESTION_KEY_TYPES.get(question.question_type, TextKey)(
+        question.points, question.correct_answer or {}, question.options or {})
+    # Для метрик проверки по типам вопросов (TextKey обслуживает и текст, и число)
+    key.question_type = question.question_type
+    return key
+
+
+class AnswerKey:
+    """Неизменяемый ключ ответов версии теста"""
+    __slots__ = ('version_id', 'questions', 'total_points')
+
+    def __init__(self, version_id, questions):
+        self.version_id = version_id
+        self.questions = MappingProxyType(questions)
+        self.total_points = sum(key.points for key in questions.values())
+
+    def grade(self, question_id, student_answer):
+        return self.questions[question_id].grade(student_answer)
+
+
+_answer_keys = OrderedDict()
+_answer_keys_lock = threading.Lock()
+
+
+def compile_version(version):
+    questions = version.questions.only('id', 'test', 'question_type', 'points', 'options', 'correct_answer')
+    return AnswerKey(version.pk, {q.pk: compile_question(q) for q in questions})
+
+
+def get_answer_key(version):
+    """Ключ ответов версии теста из кэша процесса"""
+    with _answer_keys_lock:
+        key = _answer_keys.get(version.pk)
+        if key is not None:
+            _answer_keys.move_to_end(version.pk)
+            return key
+    key = compile_version(version)
+    with _answer_keys_lock:
+        _answer_keys[version.pk] = key
+        while len(_answer_keys) > ANSWER_KEY_CACHE_SIZE:
+            _answer_keys.popitem(last=False)
+    return key
+
+
+def clear_answer_keys():
+    """Сбрасывает кэш ключей процесса (версии неизменяемы, нужно только тестам с повторяющимися id)"""
+    with _answer_keys_lock:
+        _answer_keys.clear()
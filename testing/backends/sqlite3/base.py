@@ -0,0 +1,29 @@
+"""
+Бэкенд SQLite для нагруженного режима (settings.SQLITE_PROFILE = 'production').
+
+Отличия от стандартного django.db.backends.sqlite3:
+- при открытии соединения выполняются PRAGMA из OPTIONS['pragmas']
+  (WAL, synchronous=NORMAL, busy_timeout, mmap_size, cache_size);
+- транзакции открываются через BEGIN IMMEDIATE. Отложенная транзакция, начатая
+  чтением, при первой записи может получить SQLITE_BUSY сразу, минуя
+  busy_timeout (другой процесс уже записал после её снимка). IMMEDIATE берёт
+  блокировку записи в начале транзакции, и конкурентные писатели просто ждут.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,88 @@
+"""
+Каталог доступных тестов для публичной страницы test_list.
+
+Окно доступности (is_active, start_date <= now <= end_date) проверяется
+в SQL, результат кладётся в общий кэш до ближайшей границы окна среди
+активных тестов: начала ещё не открытого теста или окончания открытого.
+Сохранение или удаление теста сбрасывает кэш (signals.py), поэтому
+в установившемся режиме страница не выполняет запросов к БД.
+"""
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Test
+
+CATALOG_CACHE_KEY = 'testing:catalog'
+# Без ближайших границ каталог всё равно перечитывается раз в сутки
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class CatalogEntry:
+    """Неизменяемое для шаблона представление теста в каталоге"""
+    __slots__ = ('id', 'title', 'description', 'start_date', 'end_date', 'passing_threshold', 'access_link')
+
+    def __init__(self, id, title, description, start_date, end_date, passing_threshold, access_link):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.start_date = start_date
+        self.end_date = end_date
+        self.passing_threshold = passing_threshold
+        self.access_link = access_link
+
+    @property
+    def pk(self):
+        return self.id
+
+    def is_available(self):
+        return self.start_date <= timezone.now() <= self.end_date
+
+
+class Catalog:
+    """Доступные тесты и момент, до которого этот список верен"""
+    __slots__ = ('tests', 'valid_until')
+
+    def __init__(self, tests, valid_until):
+        self.tests = tests
+        self.valid_until = valid_until
+
+    def is_valid(self, now):
+        return self.valid_until is None or now < self.valid_until
+
+
+def build_catalog(now):
+    active = Test.objects.filter(is_active=True)
+    tests = tuple(CatalogEntry(**row) for row in active.filter(start_date__lte=now, end_date__gte=now).values(
+        *CatalogEntry.__slots__))
+    boundaries = active.aggregate(
+        next_start=Min('start_date', filter=Q(start_date__gt=now)),
+        next_end=Min('end_date', filter=Q(end_date__gte=now)),
+    )
+    candidates = []
+    if boundaries['next_start'] is not None:
+        candidates.append(boundaries['next_start'])
+    if boundaries['next_end'] is not None:
+        # Тест доступен включительно по end_date и закрывается сразу после
+        candidates.append(boundaries['next_end'] + timedelta(microseconds=1))
+    return Catalog(tests, min(candidates) if candidates else None)
+
+
+def get_catalog():
+    """Доступные сейчас тесты: из кэша, пока не наступила ближайшая граница окна"""
+    now = timezone.now()
+    catalog = cache.get(CATALOG_CACHE_KEY)
+    if catalog is None or not catalog.is_valid(now):
+        catalog = build_catalog(now)
+        timeout = CATALOG_CACHE_TIMEOUT
+        if catalog.valid_until is not None:
+            timeout = min(timeout, max(1, math.ceil((catalog.valid_until - now).total_seconds())))
+        cache.set(CATALOG_CACHE_KEY, catalog, timeout)
+    return catalog.tests
+
+
+def invalidate_catalog():
+    cache.delete(CATALOG_CACHE_KEY)
@@ -0,0 +1,68 @@
+"""
+Подготовленные к выдаче вопросы теста.
+
+Для take_test вопросы один раз приводятся к виду, готовому для шаблона
+и разбора формы (столбцы матрицы в кириллице, определён тип ответа матрицы),
+и кладутся в общий кэш по id версии теста. Версия неизменяема, поэтому
+payload хранится без срока жизни; все студенты, проходящие версию, получают
+один и тот же payload.
+"""
+from django.core.cache import cache
+
+from .answer_keys import resolve_matrix_answer_type, translate_column_id
+
+
+class DeliveredQuestion:
+    """Неизменяемое для шаблона представление вопроса без правильного ответа"""
+    __slots__ = ('id', 'order_number', 'points', 'question_text', 'question_type', 'options', 'answer_type')
+
+    def __init__(self, id, order_number, points, question_text, question_type, options, answer_type=None):
+        self.id = id
+        self.order_number = order_number
+        self.points = points
+        self.question_text = question_text
+        self.question_type = question_type
+        self.options = options
+        self.answer_type = answer_type
+
+    @property
+    def pk(self):
+        return self.id
+
+
+def deliver_question(question):
+    options = dict(question.options or {})
+    answer_type = None
+    if question.question_type == 'matrix':
+        options['cols'] = [
+            dict(col, id=translate_column_id(col['id'])) for col in options.get('cols', [])
+        ]
+        answer_type = resolve_matrix_answer_type(options, question.correct_answer or {})
+        options['answer_type'] = answer_type
+    return DeliveredQuestion(
+        id=question.pk,
+        order_number=question.order_number,
+        points=question.points,
+        question_text=question.question_text,
+        question_type=question.question_type,
+        options=options,
+        answer_type=answer_type,
+    )
+
+
+def build_delivery_payload(version):
+    questions = version.questions.order_by('order_number', 'pk')
+    return tuple(deliver_question(question) for question in questions)
+
+
+def delivery_cache_key(version):
+    return f'testing:delivery:v{version.pk}'
+
+
+def get_delivery_payload(version):
+    """Вопросы версии теста для выдачи студенту: одно обращение к кэшу в горячем пути"""
+    payload = cache.get(delivery_cache_key(version))
+    if payload is None:
+        payload = build_delivery_payload(version)
+        cache.set(delivery_cache_key(version), payload, None)
+    return payload
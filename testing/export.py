@@ -0,0 +1,210 @@
+"""
+Потоковая выгрузка результатов теста в CSV и XLSX.
+
+Строки читаются через .iterator(chunk_size=...) и сразу превращаются в байты
+ответа, поэтому память не зависит от числа попыток и ответов. XLSX собирается
+вручную: zip-архив пишется в неперематываемый поток, лист использует
+inline-строки, так что внешние библиотеки не нужны.
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .answer_keys import translate_column_id
+from .models import Answer
+
+EXPORT_CHUNK_SIZE = 2000
+
+ATTEMPT_HEADER = ['ID попытки', 'Студент', 'Email', 'Учебное заведение', 'Специализация',
+                  'Начало', 'Окончание', 'Баллы', 'Результат (%)', 'Пройден']
+ANSWER_HEADER = ['ID попытки', 'Email', 'Номер вопроса', 'Тип вопроса', 'Вопрос',
+                 'Ответ студента', 'Правильно', 'Баллы']
+
+
+def attempt_rows(test, chunk_size=EXPORT_CHUNK_SIZE):
+    yield ATTEMPT_HEADER
+    attempts = test.attempts.filter(end_time__isnull=False).select_related('student').order_by('pk')
+    for attempt in attempts.iterator(chunk_size=chunk_size):
+        student = attempt.student
+        yield [
+            attempt.pk, student.name, student.email, student.institution, student.specialization,
+            attempt.start_time.isoformat(), attempt.end_time.isoformat(),
+            attempt.points_earned, round(attempt.score, 2), 'да' if attempt.passed else 'нет',
+        ]
+
+
+class QuestionInfo:
+    """Всё, что нужно для человекочитаемого ответа на вопрос"""
+    __slots__ = ('order_number', 'question_type', 'text', 'option_texts', 'row_texts')
+
+    def __init__(self, question):
+        options = question.options or {}
+        self.order_number = question.order_number
+        self.question_type = question.get_question_type_display()
+        self.text = question.question_text
+        self.option_texts = {str(o['id']): o.get('text', '') for o in options.get('options', [])}
+        self.option_texts.update(
+            {translate_column_id(str(c['id'])): c.get('text', '') for c in options.get('cols', [])}
+        )
+        self.row_texts = {str(r['id']): r.get('text', '') for r in options.get('rows', [])}
+
+    def describe(self, student_answer):
+        """Ответ студента с подставленными текстами вариантов"""
+        if 'answers' in student_answer:
+            return '; '.join(self.option_texts.get(str(v), str(v)) for v in student_answer['answers'])
+        if 'matrix' in student_answer:
+            return '; '.join(
+                f"{self.row_texts.get(row_id, row_id)}: "
+                + ', '.join(self.option_texts.get(col, col) for col in cols)
+                for row_id, cols in student_answer['matrix'].items()
+            )
+        if 'pairs' in student_answer:
+            return '; '.join(f'{left}-{right}' for left, right in student_answer['pairs'].items())
+        value = student_answer.get('answer')
+        if value is None:
+            return ''
+        return self.option_texts.get(str(value), str(value))
+
+
+def answer_rows(test, chunk_size=EXPORT_CHUNK_SIZE):
+    yield ANSWER_HEADER
+    questions = {question.pk: QuestionInfo(question) for question in test.questions.all()}
+    answers = Answer.objects.filter(
+        attempt__test=test, attempt__end_time__isnull=False,
+    ).select_related('attempt__student').only(
+        'question_id', 'student_answer', 'is_correct', 'points_earned', 'attempt__student__email',
+    ).order_by('pk')
+    for answer in answers.iterator(chunk_size=chunk_size):
+        question = questions.get(answer.question_id)
+        if question is None:
+            continue
+        yield [
+            answer.attempt_id, answer.attempt.student.email, question.order_number, question.question_type,
+            question.text, question.describe(answer.student_answer or {}),
+            'да' if answer.is_correct else 'нет', answer.points_earned,
+        ]
+
+
+# Начало ячейки, с которого Excel и LibreOffice читают формулу (CSV/formula injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def safe_cell(value):
+    """Строка, похожая на формулу, экранируется ведущим апострофом; числа не трогаются"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() возвращает строку, а не пишет её"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM, чтобы Excel распознал UTF-8
+    for row in rows:
+        yield writer.writerow([safe_cell(value) for value in row])
+
+
+class _ChunkBuffer:
+    """Неперематываемый поток: zipfile пишет в него, генератор забирает накопленное"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Данные" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+# Символы, недопустимые в XML 1.0
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+        text = '' if value is None else escape(_XML_INVALID_CHARS.sub('', str(safe_cell(value))))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+
+def stream_xlsx(rows, rows_per_chunk=500):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for index, row in enumerate(rows, start=1):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode())
+                if index % rows_per_chunk == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+EXPORT_KINDS = {
+    'attempts': attempt_rows,
+    'answers': answer_rows,
+}
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -1,5 +1,4 @@
 from django import forms
-from django.db import models
 
 from .models import Test, Question, Student, User
 from django.contrib.auth.password_validation import validate_password
@@ -196,9 +195,7 @@ class QuestionForm(forms.ModelForm):
 
         # Автоматически определяем порядковый номер
         if self.test:
-            max_order = Question.objects.filter(test=self.test).aggregate(models.Max('order_number'))[
-                'order_number__max']
-            question.order_number = (max_order or 0) + 1
+            question.order_number = self.test.next_order_number
 
         # Формируем options и correct_answer в зависимости от типа вопроса
         if question.question_type in ['single_choice', 'multiple_choice']:
@@ -291,6 +288,53 @@ class QuestionForm(forms.ModelForm):
         return question
 
 
+class AttemptFilterForm(forms.Form):
+    """Фильтры списка попыток; каждое поле покрыто индексом attempts/students"""
+    PASSED_CHOICES = [('', 'Все'), ('yes', 'Пройден'), ('no', 'Не пройден')]
+
+    passed = forms.ChoiceField(
+        choices=PASSED_CHOICES,
+        required=False,
+        label='Статус',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    score_min = forms.FloatField(
+        required=False,
+        min_value=0,
+        max_value=100,
+        label='Балл от',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': 'any'})
+    )
+    score_max = forms.FloatField(
+        required=False,
+        min_value=0,
+        max_value=100,
+        label='Балл до',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': 'any'})
+    )
+    institution = forms.CharField(
+        max_length=255,
+        required=False,
+        label='Учебное заведение',
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm'})
+    )
+
+    def filter(self, attempts):
+        """Применяет заполненные фильтры к queryset попыток"""
+        if not self.is_valid():
+            return attempts
+        data = self.cleaned_data
+        if data['passed']:
+            attempts = attempts.filter(passed=data['passed'] == 'yes')
+        if data['score_min'] is not None:
+            attempts = attempts.filter(score__gte=data['score_min'])
+        if data['score_max'] is not None:
+            attempts = attempts.filter(score__lte=data['score_max'])
+        if data['institution']:
+            attempts = attempts.filter(student__institution=data['institution'].strip())
+        return attempts
+
+
 class TeacherRegistrationForm(forms.ModelForm):
     """Регистрация преподавателя (User)"""
     password1 = forms.CharField(label='Пароль', widget=forms.PasswordInput(attrs={'class': 'form-control'}))
@@ -323,3 +367,19 @@ class TeacherRegistrationForm(forms.ModelForm):
         if commit:
             user.save()
         return user
+
+
+class CandidateImportForm(forms.Form):
+    """Загрузка CSV кандидатов для массовой предрегистрации"""
+    file = forms.FileField(
+        label='CSV со столбцами email, name, telegram, institution, specialization',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
+
+
+class QuestionBankImportForm(forms.Form):
+    """Загрузка банка вопросов JSONL"""
+    file = forms.FileField(
+        label='Банк вопросов (JSONL, выгруженный из этой системы)',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.jsonl,.ndjson,application/x-ndjson'})
+    )
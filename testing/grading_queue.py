@@ -0,0 +1,132 @@
+"""
+Очередь фоновой проверки попыток в базе данных.
+
+В асинхронном режиме (settings.GRADING_MODE = 'async') отправка формы только
+сохраняет разобранные ответы в GradingJob и закрывает попытку, а проверку
+выполняет manage.py grading_worker. Там же выполняются задания перепроверки
+после исправления ключа вопроса (RegradeJob, см. testing/regrade.py).
+"""
+import logging
+import statistics
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attempt, GradingJob, Question, RegradeJob
+from .regrade import question_successors, regrade_question
+from .submission import finalize_attempt, parse_answer
+
+logger = logging.getLogger(__name__)
+
+MAX_TRIES = 3
+# Повтор после ошибки: RETRY_BASE_DELAY, 2·RETRY_BASE_DELAY ... секунд
+RETRY_BASE_DELAY = 10
+
+
+def enqueue_attempt(attempt, questions, data):
+    """Сохраняет ответы в очередь и закрывает попытку; возвращает False при повторной отправке"""
+    student_answers = {str(question.id): parse_answer(question, data) for question in questions}
+    with transaction.atomic():
+        closed = Attempt.objects.filter(pk=attempt.pk, end_time__isnull=True).update(
+            end_time=timezone.now(), grading_pending=True,
+        ) == 1
+        if closed:
+            GradingJob.objects.create(attempt=attempt, student_answers=student_answers)
+    return closed
+
+
+def retry_delay(tries):
+    return timedelta(seconds=RETRY_BASE_DELAY * 2 ** (tries - 1))
+
+
+def claim_jobs(limit, model=GradingJob):
+    """Забирает до limit готовых заданий из очереди; каждое достаётся ровно одному обработчику"""
+    candidates = model.objects.filter(status='queued', next_try_at__lte=timezone.now()).order_by(
+        'created_at').values_list('pk', flat=True)
+    claimed = []
+    for pk in list(candidates[:limit]):
+        if model.objects.filter(pk=pk, status='queued').update(status='running', started_at=timezone.now()):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale_jobs(older_than, model=GradingJob):
+    """Возвращает в очередь задания, зависшие в running (например, после падения обработчика)"""
+    return model.objects.filter(
+        status='running', started_at__lt=timezone.now() - older_than,
+    ).update(status='queued')
+
+
+def run_job(job_id):
+    job = GradingJob.objects.select_related('attempt__test', 'attempt__version').get(pk=job_id)
+    try:
+        student_answers = {int(question_id): answer for question_id, answer in job.student_answers.items()}
+        finalize_attempt(job.attempt, student_answers)
+    except Exception:
+        _job_failed(job)
+        logger.exception('grading job=%s attempt=%s failed (try %s)', job.pk, job.attempt_id, job.tries)
+        return False
+
+    _job_done(job)
+    logger.info('grading job=%s attempt=%s latency=%.1fms', job.pk, job.attempt_id,
+                (job.finished_at - job.created_at).total_seconds() * 1000)
+    return True
+
+
+def run_regrade_job(job_id):
+    job = RegradeJob.objects.select_related('question__test').get(pk=job_id)
+    try:
+        # После нескольких правок подряд ответы проверяются ключом последней копии вопроса
+        latest_pk = question_successors(job.question.test).get(job.question_id)
+        question = Question.objects.select_related('test').get(pk=latest_pk) if latest_pk else job.question
+        changed = regrade_question(question)
+    except Exception:
+        _job_failed(job)
+        logger.exception('regrade job=%s question=%s failed (try %s)', job.pk, job.question_id, job.tries)
+        return False
+
+    _job_done(job)
+    logger.info('regrade job=%s question=%s changed_answers=%s', job.pk, job.question_id, changed)
+    return True
+
+
+def _job_failed(job):
+    job.tries += 1
+    job.error = traceback.format_exc()
+    job.status = 'queued' if job.tries < MAX_TRIES else 'failed'
+    job.next_try_at = timezone.now() + retry_delay(job.tries)
+    job.save(update_fields=['tries', 'error', 'status', 'next_try_at'])
+
+
+def _job_done(job):
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+
+
+def retry_failed_jobs(queryset):
+    """Возвращает в очередь задания, исчерпавшие попытки (действие администратора)"""
+    return queryset.filter(status='failed').update(status='queued', tries=0, next_try_at=timezone.now())
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """Глубина очереди и задержка проверки (от отправки до выставления балла) за окно"""
+    depth = GradingJob.objects.filter(status='queued').count()
+    running = GradingJob.objects.filter(status='running').count()
+    failed = GradingJob.objects.filter(status='failed').count()
+    latencies = sorted(
+        (finished - created).total_seconds()
+        for created, finished in GradingJob.objects.filter(
+            status='done', finished_at__gte=timezone.now() - window,
+        ).values_list('created_at', 'finished_at')
+    )
+    stats = {'queued': depth, 'running': running, 'failed': failed, 'done_in_window': len(latencies),
+             'regrade_queued': RegradeJob.objects.filter(status__in=['queued', 'running']).count(),
+             'regrade_failed': RegradeJob.objects.filter(status='failed').count()}
+    if latencies:
+        stats['latency_p50'] = statistics.median(latencies)
+        stats['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        stats['latency_max'] = latencies[-1]
+    return stats
@@ -0,0 +1,115 @@
+"""
+Групповой коммит отправленных попыток (settings.GRADING_MODE = 'group').
+
+Запросы не пишут в SQLite сами: разобранные ответы кладутся в очередь
+процесса, а единственный поток-писатель забирает накопившиеся отправки
+(до GROUP_COMMIT_MAX_BATCH штук или за GROUP_COMMIT_MAX_DELAY_MS) и завершает
+их одной транзакцией. Каждая попытка внутри транзакции идёт в своей точке
+сохранения, так что ошибка в одной не откатывает остальные. Запрос ждёт
+результата своей попытки и дальше работает как в синхронном режиме.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from .submission import finalize_attempt, parse_answer
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_TIMEOUT = 60
+
+
+class GroupCommitWriter:
+    """Очередь отправок и поток, записывающий их пачками"""
+
+    def __init__(self, max_batch=None, max_delay=None):
+        self.max_batch = max_batch or settings.GROUP_COMMIT_MAX_BATCH
+        self.max_delay = (max_delay if max_delay is not None else settings.GROUP_COMMIT_MAX_DELAY_MS) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, attempt, student_answers, timeout=SUBMIT_TIMEOUT):
+        """Ставит попытку в очередь и ждёт SubmissionResult после коммита пачки"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((attempt, student_answers, future))
+        return future.result(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception('group commit writer failed')
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for attempt, student_answers, future in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, finalize_attempt(attempt, student_answers), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # Не удался сам коммит: ни одна попытка пачки не записана, запросы не должны ждать вечно
+            if isinstance(exc, DatabaseError):
+                connection.close()
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+
+        for future, result, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+        logger.info('group commit batch=%s duration=%.1fms', len(batch), (time.perf_counter() - started) * 1000)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Писатель текущего процесса (создаётся при первой отправке)"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter()
+    return _writer
+
+
+def submit_attempt_grouped(attempt, questions, data):
+    """То же, что submission.submit_attempt, но запись — через групповой коммит"""
+    student_answers = {question.id: parse_answer(question, data) for question in questions}
+    return get_writer().submit(attempt, student_answers)
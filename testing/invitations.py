@@ -0,0 +1,172 @@
+"""
+Массовая предрегистрация кандидатов и персональные ссылки на тест.
+
+CSV (email, name, telegram, institution, specialization) читается потоково
+пачками по INVITATION_BATCH_SIZE строк. Студенты сводятся по нормализованному
+email: новые создаются bulk_create, у существующих обновляются переданные
+непустые поля. Для каждого кандидата создаётся Invitation с токеном, так что
+в день теста регистрация — один поиск по уникальному индексу токена.
+"""
+import csv
+import io
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import ATTEMPTS_STARTED
+from .models import Attempt, Invitation, Student
+
+# Меньше лимита SQLite на число параметров в IN (...)
+INVITATION_BATCH_SIZE = 500
+STUDENT_FIELDS = ('name', 'telegram', 'institution', 'specialization')
+LINKS_HEADER = ['email', 'name', 'link']
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportReport:
+    """Итоги импорта кандидатов"""
+
+    def __init__(self):
+        self.rows = 0
+        self.students_created = 0
+        self.students_updated = 0
+        self.invitations_created = 0
+        # Строки, которые bulk_create(ignore_conflicts=True) не вставил: их успела создать параллельная запись
+        self.students_skipped = 0
+        self.invitations_skipped = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'строка {line}: {message}')
+
+
+def text_stream(uploaded):
+    """Текстовый поток для загруженного файла (UTF-8, BOM из Excel допускается)"""
+    return io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline='')
+
+
+def read_candidates(stream, report):
+    """Строки CSV как (номер строки, email, поля студента); некорректные строки попадают в отчёт"""
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or 'email' not in [name.strip().lower() for name in reader.fieldnames]:
+        raise ValueError('В CSV нет столбца email')
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        report.rows += 1
+        email = row.get('email', '')
+        try:
+            validate_email(email)
+        except ValidationError:
+            report.skip(reader.line_num, f'некорректный email «{email}»')
+            continue
+        fields = {name: row.get(name, '')[:Student._meta.get_field(name).max_length] for name in STUDENT_FIELDS}
+        yield reader.line_num, email, fields
+
+
+def _batches(candidates, size):
+    batch = {}
+    for _, email, fields in candidates:
+        # Повтор email внутри пачки: побеждает последняя строка
+        batch[Student.normalize_email(email)] = (email, fields)
+        if len(batch) >= size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def _existing_students(emails):
+    return {student.email_normalized: student for student in Student.objects.filter(email_normalized__in=emails)}
+
+
+def _upsert_students(batch, report):
+    """{email_normalized: student_id} для пачки; новые — bulk_create, изменённые — bulk_update"""
+    existing = _existing_students(list(batch))
+    new_students = []
+    changed = []
+    for normalized, (email, fields) in batch.items():
+        student = existing.get(normalized)
+        if student is None:
+            new_students.append(Student(email=email, email_normalized=normalized,
+                                        name=fields['name'] or email.split('@')[0], **{
+                                            name: fields[name] for name in STUDENT_FIELDS if name != 'name'}))
+            continue
+        updates = {name: value for name, value in fields.items() if value and getattr(student, name) != value}
+        if updates:
+            for name, value in updates.items():
+                setattr(student, name, value)
+            changed.append(student)
+    registered = 0
+    if new_students:
+        # bulk_create обходит Student.save(), email_normalized выставлен выше. Параллельная
+        # регистрация того же email не ломает импорт, но ignore_conflicts не сообщает,
+        # какие строки пропущены: такие email считаются непосредственно перед вставкой
+        registered = Student.objects.filter(
+            email_normalized__in=[student.email_normalized for student in new_students]).count()
+        Student.objects.bulk_create(new_students, ignore_conflicts=True)
+    if changed:
+        Student.objects.bulk_update(changed, STUDENT_FIELDS)
+    student_ids = dict(Student.objects.filter(email_normalized__in=list(batch))
+                       .values_list('email_normalized', 'id'))
+    report.students_created += len(student_ids) - len(existing) - registered
+    report.students_skipped += registered
+    report.students_updated += len(changed)
+    return student_ids
+
+
+def import_candidates(test, stream, batch_size=INVITATION_BATCH_SIZE):
+    """Импортирует кандидатов из текстового потока CSV и создаёт им приглашения на тест"""
+    report = ImportReport()
+    for batch in _batches(read_candidates(stream, report), batch_size):
+        with transaction.atomic():
+            student_ids = _upsert_students(batch, report)
+            invited = set(Invitation.objects.filter(test=test, student_id__in=list(student_ids.values()))
+                          .values_list('student_id', flat=True))
+            invitations = [Invitation(test=test, student_id=student_id)
+                           for student_id in student_ids.values() if student_id not in invited]
+            Invitation.objects.bulk_create(invitations, ignore_conflicts=True)
+            created = Invitation.objects.filter(
+                test=test, student_id__in=list(student_ids.values())).count() - len(invited)
+            report.invitations_created += created
+            report.invitations_skipped += len(invitations) - created
+    return report
+
+
+def invitation_link_rows(test, build_url, chunk_size=2000):
+    """Строки CSV со ссылками приглашений; build_url(token) -> абсолютный URL"""
+    yield LINKS_HEADER
+    invitations = test.invitations.select_related('student').only(
+        'token', 'student__email', 'student__name').order_by('pk')
+    for invitation in invitations.iterator(chunk_size=chunk_size):
+        yield [invitation.student.email, invitation.student.name, build_url(invitation.token)]
+
+
+def find_invitation(token):
+    """Приглашение по токену с тестом и кандидатом; None — токен неизвестен"""
+    return Invitation.objects.select_related('test', 'student').filter(token=token).first()
+
+
+def open_invitation(invitation):
+    """
+    Попытка по приглашению: при первом переходе создаётся, потом возвращается
+    та же. Доступность теста проверяет вызывающий до открытия — иначе попытка
+    зафиксирует время начала и версию теста раньше срока.
+    """
+    if invitation.attempt_id is not None:
+        return invitation
+    with transaction.atomic():
+        attempt = Attempt.objects.create(test=invitation.test, student=invitation.student)
+        # Условный UPDATE: при двойном клике побеждает первая попытка
+        claimed = Invitation.objects.filter(pk=invitation.pk, attempt__isnull=True).update(
+            attempt=attempt, used_at=timezone.now())
+        if claimed:
+            transaction.on_commit(ATTEMPTS_STARTED.inc)
+        else:
+            transaction.set_rollback(True)
+    invitation.refresh_from_db(fields=['attempt', 'used_at'])
+    return invitation
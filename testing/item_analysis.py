@@ -0,0 +1,212 @@
+"""
+Анализ заданий теста (item analysis).
+
+Матрица «попытка × вопрос» загружается из answers пачками через values_list
+прямо в массивы NumPy, после чего все показатели считаются векторно:
+доля правильных ответов, индекс дискриминации по верхним/нижним 27%,
+точечно-бисериальная корреляция и альфа Кронбаха для теста целиком.
+Частоты выбора вариантов считаются в БД по Answer.answer_mask: по сумме
+каждого бита маски с группировкой по вопросу.
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .answer_keys import MASK_BITS
+from .models import Answer
+from .regrade import question_successors, regrade_generation
+
+CHOICE_QUESTION_TYPES = ('single_choice', 'multiple_choice', 'matrix')
+
+LOAD_CHUNK_SIZE = 50000
+GROUP_FRACTION = 0.27
+ITEM_ANALYSIS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def load_score_matrix(test, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Возвращает (question_ids, points, scores, correct):
+    scores — баллы float32 формы (попытки, вопросы), correct — bool той же формы.
+    Отсутствующий ответ считается неверным с нулём баллов. Ответы попыток на
+    старых версиях теста засчитываются текущей копии изменённого вопроса.
+    """
+    question_rows = list(test.questions.current().order_by('order_number').values_list('pk', 'points'))
+    successors = question_successors(test)
+    question_ids = np.array([pk for pk, _ in question_rows], dtype=np.int64)
+    points = np.array([p for _, p in question_rows], dtype=np.float32)
+    attempt_ids = np.fromiter(
+        test.attempts.filter(end_time__isnull=False, grading_pending=False)
+        .order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size),
+        dtype=np.int64,
+    )
+
+    scores = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.float32)
+    correct = np.zeros(scores.shape, dtype=bool)
+    if not len(attempt_ids) or not len(question_ids):
+        return question_ids, points, scores, correct
+
+    question_order = np.argsort(question_ids)
+    sorted_question_ids = question_ids[question_order]
+
+    # Попытки, завершённые после снимка attempt_ids, в матрицу не попадают
+    rows = Answer.objects.filter(
+        attempt__test=test, attempt__end_time__isnull=False, attempt__grading_pending=False,
+        attempt_id__lte=attempt_ids[-1],
+    ).values_list('attempt_id', 'question_id', 'points_earned', 'is_correct').order_by()
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        if row[1] in successors:
+            row = (row[0], successors[row[1]], row[2], row[3])
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _fill_chunk(chunk, attempt_ids, sorted_question_ids, question_order, scores, correct)
+            chunk = []
+    if chunk:
+        _fill_chunk(chunk, attempt_ids, sorted_question_ids, question_order, scores, correct)
+    return question_ids, points, scores, correct
+
+
+def _fill_chunk(chunk, attempt_ids, sorted_question_ids, question_order, scores, correct):
+    data = np.array(chunk, dtype=np.float64)
+    row_index = np.searchsorted(attempt_ids, data[:, 0].astype(np.int64))
+    col_pos = np.searchsorted(sorted_question_ids, data[:, 1].astype(np.int64))
+    # Ответы попыток вне снимка и на вопросы, которых уже нет в тесте, отбрасываются
+    row_index = np.minimum(row_index, len(attempt_ids) - 1)
+    col_pos = np.minimum(col_pos, len(sorted_question_ids) - 1)
+    known = ((attempt_ids[row_index] == data[:, 0].astype(np.int64))
+             & (sorted_question_ids[col_pos] == data[:, 1].astype(np.int64)))
+    row_index, col_index = row_index[known], question_order[col_pos[known]]
+    scores[row_index, col_index] = data[known, 2]
+    correct[row_index, col_index] = data[known, 3] > 0
+
+
+def compute_item_statistics(scores, correct, group_fraction=GROUP_FRACTION):
+    """
+    Векторный расчёт показателей по матрицам попытки × вопросы.
+    Возвращает словарь массивов по вопросам и альфу Кронбаха.
+    """
+    n_attempts, n_questions = scores.shape
+    result = {
+        'correct_rate': np.zeros(n_questions),
+        'discrimination': np.zeros(n_questions),
+        'point_biserial': np.zeros(n_questions),
+        'cronbach_alpha': None,
+    }
+    if n_attempts < 2 or not n_questions:
+        return result
+
+    # float32 матрицы и einsum без промежуточных произведений держат память в ~3 размерах матрицы
+    scores = scores.astype(np.float32, copy=False)
+    items = correct.astype(np.float32)
+    totals = scores.sum(axis=1, dtype=np.float64)
+    result['correct_rate'] = items.mean(axis=0, dtype=np.float64)
+
+    # Индекс дискриминации: доля верных в верхней группе минус в нижней
+    group_size = max(1, int(round(n_attempts * group_fraction)))
+    order = np.argsort(totals, kind='stable')
+    lower, upper = order[:group_size], order[-group_size:]
+    result['discrimination'] = (
+        items[upper].mean(axis=0, dtype=np.float64) - items[lower].mean(axis=0, dtype=np.float64)
+    )
+
+    # Точечно-бисериальная корреляция с суммой баллов за остальные вопросы
+    rest = totals.astype(np.float32)[:, None] - scores
+    rest -= rest.mean(axis=0, dtype=np.float64).astype(np.float32)
+    items -= result['correct_rate'].astype(np.float32)
+    covariance = np.einsum('ij,ij->j', items, rest, dtype=np.float64)
+    denominator = np.sqrt(
+        np.einsum('ij,ij->j', items, items, dtype=np.float64)
+        * np.einsum('ij,ij->j', rest, rest, dtype=np.float64)
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['point_biserial'] = np.where(denominator > 0, covariance / denominator, 0.0)
+
+    if n_questions > 1:
+        total_variance = totals.var(ddof=1)
+        if total_variance > 0:
+            item_variance = scores.var(axis=0, ddof=1, dtype=np.float64).sum()
+            result['cronbach_alpha'] = n_questions / (n_questions - 1) * (1 - item_variance / total_variance)
+    return result
+
+
+def option_labels(question):
+    """Подписи битов маски ответа по порядку: id варианта или «строка.столбец» матрицы"""
+    options = question.options or {}
+    if question.question_type == 'matrix':
+        cols = [col.get('id') for col in options.get('cols', [])]
+        labels = [f"{row.get('id')}.{col}" for row in options.get('rows', []) for col in cols]
+    else:
+        labels = [str(item.get('id')) for item in options.get('options', [])]
+    return labels if len(labels) <= MASK_BITS else []
+
+
+def option_selection_counts(test):
+    """
+    {id вопроса: [(подпись, число выборов)]} для текущих вопросов с выбором.
+    Один агрегирующий запрос: SUM((answer_mask >> i) & 1) по каждому биту.
+    Ответы на прежние копии вопроса учитываются, если раскладка вариантов не менялась.
+    """
+    questions = list(test.questions.filter(question_type__in=CHOICE_QUESTION_TYPES)
+                     .only('id', 'test', 'question_type', 'options', 'removed_in'))
+    labels = {q.pk: option_labels(q) for q in questions}
+    current = {q.pk for q in questions if q.removed_in is None and labels[q.pk]}
+    successors = question_successors(test)
+    targets = {}
+    for pk, row_labels in labels.items():
+        target = successors.get(pk, pk)
+        if target in current and row_labels == labels[target]:
+            targets[pk] = target
+    if not targets:
+        return {}
+
+    width = max(len(labels[pk]) for pk in targets)
+    rows = Answer.objects.filter(
+        question_id__in=list(targets), answer_mask__isnull=False,
+        attempt__end_time__isnull=False, attempt__grading_pending=False,
+    ).values('question_id').annotate(**{
+        f'bit_{i}': Sum(F('answer_mask').bitrightshift(i).bitand(1)) for i in range(width)
+    }).order_by()
+    counts = {}
+    for row in rows:
+        target = targets[row['question_id']]
+        totals = counts.setdefault(target, [0] * len(labels[target]))
+        for i in range(len(totals)):
+            totals[i] += row[f'bit_{i}'] or 0
+    return {pk: list(zip(labels[pk], totals)) for pk, totals in counts.items()}
+
+
+def analyze_test(test):
+    question_ids, points, scores, correct = load_score_matrix(test)
+    stats = compute_item_statistics(scores, correct)
+    selections = option_selection_counts(test)
+    numbers = dict(test.questions.values_list('pk', 'order_number'))
+    return {
+        'attempts': scores.shape[0],
+        'cronbach_alpha': None if stats['cronbach_alpha'] is None else float(stats['cronbach_alpha']),
+        'items': [
+            {
+                'question_id': int(question_id),
+                'order_number': numbers.get(int(question_id)),
+                'points': float(points[i]),
+                'correct_rate': float(stats['correct_rate'][i]),
+                'discrimination': float(stats['discrimination'][i]),
+                'point_biserial': float(stats['point_biserial'][i]),
+                'selections': selections.get(int(question_id), []),
+            }
+            for i, question_id in enumerate(question_ids)
+        ],
+    }
+
+
+def get_item_analysis(test, attempts_count):
+    """
+    Результат анализа из кэша; ключ меняется при появлении новых попыток
+    (attempts_count из TestStats), при изменении вопросов и после перепроверки.
+    """
+    key = (f'testing:item_analysis:{test.pk}:{test.content_version}:{attempts_count}:'
+           f'{regrade_generation(test.pk)}')
+    result = cache.get(key)
+    if result is None:
+        result = analyze_test(test)
+        cache.set(key, result, ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return result
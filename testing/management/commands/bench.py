@@ -0,0 +1,216 @@
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from testing.models import User
+from testing.profiling import profile_queries
+from testing.synthetic import SyntheticDataGenerator, answer_form_data
+
+SCENARIOS = ['test_detail', 'register', 'take_test_get', 'take_test_post',
+             'test_result', 'test_statistics', 'attempt_detail']
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+class Command(BaseCommand):
+    help = ('Сквозной бенчмарк студенческих и преподавательских страниц: на временной БД '
+            'создаёт тесты нужного размера и гоняет view через тестовый клиент, результат — JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', default='10,50', help='Размеры тестов через запятую')
+        parser.add_argument('--attempts', default='100,1000', help='Число завершённых попыток через запятую')
+        parser.add_argument('--requests', type=int, default=100, help='Запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=1, help='Параллельных клиентов (потоков)')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--no-tracemalloc', action='store_true', help='Не измерять пик памяти (меньше накладных)')
+        parser.add_argument('--output', help='Файл для JSON (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+        sizes = [(int(q), int(a)) for q in options['questions'].split(',') for a in options['attempts'].split(',')]
+        self.rng = random.Random(options['seed'])
+        self.options = options
+
+        # Отдельная файловая БД: в памяти потоки не могут писать одновременно
+        workdir = tempfile.mkdtemp(prefix='bench-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self.run_benchmarks(scenarios, sizes)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = json.dumps({'meta': self.meta(), 'results': results}, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+            self.stderr.write(f"Результаты записаны в {options['output']}")
+        else:
+            self.stdout.write(report)
+
+    def meta(self):
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'sqlite_profile': getattr(settings, 'SQLITE_PROFILE', 'default'),
+            'grading_mode': settings.GRADING_MODE,
+            'requests': self.options['requests'],
+            'concurrency': self.options['concurrency'],
+            'seed': self.options['seed'],
+        }
+
+    def run_benchmarks(self, scenarios, sizes):
+        teacher = User.objects.create_user(username='bench-teacher', password='bench', role='teacher')
+        self.generator = SyntheticDataGenerator(self.options['seed'], prefix='bench')
+        results = []
+        for questions, attempts in sizes:
+            started = time.perf_counter()
+            test = self.generator.create_test(teacher, questions, title=f'Бенчмарк {questions}×{attempts}')
+            self.generator.create_attempts(test, self.generator.create_students(attempts))
+            self.stderr.write(f'Тест {questions} вопросов × {attempts} попыток создан за '
+                              f'{time.perf_counter() - started:.1f} с')
+            for scenario in scenarios:
+                result = self.run_scenario(scenario, test, teacher)
+                result.update({'scenario': scenario, 'questions': questions, 'attempts': attempts})
+                results.append(result)
+                self.stderr.write(f"  {scenario}: p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                                  f"{result['queries_per_request']} запросов")
+        return results
+
+    def open_attempts(self, test, count):
+        """Незавершённые попытки новых студентов для take_test"""
+        return self.generator.create_attempts(test, self.generator.create_students(count), finished=False)
+
+    def prepare(self, scenario, test, teacher):
+        """Возвращает функцию (client, i) -> response для i-го запроса сценария"""
+        total = self.options['requests']
+        if scenario == 'test_detail':
+            url = reverse('testing:test_detail', args=[test.access_link])
+            return lambda client, i: client.get(url)
+        if scenario == 'register':
+            url = reverse('testing:test_detail', args=[test.access_link])
+            run = self.rng.randrange(10 ** 9)
+            return lambda client, i: client.post(url, {'name': 'Студент', 'email': f'reg-{run}-{i}@example.com'})
+        if scenario == 'take_test_get':
+            attempt = self.open_attempts(test, 1)[0]
+            url = reverse('testing:take_test', args=[attempt.pk])
+            return lambda client, i: client.get(url)
+        if scenario == 'take_test_post':
+            urls = [reverse('testing:take_test', args=[a.pk]) for a in self.open_attempts(test, total)]
+            data = answer_form_data(test.questions.current(), self.rng)
+            return lambda client, i: client.post(urls[i], data)
+        if scenario == 'test_result':
+            attempt = test.attempts.filter(end_time__isnull=False).first()
+            if attempt is None:
+                return None
+            url = reverse('testing:test_result', args=[attempt.pk])
+            return lambda client, i: client.get(url)
+        if scenario == 'test_statistics':
+            url = reverse('testing:test_statistics', args=[test.pk])
+            return lambda client, i: client.get(url)
+        if scenario == 'attempt_detail':
+            attempt = test.attempts.filter(end_time__isnull=False).first()
+            if attempt is None:
+                return None
+            url = reverse('testing:attempt_detail', args=[attempt.pk])
+            return lambda client, i: client.get(url)
+
+    def run_scenario(self, scenario, test, teacher):
+        call = self.prepare(scenario, test, teacher)
+        if call is None:
+            return {'skipped': True}
+        total = self.options['requests']
+        concurrency = max(1, self.options['concurrency'])
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        latencies, queries, errors = [], [], []
+        lock = threading.Lock()
+        counter = iter(range(total))
+
+        def worker():
+            client = Client(HTTP_HOST=host)
+            if scenario in ('test_statistics', 'attempt_detail'):
+                client.force_login(teacher)
+            try:
+                while True:
+                    with lock:
+                        i = next(counter, None)
+                    if i is None:
+                        break
+                    started = time.perf_counter()
+                    try:
+                        with profile_queries() as profile:
+                            response = call(client, i)
+                        ok = response.status_code < 400
+                    except Exception as exc:
+                        ok, response = False, exc
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        if ok:
+                            latencies.append(elapsed)
+                            queries.append(profile.queries)
+                        else:
+                            errors.append(str(getattr(response, 'status_code', response)))
+            finally:
+                if concurrency > 1:
+                    connection.close()
+
+        measure_memory = not self.options['no_tracemalloc']
+        if measure_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker()
+        else:
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+
+        latencies.sort()
+        result = {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': None, 'p95_ms': None, 'p99_ms': None,
+            'queries_per_request': round(statistics.mean(queries), 1) if queries else None,
+            'peak_memory_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+        }
+        if latencies:
+            result.update({
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            })
+        if errors:
+            result['error_samples'] = sorted(set(errors))[:5]
+        return result
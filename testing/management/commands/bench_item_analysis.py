@@ -0,0 +1,42 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from testing.item_analysis import compute_item_statistics
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк расчёта item analysis на синтетической матрице попытки × вопросы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=100000)
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        n_attempts, n_questions = options['attempts'], options['questions']
+        rng = np.random.default_rng(options['seed'])
+
+        # Модель Раша: способность студента против сложности вопроса
+        ability = rng.normal(size=(n_attempts, 1))
+        difficulty = rng.normal(size=(1, n_questions))
+        probability = 1 / (1 + np.exp(difficulty - ability))
+        correct = rng.random((n_attempts, n_questions)) < probability
+        scores = correct.astype(np.float32)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = compute_item_statistics(scores, correct)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(f'Матрица: {n_attempts} × {n_questions}')
+        self.stdout.write(f'Время расчёта: {elapsed * 1000:.0f} мс, пик памяти: {peak / 2 ** 20:.0f} МБ')
+        self.stdout.write(f"Альфа Кронбаха: {result['cronbach_alpha']:.3f}")
+        self.stdout.write(
+            f"Дискриминация: мин {result['discrimination'].min():.2f}, "
+            f"макс {result['discrimination'].max():.2f}"
+        )
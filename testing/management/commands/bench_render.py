@@ -0,0 +1,69 @@
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from testing.delivery import DeliveredQuestion
+
+
+def synthetic_questions(count, first_id=1):
+    """Вопросы всех типов для рендера без обращения к БД"""
+    options = [{'id': str(i), 'text': f'Вариант {i}'} for i in range(1, 5)]
+    rows = [{'id': str(i), 'text': f'Утверждение {i}'} for i in range(1, 6)]
+    cols = [{'id': col, 'text': f'Столбец {col}'} for col in 'АБВГДЕ']
+    kinds = [
+        ('single_choice', {'options': options}),
+        ('multiple_choice', {'options': options}),
+        ('text_input', {}),
+        ('number_input', {}),
+        ('matrix', {'rows': rows, 'cols': cols, 'answer_type': 'single'}),
+        ('matrix', {'rows': rows, 'cols': cols, 'answer_type': 'multiple'}),
+    ]
+    questions = []
+    for i in range(count):
+        question_type, question_options = kinds[i % len(kinds)]
+        questions.append(DeliveredQuestion(
+            id=first_id + i, order_number=i + 1, points=1,
+            question_text=f'Вопрос {i + 1}', question_type=question_type,
+            options=question_options, answer_type=question_options.get('answer_type'),
+        ))
+    return tuple(questions)
+
+
+class Command(BaseCommand):
+    help = 'Сравнение времени рендера take_test.html с холодным и прогретым кэшем фрагментов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=80)
+        parser.add_argument('--iterations', type=int, default=100)
+
+    def handle(self, *args, **options):
+        count = options['questions']
+        request = RequestFactory().get('/')
+        attempt = SimpleNamespace(id=0, student=SimpleNamespace(name='Бенчмарк'))
+        test = SimpleNamespace(id=0, pk=0, title='Бенчмарк')
+
+        def render(questions):
+            started = time.perf_counter()
+            render_to_string('take_test.html', {
+                'attempt': attempt, 'test': test, 'questions': questions,
+            }, request=request)
+            return time.perf_counter() - started
+
+        # Фрагменты кэшируются по id вопроса: уникальные id гарантируют промах кэша
+        base_id = time.time_ns()
+        cold_sets = [synthetic_questions(count, base_id + (i + 1) * count) for i in range(options['iterations'])]
+        cold = [render(questions) for questions in cold_sets]
+        warm_set = synthetic_questions(count, base_id)
+        render(warm_set)
+        warm = [render(warm_set) for _ in range(options['iterations'])]
+
+        cold_ms = statistics.median(cold) * 1000
+        warm_ms = statistics.median(warm) * 1000
+        self.stdout.write(f"Вопросов: {options['questions']}, итераций: {options['iterations']}")
+        self.stdout.write(f'Без кэша (медиана): {cold_ms:.2f} мс')
+        self.stdout.write(f'С кэшем (медиана):  {warm_ms:.2f} мс')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: x{cold_ms / warm_ms:.1f}'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Q, Sum
+
+from testing.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённые total_points/question_count/next_order_number тестов с вопросами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Исправить расхождения')
+
+    def handle(self, *args, **options):
+        # Итоги теста описывают текущее содержимое: строки, исключённые из версий, не считаются
+        current = Q(questions__removed_in__isnull=True)
+        tests = Test.objects.annotate(
+            actual_count=Count('questions', filter=current),
+            actual_points=Sum('questions__points', filter=current),
+            max_order=Max('questions__order_number', filter=current),
+        ).only('id', 'title', 'total_points', 'question_count', 'next_order_number')
+
+        mismatches = 0
+        for test in list(tests):
+            expected = {
+                'question_count': test.actual_count,
+                'total_points': test.actual_points or 0,
+            }
+            # next_order_number может опережать вопросы после удаления, но не отставать
+            min_next_order = (test.max_order or 0) + 1
+            wrong = {field: value for field, value in expected.items() if getattr(test, field) != value}
+            if test.next_order_number < min_next_order:
+                wrong['next_order_number'] = min_next_order
+            if not wrong:
+                continue
+
+            mismatches += 1
+            details = ', '.join(f'{field}: {getattr(test, field)} -> {value}' for field, value in wrong.items())
+            self.stdout.write(self.style.WARNING(f'Тест {test.pk} «{test.title}»: {details}'))
+            if options['fix']:
+                Test.objects.filter(pk=test.pk).update(**wrong)
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено тестов: {mismatches}'))
+        else:
+            self.stdout.write(f'Тестов с расхождениями: {mismatches} (запустите с --fix)')
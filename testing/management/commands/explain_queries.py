@@ -0,0 +1,148 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from testing.models import Answer, Attempt, GradingJob, Student, Test
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def sqlite_copy():
+    """Переключает соединение на копию рабочей БД SQLite во временном файле"""
+    workdir = tempfile.mkdtemp(prefix='explain-')
+    path = os.path.join(workdir, 'copy.sqlite3')
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    original = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = path
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = original
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = 'Печатает планы выполнения (EXPLAIN) основных запросов view с индексами и без них'
+
+    # Индексы, добавленные под эти запросы (0010_keyset_indexes, 0011_query_plan_indexes)
+    INDEXES = [
+        index.name for model in (Test, Student, Attempt) for index in model._meta.indexes
+    ] + [constraint.name for constraint in Answer._meta.constraints]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test-id', type=int, help='Тест для подстановки в запросы (по умолчанию любой)')
+        parser.add_argument('--email', default='Student@Example.com')
+        parser.add_argument('--compare', action='store_true',
+                            help='Сначала показать планы без новых индексов (удаляются на копии базы)')
+
+    def handle(self, *args, **options):
+        if not options['compare']:
+            self.explain_all(options)
+            return
+        # DROP INDEX держит блокировку записи до отката: сравнение идёт на копии базы
+        if connection.vendor == 'sqlite':
+            with sqlite_copy():
+                self.explain_all(options)
+        else:
+            self.stderr.write('Сравнение на пустой тестовой БД: планы без статистики рабочих данных')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.explain_all(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def explain_all(self, options):
+        if options['test_id']:
+            test = Test.objects.filter(pk=options['test_id']).first()
+            if test is None:
+                raise CommandError(f"Тест {options['test_id']} не найден")
+        else:
+            test = Test.objects.first() or Test(pk=0, creator_id=0)
+
+        cases = self.build_cases(test, options['email'])
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('=== До: без индексов, по старым запросам ==='))
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        for name in self.INDEXES:
+                            cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
+                    self.print_plans(cases, before=True)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.stdout.write(self.style.MIGRATE_HEADING('=== После ==='))
+        self.print_plans(cases, before=False)
+
+    def build_cases(self, test, email):
+        """(view, описание, запрос до, запрос после); None — запрос не менялся"""
+        now = timezone.now()
+        finished = Attempt.objects.filter(test=test, end_time__isnull=False).select_related('student')
+        attempt = Attempt(pk=0, test=test)
+        return [
+            ('test_list', 'активные тесты', None,
+             Test.objects.filter(is_active=True)),
+            ('test_detail', 'поиск студента по email',
+             Student.objects.filter(email=email),
+             Student.objects.filter(email_normalized=Student.normalize_email(email))),
+            ('save_answer', 'ответ на вопрос в попытке', None,
+             Answer.objects.filter(attempt=attempt, question_id=0)),
+            ('take_test', 'сохранённые ответы попытки', None,
+             Answer.objects.filter(attempt=attempt)),
+            ('test_attempts', 'первая страница попыток',
+             finished.order_by('-end_time'),
+             finished.order_by('-end_time', '-id')[:51]),
+            ('test_attempts', 'страница по курсору',
+             finished.order_by('-end_time')[5000:5051],
+             finished.filter(end_time__lte=now).order_by('-end_time', '-id')[:51]),
+            ('test_attempts', 'фильтр: пройден', None,
+             finished.filter(passed=True).order_by('-end_time', '-id')[:51]),
+            ('test_attempts', 'фильтр: не пройден', None,
+             finished.filter(passed=False).order_by('-end_time', '-id')[:51]),
+            ('test_attempts', 'фильтр по учебному заведению', None,
+             finished.filter(student__institution='МГУ').order_by('-end_time', '-id')[:51]),
+            ('test_statistics', 'матрица ответов для анализа заданий', None,
+             Answer.objects.filter(attempt__test=test, attempt__end_time__isnull=False)
+             .values_list('attempt_id', 'question_id', 'points_earned', 'is_correct').order_by()),
+            ('teacher_tests', 'тесты преподавателя',
+             Test.objects.filter(creator_id=test.creator_id).order_by('-created_at'),
+             Test.objects.filter(creator_id=test.creator_id).order_by('-created_at', '-id')[:51]),
+            ('admin', 'попытки теста в порядке по умолчанию', None,
+             Attempt.objects.filter(test=test)[:100]),
+            ('grading_worker', 'выбор заданий из очереди', None,
+             GradingJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)[:10]),
+        ]
+
+    def print_plans(self, cases, before):
+        for view, description, old_query, new_query in cases:
+            query = old_query if before and old_query is not None else new_query
+            self.stdout.write(self.style.SUCCESS(f'[{view}] {description}'))
+            for line in self.explain(query).splitlines():
+                self.stdout.write(f'    {line}')
+
+    @staticmethod
+    def explain(query):
+        sql, params = query.query.sql_with_params()
+        with connection.cursor() as cursor:
+            prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            return '\n'.join(str(row[-1]) for row in rows)
+        return '\n'.join(' '.join(str(value) for value in row) for row in rows)
@@ -0,0 +1,33 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testing.models import Test
+from testing.question_bank import export_lines
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка вопросов теста в банк вопросов JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--output', help='Файл (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден")
+
+        started = time.perf_counter()
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            lines = -1  # без заголовка
+            for line in export_lines(test):
+                output.write(line)
+                lines += 1
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(f'Выгружено вопросов: {lines} за {time.perf_counter() - started:.2f} с')
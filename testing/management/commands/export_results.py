@@ -0,0 +1,49 @@
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testing.export import EXPORT_FORMATS, EXPORT_KINDS
+from testing.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка попыток или ответов теста в CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('kind', choices=sorted(EXPORT_KINDS))
+        parser.add_argument('--format', dest='file_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='Файл (по умолчанию stdout)')
+        parser.add_argument('--measure-memory', action='store_true',
+                            help='Показать пик памяти Python во время выгрузки (tracemalloc)')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден")
+
+        stream, _ = EXPORT_FORMATS[options['file_format']]
+        if options['measure_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+
+        written = 0
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in stream(EXPORT_KINDS[options['kind']](test)):
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                output.write(data)
+                written += len(data)
+        finally:
+            if options['output']:
+                output.close()
+
+        report = f'Выгружено {written / 2 ** 20:.1f} МБ за {time.perf_counter() - started:.1f} с'
+        if options['measure_memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report += f', пик памяти {peak / 2 ** 20:.1f} МБ'
+        self.stderr.write(report)
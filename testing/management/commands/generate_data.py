@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from testing.models import Student, User
+from testing.synthetic import DEFAULT_BATCH_SIZE, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные: тесты со всеми типами вопросов, студентов, '
+            'попытки и ответы (bulk_create, воспроизводимо по --seed)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--tests', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=20, help='Вопросов в тесте')
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--attempts', type=int, default=1000,
+                            help='Завершённых попыток на тест (студенты берутся по кругу)')
+        parser.add_argument('--open-attempts', type=int, default=0, help='Незавершённых попыток на тест')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', help='Префикс логинов и email (по умолчанию synthetic-<seed>)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--fast', action='store_true',
+                            help='SQLite: synchronous=OFF на время загрузки (данные не переживут сбой ОС)')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(options['seed'], options['batch_size'], options['prefix'])
+        if (User.objects.filter(username__startswith=f'{generator.prefix}-').exists()
+                or Student.objects.filter(email_normalized__startswith=f'{generator.prefix}-').exists()):
+            raise CommandError(f'Данные с префиксом {generator.prefix} уже есть: укажите другой --seed или --prefix')
+        if options['students'] < 1 or options['teachers'] < 1:
+            raise CommandError('Нужен хотя бы один преподаватель и один студент')
+
+        if options['fast'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        started = time.perf_counter()
+        teachers = generator.create_teachers(options['teachers'])
+        students = generator.create_students(options['students'])
+        per_test = options['attempts'] + options['open_attempts']
+        offset = 0
+        for number in range(options['tests']):
+            test = generator.create_test(teachers[number % len(teachers)], options['questions'])
+            # Каждому тесту — следующие per_test студентов по кругу
+            chosen = [students[(offset + i) % len(students)] for i in range(per_test)]
+            offset += per_test
+            generator.create_attempts(test, chosen[:options['attempts']])
+            generator.create_attempts(test, chosen[options['attempts']:], finished=False)
+            self.stderr.write(f"  тест {number + 1}/{options['tests']}: {generator.counts['answers']} ответов, "
+                              f'{time.perf_counter() - started:.1f} с')
+
+        elapsed = time.perf_counter() - started
+        counts = generator.counts
+        self.stdout.write(', '.join(f'{name}: {value}' for name, value in counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {elapsed:.1f} с ({counts['answers'] / elapsed:,.0f} ответов/с)"))
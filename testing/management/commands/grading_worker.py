@@ -0,0 +1,60 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from testing.grading_queue import claim_jobs, queue_stats, requeue_stale_jobs, run_job, run_regrade_job
+from testing.models import RegradeJob
+
+
+def _run_job_in_thread(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        # У каждого потока своё соединение с БД
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Обработчик очереди фоновой проверки попыток и перепроверки после правки ключей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Число потоков проверки')
+        parser.add_argument('--batch-size', type=int, default=50, help='Заданий за один забор из очереди')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза при пустой очереди, с')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Через сколько секунд задание в running считается зависшим')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь и выйти')
+        parser.add_argument('--stats', action='store_true', help='Показать состояние очереди и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+
+        stale_after = timedelta(seconds=options['stale_after'])
+        processed = regraded = 0
+        last_requeue = None
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            while True:
+                # Задания упавшего соседнего обработчика подбираются и без перезапуска этого
+                if last_requeue is None or time.monotonic() - last_requeue >= options['stale_after']:
+                    last_requeue = time.monotonic()
+                    requeued = requeue_stale_jobs(stale_after) + requeue_stale_jobs(stale_after, RegradeJob)
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f'Возвращено в очередь зависших заданий: {requeued}'))
+                job_ids = claim_jobs(options['batch_size'])
+                # Перепроверка тяжёлая: по одному заданию за проход, чтобы не задерживать проверку попыток
+                regrade_ids = claim_jobs(1, RegradeJob)
+                if not job_ids and not regrade_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                processed += sum(1 for ok in pool.map(_run_job_in_thread, job_ids) if ok)
+                regraded += sum(1 for job_id in regrade_ids if run_regrade_job(job_id))
+
+        self.stdout.write(self.style.SUCCESS(f'Проверено попыток: {processed}, перепроверено вопросов: {regraded}'))
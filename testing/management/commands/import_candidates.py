@@ -0,0 +1,54 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from testing.invitations import INVITATION_BATCH_SIZE, import_candidates, invitation_link_rows
+from testing.models import Test
+
+
+class Command(BaseCommand):
+    help = ('Массовая предрегистрация кандидатов из CSV (email, name, telegram, institution, '
+            'specialization) с персональными ссылками на тест')
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('csv_file', help='Путь к CSV в UTF-8')
+        parser.add_argument('--batch-size', type=int, default=INVITATION_BATCH_SIZE)
+        parser.add_argument('--links-output', help='Записать CSV со ссылками приглашений в файл')
+        parser.add_argument('--base-url', default='http://localhost:8000',
+                            help='Адрес сайта для ссылок в --links-output')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден")
+
+        started = time.perf_counter()
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as stream:
+                report = import_candidates(test, stream, options['batch_size'])
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f'Не удалось прочитать CSV: {exc}')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Строк: {report.rows}, новых студентов: {report.students_created}, '
+            f'обновлено: {report.students_updated}, новых приглашений: {report.invitations_created}, '
+            f'пропущено строк: {report.skipped}, уже созданы параллельно: '
+            f'студентов {report.students_skipped}, приглашений {report.invitations_skipped}'
+        )
+        for error in report.errors:
+            self.stderr.write(f'  {error}')
+        self.stdout.write(self.style.SUCCESS(f'Готово за {elapsed:.1f} с ({report.rows / max(elapsed, 1e-9):,.0f} строк/с)'))
+
+        if options['links_output']:
+            base_url = options['base_url'].rstrip('/')
+            with open(options['links_output'], 'w', encoding='utf-8', newline='') as output:
+                writer = csv.writer(output)
+                for row in invitation_link_rows(
+                        test, lambda token: base_url + reverse('testing:accept_invitation', args=[token])):
+                    writer.writerow(row)
+            self.stdout.write(f"Ссылки записаны в {options['links_output']}")
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from testing.models import Test, User
+from testing.question_bank import QuestionBankError, _records, create_test_from_header, import_lines, read_header
+
+
+class Command(BaseCommand):
+    help = 'Импорт банка вопросов JSONL в существующий тест или в новый (--new-test)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('jsonl_file')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--test-id', type=int, help='Добавить вопросы в конец теста')
+        target.add_argument('--new-test', metavar='USERNAME',
+                            help='Создать неактивный тест по заголовку файла от имени преподавателя')
+
+    def handle(self, *args, **options):
+        test = creator = None
+        if options['test_id']:
+            try:
+                test = Test.objects.get(pk=options['test_id'])
+            except Test.DoesNotExist:
+                raise CommandError(f"Тест {options['test_id']} не найден")
+        else:
+            try:
+                creator = User.objects.get(username=options['new_test'])
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {options['new_test']} не найден")
+
+        started = time.perf_counter()
+        try:
+            # Новый тест создаётся в транзакции импорта: при ошибке не остаётся пустого теста
+            with transaction.atomic():
+                if creator is not None:
+                    with open(options['jsonl_file'], encoding='utf-8-sig') as stream:
+                        test = create_test_from_header(read_header(_records(stream)), creator)
+                with open(options['jsonl_file'], encoding='utf-8-sig') as stream:
+                    imported = import_lines(test, stream)
+        except (QuestionBankError, OSError, UnicodeDecodeError) as exc:
+            raise CommandError(f'Импорт не выполнен: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Тест {test.pk} «{test.title}»: импортировано вопросов {imported} '
+            f'за {time.perf_counter() - started:.2f} с'))
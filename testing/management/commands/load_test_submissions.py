@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from testing.delivery import get_delivery_payload
+from testing.models import Question, Test, TestVersion, User
+
+QUESTION_FIELDS = ('question_text', 'question_type', 'points', 'options', 'correct_answer', 'order_number')
+
+
+def build_form_data(questions):
+    """Случайные, но корректные по форме ответы на все вопросы теста"""
+    data = {}
+    for question in questions:
+        options = question.options or {}
+        if question.question_type in ('single_choice', 'multiple_choice'):
+            ids = [str(option['id']) for option in options.get('options', [])]
+            if ids:
+                data[f'question_{question.id}'] = random.choice(ids)
+        elif question.question_type == 'matching':
+            right = [item['id'] for item in options.get('right_items', [])]
+            for left in options.get('left_items', []):
+                if right:
+                    data[f"match_{question.id}_{left['id']}"] = random.choice(right)
+        elif question.question_type == 'matrix':
+            cols = [col['id'] for col in options.get('cols', [])]
+            for row in options.get('rows', []):
+                if cols:
+                    data[f"matrix_{question.id}_{row['id']}"] = random.choice(cols)
+        else:
+            data[f'question_{question.id}'] = str(random.randint(0, 9))
+    return data
+
+
+def copy_test(source, questions):
+    """Тест с теми же настройками и вопросами во временной БД; доступен на ближайшие сутки"""
+    creator = User.objects.create(username='loadtest', role='teacher')
+    now = timezone.now()
+    test = Test.objects.create(
+        creator=creator, title=source.title, description=source.description,
+        start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1),
+        passing_threshold=source.passing_threshold, notification_type=source.notification_type,
+    )
+    for question in questions:
+        Question.objects.create(test=test, **question)
+    # Версия публикуется до запуска процессов, иначе они одновременно создают её при первой попытке
+    TestVersion.current_id(test.pk)
+    return test
+
+
+def _new_stats():
+    return {'ok': 0, 'locked': 0, 'errors': 0, 'latencies': [], 'messages': set()}
+
+
+def _submitter(test, form_data, emails, stats):
+    """Один конкурентный студент: регистрация и отправка формы для каждого email"""
+    host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    client = Client(HTTP_HOST=host)
+    register_url = reverse('testing:test_detail', args=[test.access_link])
+    try:
+        for email in emails:
+            started = time.perf_counter()
+            try:
+                response = client.post(register_url, {'name': 'Нагрузочный тест', 'email': email})
+                if response.status_code != 302:
+                    raise RuntimeError(f'регистрация: HTTP {response.status_code}')
+                response = client.post(response.url, form_data)
+                if response.status_code != 302:
+                    raise RuntimeError(f'отправка: HTTP {response.status_code}')
+            except OperationalError as exc:
+                key = 'locked' if 'locked' in str(exc) or 'busy' in str(exc) else 'errors'
+                stats[key] += 1
+                stats['messages'].add(str(exc))
+            except Exception as exc:
+                stats['errors'] += 1
+                stats['messages'].add(repr(exc))
+            else:
+                stats['ok'] += 1
+                stats['latencies'].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+
+
+def _run_process(args):
+    test_id, run_id, process_index, threads, submissions, mode = args
+    # Соединение родителя после fork использовать нельзя
+    connections.close_all()
+    thread_stats = [_new_stats() for _ in range(threads)]
+    with override_settings(GRADING_MODE=mode):
+        test = Test.objects.get(pk=test_id)
+        version = TestVersion.objects.get(pk=TestVersion.current_id(test_id))
+        form_data = build_form_data(get_delivery_payload(version))
+        connection.close()
+        workers = [
+            threading.Thread(target=_submitter, args=(test, form_data, [
+                f'loadtest-{run_id}-{process_index}-{thread}-{i}@example.com' for i in range(submissions)
+            ], thread_stats[thread]))
+            for thread in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    stats = _new_stats()
+    for part in thread_stats:
+        for key in ('ok', 'locked', 'errors'):
+            stats[key] += part[key]
+        stats['latencies'] += part['latencies']
+        stats['messages'] |= part['messages']
+    stats['messages'] = sorted(stats['messages'])
+    return stats
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест отправки попыток: на копии теста во временной БД N процессов × T потоков '
+            'одновременно регистрируются и отправляют тест, считаются ошибки "database is locked"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int, help='Тест-образец: его вопросы копируются во временную БД')
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--threads', type=int, default=4, help='Одновременных студентов в процессе')
+        parser.add_argument('--submissions', type=int, default=10, help='Отправок на одного студента')
+        parser.add_argument('--mode', choices=['sync', 'group', 'async'], default=settings.GRADING_MODE,
+                            help='Режим приёма попыток (по умолчанию settings.GRADING_MODE)')
+        parser.add_argument('--keep', action='store_true', help='Не удалять временную БД после прогона')
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Нужна платформа с fork')
+        try:
+            source = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден")
+        questions = list(source.questions.current().values(*QUESTION_FIELDS))
+        if not questions:
+            raise CommandError('В тесте нет вопросов')
+
+        # Рабочая БД не трогается: прогон идёт на копии теста во временной файловой БД
+        if connection.vendor == 'sqlite':
+            workdir = tempfile.mkdtemp(prefix='loadtest-')
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(workdir, 'loadtest.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            test = copy_test(source, questions)
+            self.run_load(test, options)
+        finally:
+            connections.close_all()
+            if options['keep']:
+                self.stdout.write(f"Временная БД сохранена: {connection.settings_dict['NAME']}")
+            else:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_load(self, test, options):
+        run_id = uuid.uuid4().hex[:8]
+        total = options['processes'] * options['threads'] * options['submissions']
+        self.stdout.write(
+            f"Профиль SQLite: {getattr(settings, 'SQLITE_PROFILE', 'default')}, режим: {options['mode']}, "
+            f"процессов: {options['processes']}, студентов: {options['processes'] * options['threads']}, "
+            f"отправок: {total}"
+        )
+
+        connections.close_all()
+        jobs = [
+            (test.pk, run_id, index, options['threads'], options['submissions'], options['mode'])
+            for index in range(options['processes'])
+        ]
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+            results = pool.map(_run_process, jobs)
+        elapsed = time.perf_counter() - started
+
+        ok = sum(result['ok'] for result in results)
+        locked = sum(result['locked'] for result in results)
+        errors = sum(result['errors'] for result in results)
+        latencies = sorted(latency for result in results for latency in result['latencies'])
+        self.stdout.write(f'Успешно: {ok}/{total} за {elapsed:.1f} с ({ok / elapsed:.1f} отправок/с)')
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f'Задержка регистрация+отправка: p50 {statistics.median(latencies) * 1000:.0f} мс, '
+                f'p95 {p95 * 1000:.0f} мс'
+            )
+        style = self.style.SUCCESS if not locked and not errors else self.style.ERROR
+        self.stdout.write(style(f'Ошибок блокировки: {locked}, прочих ошибок: {errors}'))
+        for message in sorted({message for result in results for message in result['messages']})[:10]:
+            self.stdout.write(f'    {message}')
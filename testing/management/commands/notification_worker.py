@@ -0,0 +1,46 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from testing.notifications import (NotificationDispatcher, claim_notifications, outbox_stats,
+                                   requeue_stale_notifications)
+
+
+class Command(BaseCommand):
+    help = 'Обработчик outbox уведомлений о результатах (email, Telegram)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Уведомлений за один забор из outbox')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Пауза при пустом outbox, с')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Через сколько секунд уведомление в sending считается зависшим')
+        parser.add_argument('--once', action='store_true', help='Разобрать outbox и выйти')
+        parser.add_argument('--stats', action='store_true', help='Показать состояние outbox и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_stats(), indent=2))
+            return
+
+        stale_after = timedelta(seconds=options['stale_after'])
+        dispatcher = NotificationDispatcher()
+        sent = 0
+        last_requeue = None
+        while True:
+            # Уведомления упавшего соседнего обработчика подбираются и без перезапуска этого
+            if last_requeue is None or time.monotonic() - last_requeue >= options['stale_after']:
+                last_requeue = time.monotonic()
+                requeued = requeue_stale_notifications(stale_after)
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Возвращено в outbox зависших уведомлений: {requeued}'))
+            notification_ids = claim_notifications(options['batch_size'])
+            if not notification_ids:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            sent += dispatcher.send_batch(notification_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Отправлено уведомлений: {sent}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from testing.models import Test, TestStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает накопительную статистику тестов по завершённым попыткам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help='id тестов (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or list(Test.objects.values_list('pk', flat=True))
+        TestStats.rebuild(test_ids)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано тестов: {len(test_ids)}'))
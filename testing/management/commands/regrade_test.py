@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, Min
+
+from testing.models import Answer, Question, Test
+from testing.regrade import REGRADE_CHUNK_SIZE, lineage_key, question_successors, recalculate_attempts
+
+
+def _init_worker():
+    # Каждый процесс открывает собственное соединение с БД
+    django.setup()
+    connections.close_all()
+
+
+def _grade_range(test_id, start_pk, end_pk):
+    """Проверяет ответы теста с pk в [start_pk, end_pk); возвращает изменившиеся"""
+    # Ответ на заменённую строку проверяется исправленным ключом её последней копии
+    questions = {question.pk: question for question in Question.objects.filter(test_id=test_id)}
+    successors = question_successors(Test(pk=test_id))
+    keys = {pk: lineage_key(question, questions.get(successors.get(pk))) for pk, question in questions.items()}
+    answers = Answer.objects.filter(
+        question__test_id=test_id, pk__gte=start_pk, pk__lt=end_pk
+    ).values_list('pk', 'attempt_id', 'question_id', 'student_answer', 'answer_mask', 'is_correct', 'points_earned')
+
+    changed = []
+    for pk, attempt_id, question_id, student_answer, mask, is_correct, points_earned in answers.iterator():
+        question_key = keys.get(question_id)
+        if question_key is None:
+            continue
+        new_is_correct, new_points, new_mask = question_key.evaluate(student_answer)
+        if new_is_correct != is_correct or new_points != points_earned or new_mask != mask:
+            changed.append((pk, attempt_id, new_is_correct, new_points, new_mask))
+    return changed
+
+
+class Command(BaseCommand):
+    help = 'Полная перепроверка всех ответов теста (параллельно в пуле процессов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--workers', type=int, default=4, help='Число процессов проверки')
+        parser.add_argument('--chunk-size', type=int, default=REGRADE_CHUNK_SIZE * 5,
+                            help='Диапазон первичных ключей ответов на одну задачу')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(pk=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Тест {options['test_id']} не найден")
+
+        bounds = Answer.objects.filter(question__test=test).aggregate(lo=Min('pk'), hi=Max('pk'))
+        if bounds['lo'] is None:
+            self.stdout.write('Ответов нет')
+            return
+
+        chunk_size = options['chunk_size']
+        ranges = [(start, start + chunk_size) for start in range(bounds['lo'], bounds['hi'] + 1, chunk_size)]
+
+        # Соединение родителя не должно наследоваться дочерними процессами
+        connections.close_all()
+
+        changed_total = 0
+        attempt_ids = set()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_grade_range, test.pk, start, end) for start, end in ranges]
+            # Записывает только родитель: один писатель не конкурирует за блокировку SQLite
+            for future in futures:
+                changed = future.result()
+                if not changed:
+                    continue
+                with transaction.atomic():
+                    Answer.objects.bulk_update(
+                        [Answer(pk=pk, is_correct=ok, points_earned=points, answer_mask=mask)
+                         for pk, _, ok, points, mask in changed],
+                        ['is_correct', 'points_earned', 'answer_mask'],
+                        batch_size=REGRADE_CHUNK_SIZE,
+                    )
+                changed_total += len(changed)
+                attempt_ids.update(attempt_id for _, attempt_id, _, _, _ in changed)
+
+        recalculate_attempts(test, attempt_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Изменено ответов: {changed_total}, пересчитано попыток: {len(attempt_ids)}'
+        ))
@@ -0,0 +1,259 @@
+"""
+Метрики в формате Prometheus: счётчики и гистограммы в памяти процесса.
+
+Значения копятся в словаре процесса и не реже раза в METRICS_FLUSH_INTERVAL
+секунд (а также при выходе процесса и перед выдачей /metrics/) записываются
+в общий файл SQLite METRICS_DB строками «процесс — сэмпл — значение».
+Выдача суммирует строки всех процессов, поэтому метрики верны при нескольких
+воркерах gunicorn/uwsgi и для manage.py grading_worker. Строки завершившихся
+процессов остаются в файле, так что счётчики не уменьшаются при перезапуске
+воркера; при деплое файл можно удалить вместе с историей Prometheus.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Секунды: от быстрых view до тяжёлых отправок
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Проверка одного ответа скомпилированным ключом — микросекунды
+ANSWER_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    process TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (process, metric, sample, labels)
+)
+"""
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+class _ProcessStore:
+    """Значения метрик текущего процесса и их запись в общий файл"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        # pid может повториться после перезапуска, поэтому добавляется случайный суффикс
+        self.process = f'{socket.gethostname()}:{self.pid}:{uuid.uuid4().hex[:8]}'
+        self.values = {}
+        self.dirty = set()
+        self.last_flush = time.monotonic()
+
+    def add(self, items):
+        """items — [(metric, sample, labels, amount)]"""
+        with self._lock:
+            if self.pid != os.getpid():
+                # Дочерний процесс после fork: значения родителя учитывает сам родитель
+                self._reset()
+            for metric, sample, labels, amount in items:
+                key = (metric, sample, labels)
+                self.values[key] = self.values.get(key, 0) + amount
+                self.dirty.add(key)
+            if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            if self.pid == os.getpid():
+                self._flush()
+
+    def _connect(self):
+        db = sqlite3.connect(settings.METRICS_DB, timeout=10)
+        if not self._schema_ready:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(_SCHEMA)
+            self._schema_ready = True
+        return db
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        rows = [(self.process, *key, self.values[key]) for key in self.dirty]
+        try:
+            db = self._connect()
+            try:
+                with db:
+                    # Пишется абсолютное значение процесса, повторная запись не удваивает счётчик
+                    db.executemany(
+                        'INSERT INTO samples (process, metric, sample, labels, value) VALUES (?, ?, ?, ?, ?) '
+                        'ON CONFLICT (process, metric, sample, labels) DO UPDATE SET value = excluded.value',
+                        rows,
+                    )
+            finally:
+                db.close()
+        except sqlite3.Error:
+            # Метрики не должны ломать запросы: значения останутся «грязными» до следующей попытки
+            logger.warning('metrics flush failed db=%s', settings.METRICS_DB, exc_info=True)
+        else:
+            self.dirty.clear()
+
+    def totals(self):
+        """{(metric, sample, labels): сумма по всем процессам}"""
+        self.flush()
+        try:
+            db = self._connect()
+            try:
+                rows = db.execute(
+                    'SELECT metric, sample, labels, SUM(value) FROM samples GROUP BY metric, sample, labels'
+                ).fetchall()
+            finally:
+                db.close()
+        except sqlite3.Error:
+            logger.warning('metrics read failed db=%s', settings.METRICS_DB, exc_info=True)
+            with self._lock:
+                return dict(self.values)
+        return {(metric, sample, labels): value for metric, sample, labels, value in rows}
+
+
+_store = _ProcessStore()
+atexit.register(_store.flush)
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._label_keys = {}
+        REGISTRY[name] = self
+
+    def _labels(self, labels):
+        """Метки в каноническом виде (JSON) — часть ключа сэмпла"""
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        key = self._label_keys.get(values)
+        if key is None:
+            key = self._label_keys[values] = json.dumps(dict(zip(self.labelnames, values)), ensure_ascii=False)
+        return key
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if enabled():
+            _store.add([(self.name, '', self._labels(labels), amount)])
+
+    def samples(self, totals):
+        for labels, value in sorted(totals.get('', {}).items()):
+            yield self.name, json.loads(labels), value
+
+
+class Histogram(Metric):
+    """
+    Гистограмма Prometheus. В хранилище пишется номер «своей» корзины
+    наблюдения, накопительные значения le считаются при выдаче.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not enabled():
+            return
+        labels = self._labels(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        _store.add([
+            (self.name, f'bucket:{bucket}', labels, 1),
+            (self.name, 'sum', labels, value),
+            (self.name, 'count', labels, 1),
+        ])
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, totals):
+        label_sets = sorted(totals.get('count', {}))
+        bounds = [*self.buckets, float('inf')]
+        for labels in label_sets:
+            decoded = json.loads(labels)
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += totals.get(f'bucket:{index}', {}).get(labels, 0)
+                yield f'{self.name}_bucket', {**decoded, 'le': _format_value(bound)}, cumulative
+            yield f'{self.name}_sum', decoded, totals.get('sum', {}).get(labels, 0)
+            yield f'{self.name}_count', decoded, totals['count'][labels]
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus 0.0.4 (сумма по процессам)"""
+    by_metric = {}
+    for (metric, sample, labels), value in _store.totals().items():
+        by_metric.setdefault(metric, {}).setdefault(sample, {})[labels] = value
+
+    lines = []
+    for name in sorted(REGISTRY):
+        metric = REGISTRY[name]
+        lines.append(f'# HELP {name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for sample, labels, value in metric.samples(by_metric.get(name, {})):
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f'{sample}{{{label_text}}} {_format_value(value)}' if label_text
+                         else f'{sample} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+ATTEMPTS_STARTED = Counter('testing_attempts_started_total', 'Начатые попытки (регистрация на тест)')
+ATTEMPTS_FINISHED = Counter('testing_attempts_finished_total', 'Завершённые попытки с выставленным баллом')
+ANSWERS_GRADED = Counter('testing_answers_graded_total', 'Проверенные ответы', ['question_type', 'correct'])
+TAKE_TEST_POST_SECONDS = Histogram(
+    'testing_take_test_post_seconds', 'Время POST take_test (отправка попытки)', ['mode'])
+GRADING_SECONDS = Histogram(
+    'testing_grading_seconds', 'Проверка и запись отправленной попытки (finalize_attempt)')
+ANSWER_GRADING_SECONDS = Histogram(
+    'testing_answer_grading_seconds', 'Проверка одного ответа ключом', ['question_type'], buckets=ANSWER_BUCKETS)
+NOTIFICATIONS_SENT = Counter(
+    'testing_notifications_total', 'Попытки отправки уведомлений о результатах', ['channel', 'status'])
+CALCULATE_SCORE_SECONDS = Histogram(
+    'testing_calculate_score_seconds', 'Проверка ответов и подсчёт балла попытки в finalize_attempt')
+
+
+def observe_answer_graded(question_type, is_correct, duration):
+    ANSWERS_GRADED.inc(question_type=question_type, correct='true' if is_correct else 'false')
+    ANSWER_GRADING_SECONDS.observe(duration, question_type=question_type)
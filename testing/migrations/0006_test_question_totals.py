@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:04
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def fill_question_totals(apps, schema_editor):
+    Test = apps.get_model('testing', 'Test')
+    tests = Test.objects.annotate(
+        actual_count=Count('questions'),
+        actual_points=Sum('questions__points'),
+        max_order=Max('questions__order_number'),
+    )
+    for test in list(tests):
+        Test.objects.filter(pk=test.pk).update(
+            question_count=test.actual_count,
+            total_points=test.actual_points or 0,
+            next_order_number=(test.max_order or 0) + 1,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0005_test_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='next_order_number',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество вопросов'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='total_points',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сумма баллов'),
+        ),
+        migrations.RunPython(fill_question_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_running_totals(apps, schema_editor):
+    Attempt = apps.get_model('testing', 'Attempt')
+    totals = Attempt.objects.annotate(
+        earned=Sum('answers__points_earned'), answered=Count('answers'),
+    ).values_list('pk', 'earned', 'answered')
+    for pk, earned, answered in list(totals):
+        Attempt.objects.filter(pk=pk).update(points_earned=earned or 0, answered_count=answered)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0006_test_question_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='idempotency_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Отвечено вопросов'),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='points_earned',
+            field=models.FloatField(default=0.0, verbose_name='Набрано баллов'),
+        ),
+        migrations.RunPython(fill_running_totals, migrations.RunPython.noop),
+    ]
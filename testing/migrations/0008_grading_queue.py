@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0007_attempt_running_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='grading_pending',
+            field=models.BooleanField(default=False, verbose_name='Ожидает проверки'),
+        ),
+        migrations.CreateModel(
+            name='GradingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_answers', models.JSONField(default=dict, verbose_name='Ответы студента')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Проверяется'), ('done', 'Проверено'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('tries', models.PositiveIntegerField(default=0, verbose_name='Попыток проверки')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grading_job', to='testing.attempt')),
+            ],
+            options={
+                'verbose_name': 'Задание проверки',
+                'verbose_name_plural': 'Задания проверки',
+                'db_table': 'grading_jobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='grading_job_status_02a321_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+
+def fill_test_stats(apps, schema_editor):
+    Attempt = apps.get_model('testing', 'Attempt')
+    TestStats = apps.get_model('testing', 'TestStats')
+    rows = Attempt.objects.filter(end_time__isnull=False, grading_pending=False).values('test_id').annotate(
+        attempts_count=Count('id'),
+        passed_count=Count('id', filter=Q(passed=True)),
+        score_sum=Sum('score'),
+        score_sq_sum=Sum(F('score') * F('score')),
+        score_min=Min('score'),
+        score_max=Max('score'),
+    ).order_by()
+    TestStats.objects.bulk_create([TestStats(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0008_grading_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestStats',
+            fields=[
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='testing.test')),
+                ('attempts_count', models.PositiveIntegerField(default=0, verbose_name='Завершённых попыток')),
+                ('passed_count', models.PositiveIntegerField(default=0, verbose_name='Пройдено')),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('score_sq_sum', models.FloatField(default=0.0)),
+                ('score_min', models.FloatField(blank=True, null=True, verbose_name='Минимальный балл')),
+                ('score_max', models.FloatField(blank=True, null=True, verbose_name='Максимальный балл')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Статистика теста',
+                'verbose_name_plural': 'Статистика тестов',
+                'db_table': 'test_stats',
+            },
+        ),
+        migrations.RunPython(fill_test_stats, migrations.RunPython.noop),
+    ]
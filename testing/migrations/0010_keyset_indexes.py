@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0009_test_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['test', 'end_time', 'id'], name='attempts_test_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['test', 'passed', 'end_time', 'id'], name='attempts_test_passed_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['institution'], name='students_institution_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['creator', 'created_at', 'id'], name='tests_creator_created_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_email_normalized(apps, schema_editor):
+    """Заполняет нормализованный email; дубликаты студентов сливаются в самую раннюю запись"""
+    Student = apps.get_model('testing', 'Student')
+    Attempt = apps.get_model('testing', 'Attempt')
+    kept = {}
+    for pk, email in Student.objects.order_by('pk').values_list('pk', 'email').iterator():
+        normalized = (email or '').strip().lower()
+        if normalized in kept:
+            Attempt.objects.filter(student_id=pk).update(student_id=kept[normalized])
+            Student.objects.filter(pk=pk).delete()
+        else:
+            kept[normalized] = pk
+            Student.objects.filter(pk=pk).update(email_normalized=normalized)
+
+
+def dedupe_answers(apps, schema_editor):
+    """
+    Оставляет последний ответ на вопрос в попытке и пересчитывает итоги попытки:
+    баллы, число ответов, а у завершённых ещё score/passed. Затем пересобирает
+    TestStats (заполнена в 0009) для затронутых тестов.
+    """
+    Answer = apps.get_model('testing', 'Answer')
+    Attempt = apps.get_model('testing', 'Attempt')
+    TestStats = apps.get_model('testing', 'TestStats')
+    duplicates = list(
+        Answer.objects.values('attempt_id', 'question_id').order_by()
+        .annotate(rows=Count('id'), last_id=Max('id')).filter(rows__gt=1)
+    )
+    for row in duplicates:
+        Answer.objects.filter(attempt_id=row['attempt_id'], question_id=row['question_id']).exclude(
+            pk=row['last_id']).delete()
+
+    attempts = Attempt.objects.filter(pk__in={row['attempt_id'] for row in duplicates}).values_list(
+        'pk', 'test_id', 'end_time', 'test__total_points', 'test__passing_threshold')
+    test_ids = set()
+    for attempt_id, test_id, end_time, total_points, passing_threshold in list(attempts):
+        totals = Answer.objects.filter(attempt_id=attempt_id).aggregate(
+            earned=Sum('points_earned'), answered=Count('id'))
+        earned = totals['earned'] or 0
+        updates = {'points_earned': earned, 'answered_count': totals['answered']}
+        if end_time is not None:
+            # Как Attempt.apply_score на момент миграции
+            score = earned / total_points * 100 if total_points > 0 else 0
+            updates.update(score=score, passed=total_points > 0 and score >= passing_threshold)
+            test_ids.add(test_id)
+        Attempt.objects.filter(pk=attempt_id).update(**updates)
+
+    for test_id in test_ids:
+        totals = Attempt.objects.filter(test_id=test_id, end_time__isnull=False, grading_pending=False).aggregate(
+            attempts_count=Count('id'),
+            passed_count=Count('id', filter=Q(passed=True)),
+            score_sum=Coalesce(Sum('score'), Value(0.0)),
+            score_sq_sum=Coalesce(Sum(F('score') * F('score')), Value(0.0)),
+            score_min=Min('score'),
+            score_max=Max('score'),
+        )
+        TestStats.objects.update_or_create(test_id=test_id, defaults=totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0010_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='email_normalized',
+            field=models.EmailField(editable=False, max_length=254, null=True, verbose_name='Email (нормализованный)'),
+        ),
+        migrations.RunPython(fill_email_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='student',
+            name='email_normalized',
+            field=models.EmailField(editable=False, max_length=254, unique=True, verbose_name='Email (нормализованный)'),
+        ),
+        migrations.RunPython(dedupe_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='answers_attempt_question_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='attempt',
+            name='attempts_test_passed_end_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(condition=models.Q(('passed', True)), fields=['test', 'end_time', 'id'], name='attempts_test_passed_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(condition=models.Q(('passed', False)), fields=['test', 'end_time', 'id'], name='attempts_test_failed_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['test', '-start_time'], name='attempts_test_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='tests_active_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import testing.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0011_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invitation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=testing.models.generate_invitation_token, editable=False, max_length=32, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('used_at', models.DateTimeField(blank=True, null=True, verbose_name='Первый переход')),
+                ('attempt', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invitation', to='testing.attempt')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invitations', to='testing.student')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invitations', to='testing.test')),
+            ],
+            options={
+                'verbose_name': 'Приглашение',
+                'verbose_name_plural': 'Приглашения',
+                'db_table': 'invitations',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='invitation',
+            constraint=models.UniqueConstraint(fields=('test', 'student'), name='invitations_test_student_uniq'),
+        ),
+    ]
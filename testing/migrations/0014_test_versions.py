@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def publish_existing_versions(apps, schema_editor):
+    """
+    Попытки до версионирования видели вопросы, изменявшиеся на месте; точнее
+    текущего содержимого их версию не восстановить. Каждый тест с попытками
+    получает версию с номером content_version, все его попытки ссылаются на неё.
+    """
+    Test = apps.get_model('testing', 'Test')
+    TestVersion = apps.get_model('testing', 'TestVersion')
+    Attempt = apps.get_model('testing', 'Attempt')
+    tests = Test.objects.filter(attempts__isnull=False).distinct().values_list(
+        'pk', 'content_version', 'question_count', 'total_points')
+    for test_id, content_version, question_count, total_points in list(tests):
+        version = TestVersion.objects.create(test_id=test_id, number=content_version,
+                                             question_count=question_count, total_points=total_points)
+        Attempt.objects.filter(test_id=test_id).update(version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0013_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер версии')),
+                ('question_count', models.PositiveIntegerField(default=0, verbose_name='Количество вопросов')),
+                ('total_points', models.IntegerField(default=0, verbose_name='Сумма баллов')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Версия теста',
+                'verbose_name_plural': 'Версии теста',
+                'db_table': 'test_versions',
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='added_in',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлен в версии'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='removed_in',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Удалён в версии'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='source',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='testing.question', verbose_name='Исходный вопрос'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['test', 'added_in'], name='questions_test_added_idx'),
+        ),
+        migrations.AddField(
+            model_name='testversion',
+            name='test',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='testing.test'),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='testing.testversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='testversion',
+            constraint=models.UniqueConstraint(fields=('test', 'number'), name='test_versions_test_number_uniq'),
+        ),
+        migrations.RunPython(publish_existing_versions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attempt',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='testing.testversion'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:52
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 2000
+MASK_BITS = 63
+COLUMN_TABLE = str.maketrans({'A': 'А', 'B': 'Б', 'C': 'В', 'D': 'Г', 'E': 'Д', 'F': 'Е'})
+
+
+# Копия кодирования из testing.answer_keys на момент миграции: повтор миграции
+# не должен зависеть от того, как код ключей изменится потом
+def choice_encoder(question_type, options):
+    items = options.get('options') or []
+    if len(items) > MASK_BITS:
+        return None
+    bits = {str(item.get('id')): 1 << index for index, item in enumerate(items)}
+
+    def encode(student_answer):
+        if question_type == 'single_choice':
+            answer = student_answer.get('answer')
+            values = [] if answer in (None, '') else [answer]
+        else:
+            values = student_answer.get('answers', [])
+        mask = 0
+        for value in values:
+            bit = bits.get(str(value))
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+    return encode
+
+
+def matrix_encoder(options):
+    row_ids = [str(row.get('id')) for row in options.get('rows', [])]
+    cols = options.get('cols', [])
+    if not row_ids or not cols or len(row_ids) * len(cols) > MASK_BITS:
+        return None
+    row_offsets = {row_id: index * len(cols) for index, row_id in enumerate(row_ids)}
+    col_bits = {str(col.get('id')).strip().upper().translate(COLUMN_TABLE): 1 << index
+                for index, col in enumerate(cols)}
+
+    def encode(student_answer):
+        student_matrix = student_answer.get('matrix') or {}
+        mask = 0
+        for row_id, offset in row_offsets.items():
+            for col in student_matrix.get(row_id) or ():
+                bit = col_bits.get(col)
+                if bit is None:
+                    return None
+                mask |= bit << offset
+        return mask
+    return encode
+
+
+def backfill_answer_masks(apps, schema_editor):
+    """Маски уже сохранённых ответов на вопросы с выбором по раскладке их строки вопроса"""
+    Question = apps.get_model('testing', 'Question')
+    Answer = apps.get_model('testing', 'Answer')
+    questions = Question.objects.filter(
+        question_type__in=('single_choice', 'multiple_choice', 'matrix'),
+    ).only('id', 'question_type', 'options')
+    for question in questions.iterator():
+        options = question.options or {}
+        if question.question_type == 'matrix':
+            encode = matrix_encoder(options)
+        else:
+            encode = choice_encoder(question.question_type, options)
+        if encode is None:
+            continue
+        chunk = []
+        for answer in Answer.objects.filter(question=question).only('id', 'student_answer').iterator(
+                chunk_size=BACKFILL_CHUNK_SIZE):
+            answer.answer_mask = encode(answer.student_answer or {})
+            if answer.answer_mask is not None:
+                chunk.append(answer)
+            if len(chunk) >= BACKFILL_CHUNK_SIZE:
+                Answer.objects.bulk_update(chunk, ['answer_mask'])
+                chunk = []
+        if chunk:
+            Answer.objects.bulk_update(chunk, ['answer_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0014_test_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='answer_mask',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Маска ответа'),
+        ),
+        migrations.RunPython(backfill_answer_masks, migrations.RunPython.noop),
+    ]
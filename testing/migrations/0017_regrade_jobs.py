@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0016_grading_retry_backoff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegradeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Проверяется'), ('done', 'Проверено'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('tries', models.PositiveIntegerField(default=0, verbose_name='Попыток перепроверки')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('next_try_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regrade_jobs', to='testing.question')),
+            ],
+            options={
+                'verbose_name': 'Задание перепроверки',
+                'verbose_name_plural': 'Задания перепроверки',
+                'db_table': 'regrade_jobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='regrade_job_status_ebba49_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testing', '0017_regrade_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='attempt',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='testing.attempt'),
+        ),
+    ]
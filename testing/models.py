@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import json
+import secrets
+import time
 import uuid
 
+from .answer_keys import compile_question
+from .metrics import observe_answer_graded
+
 
 class User(AbstractUser):
     """Пользователи системы (организаторы)"""
@@ -43,32 +50,124 @@ class Test(models.Model):
         blank=True,
         null=True
     )
+    content_version = models.PositiveIntegerField(default=0, editable=False)
+    # Денормализованные итоги по вопросам, поддерживаются сигналами Question
+    total_points = models.IntegerField(default=0, editable=False, verbose_name='Сумма баллов')
+    question_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество вопросов')
+    next_order_number = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    COUNTER_FIELDS = ('content_version', 'total_points', 'question_count', 'next_order_number')
+
     def save(self, *args, **kwargs):
         if not self.access_link:
             self.access_link = str(uuid.uuid4())[:8]
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Счётчики меняются только сигналами вопросов (F-выражениями),
+            # устаревший экземпляр не должен откатывать их назад
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def is_available(self):
         now = timezone.now()
         return self.is_active and self.start_date <= now <= self.end_date
 
+    @classmethod
+    def lock_next_version(cls, test_id):
+        """
+        Номер версии, которую создаст текущее изменение вопросов (content_version + 1).
+        Блокирует строку теста до конца транзакции: публикация версии и правка вопросов
+        не пересекаются.
+        """
+        return cls.objects.select_for_update().values_list('content_version', flat=True).get(pk=test_id) + 1
+
     def get_total_points(self):
-        return sum(q.points for q in self.questions.all())
+        return self.total_points
 
     class Meta:
         db_table = 'tests'
         verbose_name = 'Тест'
         verbose_name_plural = 'Тесты'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset-пагинация списка тестов преподавателя
+            models.Index(fields=['creator', 'created_at', 'id'], name='tests_creator_created_idx'),
+            # Публичный список активных тестов. Частичный индекс: Django пишет фильтр
+            # по BooleanField как WHERE "is_active", и составной индекс SQLite не использует
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True), name='tests_active_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class TestVersion(models.Model):
+    """
+    Опубликованный неизменяемый снимок вопросов теста: состояние на момент
+    content_version == number. Создаётся при старте первой попытки на этом
+    содержимом; вопросы версии — Question.objects.in_version(test_id, number).
+    Содержимое версии не меняется, поэтому всё производное от неё (ключ ответов,
+    вопросы для выдачи, страница результата) кэшируется по id версии бессрочно.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField(verbose_name='Номер версии')
+    question_count = models.PositiveIntegerField(default=0, verbose_name='Количество вопросов')
+    total_points = models.IntegerField(default=0, verbose_name='Сумма баллов')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'test_versions'
+        verbose_name = 'Версия теста'
+        verbose_name_plural = 'Версии теста'
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'number'], name='test_versions_test_number_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.test_id} v{self.number}"
+
+    @property
+    def questions(self):
+        return Question.objects.in_version(self.test_id, self.number)
+
+    @classmethod
+    def current_id(cls, test_id):
+        """id опубликованной версии текущего содержимого теста; публикует её при первом обращении"""
+        version_id = cls.objects.filter(
+            test_id=test_id,
+            number=Test.objects.filter(pk=test_id).values('content_version')[:1],
+        ).values_list('pk', flat=True).first()
+        if version_id is None:
+            with transaction.atomic():
+                content_version, question_count, total_points = Test.objects.select_for_update().values_list(
+                    'content_version', 'question_count', 'total_points').get(pk=test_id)
+                version, _ = cls.objects.get_or_create(
+                    test_id=test_id, number=content_version,
+                    defaults={'question_count': question_count, 'total_points': total_points},
+                )
+                version_id = version.pk
+        return version_id
+
+
+class QuestionQuerySet(models.QuerySet):
+    def current(self):
+        """Вопросы текущего (редактируемого) содержимого теста"""
+        return self.filter(removed_in__isnull=True)
+
+    def in_version(self, test_id, number):
+        return self.filter(test_id=test_id, added_in__lte=number).filter(
+            Q(removed_in__isnull=True) | Q(removed_in__gt=number))
+
+
 class Question(models.Model):
-    """Вопросы теста"""
+    """
+    Вопросы теста. Строка, вошедшая в опубликованную версию, больше не меняется:
+    правка создаёт копию (копирование при записи), удаление лишь помечает
+    removed_in. Неизменённые вопросы общие для всех версий, в которые входят.
+    """
     QUESTION_TYPES = [
         ('single_choice', 'Один вариант ответа'),
         ('multiple_choice', 'Множественный выбор'),
@@ -87,21 +186,91 @@ class Question(models.Model):
     options = models.JSONField(default=dict, verbose_name='Варианты ответов')
     correct_answer = models.JSONField(default=dict, verbose_name='Правильный ответ')
     order_number = models.IntegerField(default=0, verbose_name='Порядковый номер')
+    # Вопрос входит в версии теста с номерами added_in <= N < removed_in
+    added_in = models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлен в версии')
+    removed_in = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Удалён в версии')
+    source = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                               related_name='+', verbose_name='Исходный вопрос')
+
+    objects = QuestionQuerySet.as_manager()
+
+    # Содержимое вопроса: его правка опубликованной строки создаёт копию
+    CONTENT_FIELDS = ('test_id', 'question_text', 'question_type', 'points', 'options', 'correct_answer',
+                      'order_number')
 
     class Meta:
         db_table = 'questions'
         verbose_name = 'Вопрос'
         verbose_name_plural = 'Вопросы'
         ordering = ['order_number']
+        indexes = [
+            models.Index(fields=['test', 'added_in'], name='questions_test_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.order_number}. {self.question_text[:50]}"
 
+    def is_published(self):
+        """Входит ли строка в опубликованную версию (тогда её нельзя менять на месте)"""
+        return TestVersion.objects.filter(test_id=self.test_id, number__gte=self.added_in).exists()
+
+    def save(self, *args, **kwargs):
+        # Счётчики теста обновляются сигналами в той же транзакции
+        with transaction.atomic():
+            self._replaces = None
+            if self._state.adding or self.pk is None:
+                self.added_in = Test.lock_next_version(self.test_id)
+            else:
+                stored = Question.objects.filter(pk=self.pk).values_list(
+                    'test_id', 'added_in', 'removed_in', *self.CONTENT_FIELDS).first()
+                Test.lock_next_version(stored[0] if stored else self.test_id)
+                if stored and stored[2] is not None:
+                    raise ValueError(f'Вопрос исключён из теста в версии {stored[2]} и не изменяется')
+                # Сохранение без изменений не создаёт копию и не сдвигает версию теста
+                if stored and stored[3:] == tuple(getattr(self, field) for field in self.CONTENT_FIELDS):
+                    return
+                if stored and TestVersion.objects.filter(test_id=stored[0], number__gte=stored[1]).exists():
+                    self._copy_on_write(stored[0])
+                    # Копия вставляется целиком: INSERT с update_fields Django не выполняет
+                    kwargs.pop('update_fields', None)
+            super().save(*args, **kwargs)
+
+    def _copy_on_write(self, old_test_id):
+        """Опубликованная строка остаётся старым попыткам, изменения пишутся в новую"""
+        old_pk = self.pk
+        version = Test.lock_next_version(old_test_id)
+        Question.objects.filter(pk=old_pk).update(removed_in=version)
+        if self.test_id != old_test_id:
+            version = Test.lock_next_version(self.test_id)
+        self._replaces = old_pk
+        self.source_id = old_pk
+        self.pk = None
+        self._state.adding = True
+        self.added_in = version
+        self.removed_in = None
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Test.lock_next_version(self.test_id)
+            removed_in = Question.objects.filter(pk=self.pk).values_list('removed_in', flat=True).first()
+            if removed_in is not None:
+                raise ValueError(f'Вопрос исключён из теста в версии {removed_in} и не изменяется')
+            if not self.is_published():
+                return super().delete(*args, **kwargs)
+            # Ответы старых попыток ссылаются на строку: она только исключается из следующих версий
+            from .signals import update_test_counters
+            self.removed_in = Test.lock_next_version(self.test_id)
+            Question.objects.filter(pk=self.pk).update(removed_in=self.removed_in)
+            update_test_counters(self.test_id, questions=-1, points=-self.points)
+            return 0, {}
+
 
 class Student(models.Model):
     """Студенты, проходящие тесты"""
     name = models.CharField(max_length=255, verbose_name='Имя')
     email = models.EmailField(verbose_name='Email')
+    # Email в нижнем регистре без пробелов: ключ поиска студента при регистрации
+    email_normalized = models.EmailField(unique=True, editable=False, verbose_name='Email (нормализованный)')
     telegram = models.CharField(max_length=100, blank=True, null=True, verbose_name='Telegram')
     institution = models.CharField(max_length=255, blank=True, verbose_name='Учебное заведение')
     specialization = models.CharField(max_length=255, blank=True, verbose_name='Специализация')
@@ -111,39 +280,67 @@ class Student(models.Model):
         db_table = 'students'
         verbose_name = 'Студент'
         verbose_name_plural = 'Студенты'
+        indexes = [
+            models.Index(fields=['institution'], name='students_institution_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        self.email_normalized = self.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize_email(email):
+        return (email or '').strip().lower()
+
 
 class Attempt(models.Model):
     """Попытки прохождения тестов"""
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='attempts')
+    # Версия вопросов, на которой идёт попытка; правки теста её не затрагивают
+    version = models.ForeignKey(TestVersion, on_delete=models.CASCADE, related_name='attempts')
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attempts')
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(default=0.0, verbose_name='Набранный балл')
     passed = models.BooleanField(default=False, verbose_name='Пройден')
     result_sent = models.BooleanField(default=False, verbose_name='Результат отправлен')
+    # Текущие итоги незавершённой попытки (автосохранение ответов)
+    points_earned = models.FloatField(default=0.0, verbose_name='Набрано баллов')
+    answered_count = models.PositiveIntegerField(default=0, verbose_name='Отвечено вопросов')
+    # Попытка отправлена, но ещё ждёт фоновой проверки
+    grading_pending = models.BooleanField(default=False, verbose_name='Ожидает проверки')
 
     class Meta:
         db_table = 'attempts'
         verbose_name = 'Попытка'
         verbose_name_plural = 'Попытки'
         ordering = ['-start_time']
+        indexes = [
+            # Keyset-пагинация завершённых попыток теста по (end_time, id)
+            models.Index(fields=['test', 'end_time', 'id'], name='attempts_test_end_idx'),
+            # То же с фильтром по статусу: условие по BooleanField SQLite сопоставляет
+            # только с частичным индексом
+            models.Index(fields=['test', 'end_time', 'id'], condition=models.Q(passed=True),
+                         name='attempts_test_passed_end_idx'),
+            models.Index(fields=['test', 'end_time', 'id'], condition=models.Q(passed=False),
+                         name='attempts_test_failed_end_idx'),
+            # Порядок по умолчанию (-start_time) для попыток теста
+            models.Index(fields=['test', '-start_time'], name='attempts_test_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.test.title} - {self.start_time}"
 
-    def calculate_score(self):
-        """Подсчет результата"""
-        total_points = 0
-        earned_points = 0
-
-        for answer in self.answers.all():
-            total_points += answer.question.points
-            earned_points += answer.points_earned
+    def save(self, *args, **kwargs):
+        if self.version_id is None:
+            self.version_id = TestVersion.current_id(self.test_id)
+        super().save(*args, **kwargs)
 
+    def apply_score(self, earned_points, total_points):
+        """Выставляет score и passed по набранным баллам (без сохранения)"""
         if total_points > 0:
             self.score = (earned_points / total_points) * 100
             self.passed = self.score >= self.test.passing_threshold
@@ -151,140 +348,243 @@ class Attempt(models.Model):
             self.score = 0
             self.passed = False
 
-        self.end_time = timezone.now()
-        self.save()
+
+class TestStats(models.Model):
+    """Накопительная статистика завершённых попыток теста"""
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts_count = models.PositiveIntegerField(default=0, verbose_name='Завершённых попыток')
+    passed_count = models.PositiveIntegerField(default=0, verbose_name='Пройдено')
+    score_sum = models.FloatField(default=0.0)
+    score_sq_sum = models.FloatField(default=0.0)
+    score_min = models.FloatField(null=True, blank=True, verbose_name='Минимальный балл')
+    score_max = models.FloatField(null=True, blank=True, verbose_name='Максимальный балл')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'test_stats'
+        verbose_name = 'Статистика теста'
+        verbose_name_plural = 'Статистика тестов'
+
+    def __str__(self):
+        return f"Статистика: {self.test_id}"
+
+    @property
+    def avg_score(self):
+        if not self.attempts_count:
+            return 0
+        return self.score_sum / self.attempts_count
+
+    @property
+    def score_stddev(self):
+        if not self.attempts_count:
+            return 0
+        variance = self.score_sq_sum / self.attempts_count - self.avg_score ** 2
+        return max(variance, 0) ** 0.5
+
+    @classmethod
+    def record(cls, attempt):
+        """Учитывает только что завершённую попытку (вызывать в транзакции завершения)"""
+        cls.objects.bulk_create([cls(test_id=attempt.test_id)], ignore_conflicts=True)
+        score = attempt.score
+        cls.objects.filter(test_id=attempt.test_id).update(
+            attempts_count=models.F('attempts_count') + 1,
+            passed_count=models.F('passed_count') + (1 if attempt.passed else 0),
+            score_sum=models.F('score_sum') + score,
+            score_sq_sum=models.F('score_sq_sum') + score * score,
+            score_min=Least(Coalesce('score_min', Value(score)), Value(score)),
+            score_max=Greatest(Coalesce('score_max', Value(score)), Value(score)),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def rebuild(cls, test_ids):
+        """Пересчитывает статистику тестов по попыткам (одна агрегация на тест)"""
+        for test_id in test_ids:
+            totals = Attempt.objects.filter(
+                test_id=test_id, end_time__isnull=False, grading_pending=False,
+            ).aggregate(
+                attempts_count=models.Count('id'),
+                passed_count=models.Count('id', filter=models.Q(passed=True)),
+                score_sum=Coalesce(models.Sum('score'), Value(0.0)),
+                score_sq_sum=Coalesce(models.Sum(models.F('score') * models.F('score')), Value(0.0)),
+                score_min=models.Min('score'),
+                score_max=models.Max('score'),
+            )
+            cls.objects.update_or_create(test_id=test_id, defaults=totals)
 
 
 class Answer(models.Model):
     """Ответы студентов на вопросы"""
-    attempt = models.ForeignKey(Attempt, on_delete=models.CASCADE, related_name='answers')
+    # Отдельный индекс внешнего ключа не нужен: ответы попытки ищутся по уникальному (attempt, question)
+    attempt = models.ForeignKey(Attempt, on_delete=models.CASCADE, related_name='answers', db_index=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
     student_answer = models.JSONField(default=dict, verbose_name='Ответ студента')
+    # Выбранные варианты битами (см. answer_keys); только у вопросов с выбором
+    answer_mask = models.BigIntegerField(null=True, blank=True, verbose_name='Маска ответа')
     is_correct = models.BooleanField(default=False, verbose_name='Правильный')
     points_earned = models.FloatField(default=0.0, verbose_name='Заработанные баллы')
+    idempotency_key = models.CharField(max_length=64, blank=True, default='')
 
     class Meta:
         db_table = 'answers'
         verbose_name = 'Ответ'
         verbose_name_plural = 'Ответы'
+        constraints = [
+            # Один ответ на вопрос в попытке; индекс заодно обслуживает выборку ответов попытки
+            # (attempt_id — его первый столбец)
+            models.UniqueConstraint(fields=['attempt', 'question'], name='answers_attempt_question_uniq'),
+        ]
 
     def check_answer(self):
         """Проверка правильности ответа"""
-        question = self.question
-        correct = question.correct_answer
-        student = self.student_answer
-
-        if question.question_type == 'single_choice':
-            student_answer = str(student.get('answer'))
-            correct_answer = str(correct.get('answer'))
-            self.is_correct = student_answer == correct_answer
-
-        elif question.question_type == 'multiple_choice':
-            student_list = [str(v) for v in student.get('answers', [])]
-            correct_list = [str(v) for v in correct.get('answers', [])]
-            self.is_correct = set(student_list) == set(correct_list)
-
-        elif question.question_type in ['text_input', 'number_input']:
-            student_ans = str(student.get('answer', '')).strip().lower()
-            correct_ans = str(correct.get('answer', '')).strip().lower()
-            self.is_correct = student_ans == correct_ans
-
-        elif question.question_type == 'matching':
-            self.is_correct = student.get('pairs') == correct.get('pairs')
-
-        elif question.question_type == 'ordering':
-            self.is_correct = student.get('order') == correct.get('order')
-
-
-        elif question.question_type == 'matrix':
-
-            # Проверка матричного ответа
-
-            student_matrix = student.get('matrix', {})
-
-            correct_matrix = correct.get('matrix', {})
-
-            answer_type = question.options.get('answer_type', 'single')  # ДОБАВЛЕНО
-
-            # Подсчет правильных ответов
-
-            total_cells = 0
-
-            correct_cells = 0
-
-            for row_id in correct_matrix.keys():
-
-                # ИЗМЕНЕНО: учитываем тип ответа
-
-                if answer_type == 'multiple':
-
-                    # Для множественного выбора считаем все правильные ответы в строке
-
-                    correct_cols_in_row = set(correct_matrix[row_id].keys())
-                    sorted_correct_cols_in_row = set(sorted(correct_cols_in_row))
-                    student_cols_in_row = set(student_matrix.get(row_id, {}).keys())
-                    sorted_student_cols_in_row = set(sorted(student_cols_in_row))
-
-                    print(correct_cols_in_row)
-                    student_cols_in_row = set([", ".join(student_cols_in_row)])
-                    print(student_cols_in_row)
-
-                    total_cells += len(correct_cols_in_row)
-
-                    # Считаем пересечение (правильно выбранные)
-
-                    correct_cells += len(correct_cols_in_row & student_cols_in_row)
-                    print(correct_cells)
-
-                    # Вычитаем неправильно выбранные (штраф за лишние)
+        self.grade()
+        self.save()
 
-                    wrong_selections = len(student_cols_in_row - correct_cols_in_row)
+    def grade(self, key=None):
+        """Проверяет ответ и выставляет is_correct/points_earned/answer_mask без записи в БД"""
+        if key is None:
+            key = compile_question(self.question)
+        started = time.perf_counter()
+        self.is_correct, self.points_earned, self.answer_mask = key.evaluate(self.student_answer)
+        observe_answer_graded(key.question_type, self.is_correct, time.perf_counter() - started)
 
-                    correct_cells -= wrong_selections
+    def __str__(self):
+        return f"Ответ на {self.question.order_number} вопрос"
 
 
-                else:
+class GradingJob(models.Model):
+    """Задание фоновой проверки отправленной попытки"""
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Проверяется'),
+        ('done', 'Проверено'),
+        ('failed', 'Ошибка'),
+    ]
 
-                    # Для одиночного выбора (старая логика)
+    attempt = models.OneToOneField(Attempt, on_delete=models.CASCADE, related_name='grading_job')
+    student_answers = models.JSONField(default=dict, verbose_name='Ответы студента')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name='Статус')
+    tries = models.PositiveIntegerField(default=0, verbose_name='Попыток проверки')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    # После ошибки задание возвращается в очередь не раньше этого времени
+    next_try_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
-                    for col_id in correct_matrix[row_id].keys():
+    class Meta:
+        db_table = 'grading_jobs'
+        verbose_name = 'Задание проверки'
+        verbose_name_plural = 'Задания проверки'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
 
-                        total_cells += 1
+    def __str__(self):
+        return f"Проверка попытки {self.attempt_id} ({self.status})"
 
-                        student_value = student_matrix.get(row_id, {}).get(col_id)
 
-                        correct_value = correct_matrix[row_id][col_id]
+class RegradeJob(models.Model):
+    """Задание перепроверки ответов после исправления ключа вопроса (выполняет grading_worker)"""
+    STATUS_CHOICES = GradingJob.STATUS_CHOICES
 
-                        if student_value == correct_value:
-                            correct_cells += 1
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='regrade_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name='Статус')
+    tries = models.PositiveIntegerField(default=0, verbose_name='Попыток перепроверки')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    next_try_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
-            # Полное совпадение = правильный ответ
+    class Meta:
+        db_table = 'regrade_jobs'
+        verbose_name = 'Задание перепроверки'
+        verbose_name_plural = 'Задания перепроверки'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
 
-            self.is_correct = (total_cells > 0 and correct_cells == total_cells)
+    def __str__(self):
+        return f"Перепроверка вопроса {self.question_id} ({self.status})"
 
-            # Частичные баллы за матричные вопросы
 
-            if total_cells > 0:
+def generate_invitation_token():
+    return secrets.token_urlsafe(16)
 
-                # Не допускаем отрицательных баллов
 
-                self.points_earned = max(0, question.points * (correct_cells / total_cells))
+class Invitation(models.Model):
+    """Персональная ссылка кандидата на тест: попытка создаётся при первом переходе"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='invitations')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='invitations')
+    token = models.CharField(max_length=32, unique=True, default=generate_invitation_token, editable=False)
+    attempt = models.OneToOneField(Attempt, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='invitation')
+    created_at = models.DateTimeField(auto_now_add=True)
+    used_at = models.DateTimeField(null=True, blank=True, verbose_name='Первый переход')
 
-            else:
+    class Meta:
+        db_table = 'invitations'
+        verbose_name = 'Приглашение'
+        verbose_name_plural = 'Приглашения'
+        constraints = [
+            # Повторный импорт того же списка не создаёт вторых ссылок
+            models.UniqueConstraint(fields=['test', 'student'], name='invitations_test_student_uniq'),
+        ]
 
-                self.points_earned = 0
+    def __str__(self):
+        return f"Приглашение {self.student_id} на тест {self.test_id}"
 
-            self.save()
 
-            return  # Выходим, чтобы не перезаписать points_earned ниже
+class Notification(models.Model):
+    """
+    Исходящее уведомление о результате попытки (outbox). Создаётся в той же
+    транзакции, что завершает попытку, отправляется manage.py notification_worker.
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('telegram', 'Telegram'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
 
-        # Начисление баллов для остальных типов
-        if self.is_correct:
-            self.points_earned = question.points
-        else:
-            self.points_earned = 0
+    attempt = models.ForeignKey(Attempt, on_delete=models.CASCADE, related_name='notifications')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, verbose_name='Канал')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    tries = models.PositiveIntegerField(default=0, verbose_name='Попыток отправки')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
 
-        self.save()
+    class Meta:
+        db_table = 'notifications'
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'channel'], name='notifications_attempt_channel_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
 
     def __str__(self):
-        return f"Ответ на {self.question.order_number} вопрос"
\ No newline at end of file
+        return f"Уведомление {self.channel} о попытке {self.attempt_id} ({self.status})"
+
+    @classmethod
+    def enqueue_for(cls, attempt):
+        """
+        Уведомления о результате по каналам теста; вызывается внутри транзакции,
+        завершающей попытку. Канал account не требует отправки: результат виден на сайте.
+        """
+        channels = dict(cls.CHANNEL_CHOICES)
+        rows = [cls(attempt=attempt, channel=channel)
+                for channel in attempt.test.notification_type or [] if channel in channels]
+        if rows:
+            cls.objects.bulk_create(rows, ignore_conflicts=True)
+        return len(rows)
@@ -0,0 +1,240 @@
+"""
+Отправка уведомлений о результатах попыток из outbox (модель Notification).
+
+Запись в outbox идёт в транзакции завершения попытки, поэтому take_test не
+ждёт SMTP. manage.py notification_worker забирает уведомления пачками,
+отправляет все письма пачки через одно соединение почтового бэкенда,
+ограничивает скорость по каналам (NOTIFICATION_RATE_LIMITS, сообщений в
+секунду на процесс обработчика), при ошибке повторяет с экспоненциальной
+задержкой и выставляет Attempt.result_sent, когда отправлены уведомления
+попытки по всем каналам. Отправщик Telegram задаётся настройкой NOTIFICATION_TELEGRAM_SENDER;
+LocmemTelegramSender для проверок складывает сообщения в список outbox.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import NOTIFICATIONS_SENT
+from .models import Attempt, Notification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationError(Exception):
+    """Сообщение не отправлено; permanent — повторять бессмысленно (нет получателя и т.п.)"""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def result_message(attempt):
+    """(тема, текст) уведомления о результате попытки"""
+    test = attempt.test
+    subject = f'Результат теста «{test.title}»'
+    status = 'пройден' if attempt.passed else 'не пройден'
+    body = (
+        f'{attempt.student.name}, здравствуйте!\n\n'
+        f'Вы завершили тест «{test.title}».\n'
+        f'Набрано баллов: {attempt.points_earned:g} из {attempt.version.total_points}, '
+        f'результат: {attempt.score:.1f}% (проходной балл {test.passing_threshold:g}%).\n'
+        f'Тест {status}.\n'
+    )
+    return subject, body
+
+
+class TelegramBotSender:
+    """Отправка через Telegram Bot API; получатель — chat_id или @username из профиля студента"""
+
+    api_url = 'https://api.telegram.org/bot{token}/sendMessage'
+
+    def __init__(self):
+        self.token = getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
+
+    def send(self, recipient, text):
+        if not self.token:
+            raise NotificationError('TELEGRAM_BOT_TOKEN не задан')
+        request = urllib.request.Request(
+            self.api_url.format(token=self.token),
+            data=json.dumps({'chat_id': recipient, 'text': text}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                payload = json.load(response)
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            raise NotificationError(f'Telegram: {exc}')
+        if not payload.get('ok'):
+            raise NotificationError(f"Telegram: {payload.get('description', 'ошибка')}")
+
+
+class LocmemTelegramSender:
+    """Заглушка для проверок: сообщения складываются в LocmemTelegramSender.outbox"""
+    outbox = []
+
+    def send(self, recipient, text):
+        self.outbox.append((recipient, text))
+
+
+def get_telegram_sender():
+    return import_string(getattr(settings, 'NOTIFICATION_TELEGRAM_SENDER',
+                                 'testing.notifications.TelegramBotSender'))()
+
+
+class RateLimiter:
+    """Не больше rate сообщений в секунду (0 — без ограничения)"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def retry_delay(tries):
+    """Экспоненциальная задержка повтора: base, 2·base, 4·base ... не больше часа"""
+    base = getattr(settings, 'NOTIFICATION_RETRY_BASE_DELAY', 30)
+    return timedelta(seconds=min(base * 2 ** (tries - 1), 60 * 60))
+
+
+def claim_notifications(limit):
+    """Забирает до limit готовых к отправке уведомлений; каждое достаётся одному обработчику"""
+    now = timezone.now()
+    candidates = Notification.objects.filter(status='pending', next_attempt_at__lte=now).order_by(
+        'next_attempt_at').values_list('pk', flat=True)
+    claimed = []
+    for pk in list(candidates[:limit]):
+        if Notification.objects.filter(pk=pk, status='pending').update(status='sending', claimed_at=now):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale_notifications(older_than):
+    """Возвращает в очередь уведомления, зависшие в sending (например, после падения обработчика)"""
+    return Notification.objects.filter(
+        status='sending', claimed_at__lt=timezone.now() - older_than,
+    ).update(status='pending')
+
+
+class NotificationDispatcher:
+    """Отправляет пачки уведомлений; ограничители скорости живут между пачками"""
+
+    def __init__(self, telegram_sender=None):
+        rates = getattr(settings, 'NOTIFICATION_RATE_LIMITS', {})
+        self.limiters = {channel: RateLimiter(rates.get(channel, 0)) for channel, _ in Notification.CHANNEL_CHOICES}
+        self.telegram = telegram_sender or get_telegram_sender()
+        self.max_tries = getattr(settings, 'NOTIFICATION_MAX_TRIES', 5)
+
+    def send_batch(self, notification_ids):
+        """Отправляет уведомления пачки; возвращает число отправленных"""
+        notifications = list(Notification.objects.filter(pk__in=notification_ids).select_related(
+            'attempt__test', 'attempt__version', 'attempt__student'))
+        outcomes = {}
+        emails = [n for n in notifications if n.channel == 'email']
+        if emails:
+            outcomes.update(self._send_emails(emails))
+        for notification in notifications:
+            if notification.channel == 'telegram':
+                outcomes[notification.pk] = self._send_telegram(notification)
+        return self._record(notifications, outcomes)
+
+    def _send_emails(self, notifications):
+        """Все письма пачки — через одно соединение бэкенда"""
+        outcomes = {}
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as exc:
+            logger.warning('email connection failed: %s', exc)
+            return {notification.pk: NotificationError(f'Соединение с почтовым сервером: {exc}')
+                    for notification in notifications}
+        try:
+            for notification in notifications:
+                student = notification.attempt.student
+                if not student.email:
+                    outcomes[notification.pk] = NotificationError('У студента нет email', permanent=True)
+                    continue
+                subject, body = result_message(notification.attempt)
+                message = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [student.email],
+                                       connection=connection)
+                self.limiters['email'].wait()
+                try:
+                    # По одному письму, чтобы ошибка одного адреса не откатывала остальные
+                    connection.send_messages([message])
+                except Exception as exc:
+                    outcomes[notification.pk] = NotificationError(f'{type(exc).__name__}: {exc}')
+                else:
+                    outcomes[notification.pk] = None
+        finally:
+            connection.close()
+        return outcomes
+
+    def _send_telegram(self, notification):
+        recipient = notification.attempt.student.telegram
+        if not recipient:
+            return NotificationError('У студента не указан Telegram', permanent=True)
+        self.limiters['telegram'].wait()
+        try:
+            self.telegram.send(recipient, '\n\n'.join(result_message(notification.attempt)))
+        except NotificationError as exc:
+            return exc
+        except Exception as exc:
+            return NotificationError(f'{type(exc).__name__}: {exc}')
+        return None
+
+    def _record(self, notifications, outcomes):
+        """Сохраняет статусы: отправлено, повтор с задержкой или окончательная ошибка"""
+        now = timezone.now()
+        sent = []
+        for notification in notifications:
+            error = outcomes.get(notification.pk, NotificationError('Неизвестный канал', permanent=True))
+            if error is None:
+                notification.status = 'sent'
+                notification.sent_at = now
+                notification.error = ''
+                sent.append(notification)
+            else:
+                notification.tries += 1
+                notification.error = str(error)
+                if error.permanent or notification.tries >= self.max_tries:
+                    notification.status = 'failed'
+                else:
+                    notification.status = 'pending'
+                    notification.next_attempt_at = now + retry_delay(notification.tries)
+                logger.warning('notification=%s channel=%s attempt=%s failed (try %s): %s', notification.pk,
+                               notification.channel, notification.attempt_id, notification.tries, error)
+            NOTIFICATIONS_SENT.inc(channel=notification.channel, status=notification.status)
+        Notification.objects.bulk_update(notifications, ['status', 'tries', 'error', 'next_attempt_at', 'sent_at'])
+
+        # result_sent — только когда уведомления попытки ушли по всем каналам
+        attempt_ids = {notification.attempt_id for notification in notifications}
+        Attempt.objects.filter(pk__in=attempt_ids).exclude(
+            Q(notifications__status__in=['pending', 'sending', 'failed'])
+        ).update(result_sent=True)
+        return len(sent)
+
+
+def outbox_stats():
+    """Число уведомлений в каждом статусе"""
+    counts = dict.fromkeys(dict(Notification.STATUS_CHOICES), 0)
+    counts.update(Notification.objects.values_list('status').annotate(count=Count('id')).order_by())
+    return counts
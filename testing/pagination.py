@@ -0,0 +1,129 @@
+"""
+Keyset-пагинация (по курсору).
+
+Вместо OFFSET страница начинается строго после последней строки предыдущей:
+WHERE (end_time, id) < (:end_time, :id) ORDER BY end_time DESC, id DESC LIMIT n.
+С составным индексом, начинающимся с тех же полей, стоимость страницы не
+зависит от её глубины. Курсор — base64 от JSON с ключом граничной строки.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница результатов и курсоры соседних страниц"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'d': direction, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, values = payload['d'], payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def _key_values(obj, fields):
+    """Значения ключа строки в виде, пригодном для JSON"""
+    values = []
+    for name in fields:
+        value = getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return values
+
+
+def _beyond(fields, values, descending):
+    """
+    Условие «строго за ключом» в порядке сортировки:
+    a < x OR (a = x AND b < y) ..., плюс a <= x, чтобы планировщик взял диапазон по индексу.
+    """
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, name in enumerate(fields):
+        term = Q(**{f'{name}__{lookup}': values[i]})
+        for previous_name, previous_value in zip(fields[:i], values[:i]):
+            term &= Q(**{previous_name: previous_value})
+        condition |= term
+    return Q(**{f'{fields[0]}__{lookup}e': values[0]}) & condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=PAGE_SIZE):
+    """
+    Возвращает KeysetPage для queryset, отсортированного по ordering
+    (например ('-end_time', '-id')). Все поля сортируются в одном направлении,
+    последнее поле должно быть уникальным.
+    """
+    descending = ordering[0].startswith('-')
+    fields = [name.lstrip('-') for name in ordering]
+    direction, values = 'next', None
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise InvalidCursor(cursor)
+        model = queryset.model
+        try:
+            values = [model._meta.get_field(name).to_python(value) for name, value in zip(fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        # Ключ сортировки не бывает пустым: с None условие «за ключом» теряет смысл
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+
+    backwards = direction == 'prev'
+    if values is not None:
+        queryset = queryset.filter(_beyond(fields, values, descending != backwards))
+    if backwards:
+        ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+    has_next = has_more if not backwards else True
+    has_previous = has_more if backwards else values is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(_key_values(rows[-1], fields), 'next') if has_next else None,
+        previous_cursor=encode_cursor(_key_values(rows[0], fields), 'prev') if has_previous else None,
+    )
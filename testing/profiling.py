@@ -0,0 +1,239 @@
+"""
+Профилирование запросов: число SQL-запросов, время SQL и шаблонов,
+повторяющиеся запросы (признак N+1).
+
+RequestProfilingMiddleware собирает RequestProfile для каждого запроса,
+отдаёт его в заголовке Server-Timing и копит сводку по endpoint'ам в кэше
+(страница teacher/performance/). Включается настройкой REQUEST_PROFILING
+(по умолчанию — как DEBUG); выключенное профилирование не стоит ничего:
+middleware исключается из цепочки, рендер шаблонов не перехватывается.
+assert_queries_independent_of_questions — помощник для тестов: число
+запросов view не должно расти с числом вопросов (признак N+1).
+"""
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.cache import cache
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_STATS_TIMEOUT = 60 * 60 * 24 * 7
+ENDPOINT_INDEX_KEY = 'testing:profiling:endpoints'
+
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без литералов и длины IN-списков: одинаковый отпечаток — «тот же» запрос"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """Стоимость одного запроса (или блока кода)"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """{отпечаток: сколько раз} для запросов, выполненных больше одного раза"""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'dup;desc="{self.duplicate_queries} duplicate queries"',
+            f'tpl;dur={self.template_time * 1000:.1f};desc="templates"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+_current_profile = contextvars.ContextVar('testing_request_profile', default=None)
+_original_template_render = DjangoTemplate.render
+
+
+def _timed_template_render(self, *args, **kwargs):
+    """Template.render бэкенда Django: время верхнего уровня, вложенные include не суммируются дважды"""
+    profile = _current_profile.get()
+    if profile is None or profile._template_depth:
+        return _original_template_render(self, *args, **kwargs)
+    profile._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, *args, **kwargs)
+    finally:
+        profile.template_time += time.perf_counter() - started
+        profile._template_depth -= 1
+
+
+def install_template_timing():
+    """Подменяет Template.render бэкенда Django замером времени; повторный вызов ничего не делает"""
+    DjangoTemplate.render = _timed_template_render
+
+
+@contextmanager
+def profile_queries(aliases=None):
+    """Собирает RequestProfile для кода внутри блока на всех (или указанных) соединениях"""
+    install_template_timing()
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for alias in aliases or connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            yield profile
+    finally:
+        profile.total_time = time.perf_counter() - started
+        _current_profile.reset(token)
+
+
+def endpoint_name(request):
+    try:
+        match = request.resolver_match or resolve(request.path_info)
+    except Resolver404:
+        return None
+    return f'{request.method} {match.view_name}'
+
+
+def _endpoint_key(name):
+    return 'testing:profiling:endpoint:' + name.replace(' ', ':')
+
+
+def record_endpoint(name, profile):
+    """
+    Добавляет профиль запроса в сводку endpoint'а (кэш, общий для процессов).
+    Чтение-изменение-запись без блокировки: при одновременных запросах из
+    нескольких процессов часть обновлений теряется, сводка приблизительная.
+    """
+    key = _endpoint_key(name)
+    stats = cache.get(key) or {
+        'endpoint': name, 'requests': 0, 'total_time': 0.0, 'max_time': 0.0,
+        'sql_time': 0.0, 'template_time': 0.0, 'queries': 0, 'max_queries': 0,
+        'max_duplicates': 0, 'worst_duplicate': '',
+    }
+    stats['requests'] += 1
+    stats['total_time'] += profile.total_time
+    stats['max_time'] = max(stats['max_time'], profile.total_time)
+    stats['sql_time'] += profile.sql_time
+    stats['template_time'] += profile.template_time
+    stats['queries'] += profile.queries
+    stats['max_queries'] = max(stats['max_queries'], profile.queries)
+    if profile.duplicate_queries > stats['max_duplicates']:
+        stats['max_duplicates'] = profile.duplicate_queries
+        stats['worst_duplicate'] = max(profile.duplicates.items(), key=lambda item: item[1])[0]
+    cache.set(key, stats, ENDPOINT_STATS_TIMEOUT)
+
+    index = cache.get(ENDPOINT_INDEX_KEY) or []
+    if name not in index:
+        cache.set(ENDPOINT_INDEX_KEY, index + [name], ENDPOINT_STATS_TIMEOUT)
+
+
+def endpoint_report(order_by='avg_time'):
+    """Сводка по endpoint'ам, худшие первыми"""
+    names = cache.get(ENDPOINT_INDEX_KEY) or []
+    rows = list(cache.get_many([_endpoint_key(name) for name in names]).values())
+    for stats in rows:
+        stats['avg_time'] = stats['total_time'] / stats['requests']
+        stats['avg_queries'] = stats['queries'] / stats['requests']
+        stats['avg_sql_time'] = stats['sql_time'] / stats['requests']
+        stats['avg_template_time'] = stats['template_time'] / stats['requests']
+    return sorted(rows, key=lambda stats: stats[order_by], reverse=True)
+
+
+def reset_endpoint_report():
+    names = cache.get(ENDPOINT_INDEX_KEY) or []
+    cache.delete_many([_endpoint_key(name) for name in names] + [ENDPOINT_INDEX_KEY])
+
+
+class RequestProfilingMiddleware:
+    """
+    Считает запросы и время каждого HTTP-запроса, добавляет Server-Timing
+    и предупреждает в лог, если один и тот же запрос повторился
+    REQUEST_PROFILING_DUPLICATE_THRESHOLD раз и больше.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.duplicate_threshold = getattr(settings, 'REQUEST_PROFILING_DUPLICATE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        if getattr(response, 'streaming', False):
+            # Тело ещё не сгенерировано: запросы выгрузки в профиль не попадут
+            return response
+
+        response['Server-Timing'] = profile.server_timing()
+        name = endpoint_name(request)
+        if name is not None:
+            record_endpoint(name, profile)
+        for sql, count in profile.duplicates.items():
+            if count >= self.duplicate_threshold:
+                logger.warning('possible N+1 endpoint=%s repeated=%s sql=%s', name, count, sql[:300])
+        return response
+
+
+class QueryCountGrows(AssertionError):
+    pass
+
+
+def assert_queries_independent_of_questions(client, make_url, sizes=(2, 10)):
+    """
+    Помощник для тестов: make_url(n) создаёт данные с n вопросами и возвращает
+    URL страницы, client запрашивает её. Падает с QueryCountGrows, если
+    число SQL-запросов различается для разного числа вопросов.
+    """
+    counts = {}
+    profiles = {}
+    for size in sizes:
+        url = make_url(size)
+        with profile_queries() as profile:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise AssertionError(f'{url}: HTTP {response.status_code}')
+        counts[size] = profile.queries
+        profiles[size] = profile
+    if len(set(counts.values())) > 1:
+        largest = profiles[max(sizes)]
+        repeated = '\n'.join(f'  {count}× {sql[:200]}' for sql, count in
+                             sorted(largest.duplicates.items(), key=lambda item: -item[1])[:5])
+        raise QueryCountGrows(
+            f'Число запросов зависит от числа вопросов: {counts}\nПовторяющиеся запросы:\n{repeated}'
+        )
+    return counts
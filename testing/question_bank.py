@@ -0,0 +1,262 @@
+"""
+Банк вопросов в формате JSON Lines для переноса тестов между установками.
+
+Первая строка — заголовок {"format": "testing.question_bank", "version": 1,
+"test": {...}, "question_count": N}, каждая следующая — один вопрос:
+{"question_type", "question_text", "points", "options", "correct_answer"}
+в той же структуре, что в модели Question. Разбор потоковый: строки
+проверяются по типу вопроса и пишутся bulk_create пачками в одной
+транзакции; ошибка в любой строке откатывает весь импорт. Итоги теста
+(счётчики, content_version) сдвигаются один раз на весь импорт.
+"""
+import json
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .answer_keys import resolve_matrix_answer_type, translate_column_id
+from .models import Question, Test
+from .signals import update_test_counters
+
+FORMAT_NAME = 'testing.question_bank'
+FORMAT_VERSION = 1
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+QUESTION_FIELDS = ('question_type', 'question_text', 'points', 'options', 'correct_answer')
+QUESTION_TYPES = dict(Question.QUESTION_TYPES)
+
+
+class QuestionBankError(ValueError):
+    """Ошибка формата; line — номер строки файла (с 1)"""
+
+    def __init__(self, line, message):
+        super().__init__(f'строка {line}: {message}')
+        self.line = line
+
+
+# ---------- Экспорт ----------
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def export_header(test):
+    return {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'exported_at': timezone.now().isoformat(),
+        'test': {'title': test.title, 'description': test.description,
+                 'passing_threshold': test.passing_threshold},
+        'question_count': test.question_count,
+    }
+
+
+def export_lines(test, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки JSONL банка вопросов теста по порядку order_number"""
+    yield _dumps(export_header(test))
+    questions = test.questions.current().order_by('order_number', 'pk').values_list(*QUESTION_FIELDS)
+    for row in questions.iterator(chunk_size=chunk_size):
+        yield _dumps(dict(zip(QUESTION_FIELDS, row)))
+
+
+# ---------- Проверка ----------
+def _items(value, name):
+    """Список {'id', 'text'} с уникальными строковыми id"""
+    if not isinstance(value, list) or not value:
+        raise ValueError(f'{name}: нужен непустой список')
+    items, seen = [], set()
+    for item in value:
+        if not isinstance(item, dict) or 'id' not in item:
+            raise ValueError(f'{name}: каждый элемент — объект с id и text')
+        item_id = str(item['id'])
+        if item_id in seen:
+            raise ValueError(f'{name}: повторяется id {item_id}')
+        seen.add(item_id)
+        items.append({**item, 'id': item_id, 'text': str(item.get('text', ''))})
+    return items
+
+
+def _choice(options, correct, multiple):
+    items = _items(options.get('options'), 'options.options')
+    ids = {item['id'] for item in items}
+    if multiple:
+        answers = correct.get('answers')
+        if not isinstance(answers, list) or not answers:
+            raise ValueError('correct_answer.answers: нужен непустой список')
+        answers = [str(answer) for answer in answers]
+        unknown = set(answers) - ids
+        if unknown:
+            raise ValueError(f'correct_answer.answers: нет вариантов {sorted(unknown)}')
+        return {'options': items}, {'answers': answers}
+    answer = str(correct.get('answer', ''))
+    if answer not in ids:
+        raise ValueError(f'correct_answer.answer: нет варианта «{answer}»')
+    return {'options': items}, {'answer': answer}
+
+
+def _text(options, correct, numeric):
+    answer = correct.get('answer')
+    if answer is None or str(answer).strip() == '':
+        raise ValueError('correct_answer.answer: пустой ответ')
+    answer = str(answer)
+    if numeric:
+        try:
+            if not math.isfinite(float(answer.replace(',', '.'))):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'correct_answer.answer: «{answer}» не число')
+    return {}, {'answer': answer}
+
+
+def _matching(options, correct):
+    left = _items(options.get('left_items'), 'options.left_items')
+    right = _items(options.get('right_items'), 'options.right_items')
+    pairs = correct.get('pairs')
+    if not isinstance(pairs, dict) or not pairs:
+        raise ValueError('correct_answer.pairs: нужен непустой объект')
+    left_ids, right_ids = {item['id'] for item in left}, {item['id'] for item in right}
+    pairs = {str(key): str(value).strip().upper() for key, value in pairs.items()}
+    if set(pairs) - left_ids:
+        raise ValueError(f'correct_answer.pairs: нет левых элементов {sorted(set(pairs) - left_ids)}')
+    if set(pairs.values()) - {right_id.upper() for right_id in right_ids}:
+        raise ValueError('correct_answer.pairs: ссылка на несуществующий правый элемент')
+    return {'left_items': left, 'right_items': right}, {'pairs': pairs}
+
+
+def _matrix(options, correct):
+    rows = _items(options.get('rows'), 'options.rows')
+    cols = _items(options.get('cols'), 'options.cols')
+    answer_type = options.get('answer_type', 'single')
+    if answer_type not in ('single', 'multiple'):
+        raise ValueError('options.answer_type: single или multiple')
+    matrix = correct.get('matrix')
+    if not isinstance(matrix, dict):
+        raise ValueError('correct_answer.matrix: нужен объект {строка: {столбец: true}}')
+    row_ids = {row['id'] for row in rows}
+    cleaned = {}
+    for row_id, selected in matrix.items():
+        row_id = str(row_id)
+        if row_id not in row_ids:
+            raise ValueError(f'correct_answer.matrix: нет строки {row_id}')
+        if not isinstance(selected, dict):
+            raise ValueError(f'correct_answer.matrix[{row_id}]: нужен объект {{столбец: true}}')
+        cleaned[row_id] = {str(col): True for col, flag in selected.items() if flag}
+    # Тип определяется так же, как при проверке: старые ключи хранят «А, Б» без answer_type
+    multiple = resolve_matrix_answer_type(options, {'matrix': cleaned}) == 'multiple'
+    # Столбцы сравниваются в кириллице, как при проверке ответов
+    col_ids = {translate_column_id(col['id'].upper()) for col in cols}
+    for row_id, chosen in cleaned.items():
+        for col in chosen:
+            for part in (col.split(',') if multiple else [col]):
+                if translate_column_id(part.strip().upper()) not in col_ids:
+                    raise ValueError(f'correct_answer.matrix[{row_id}]: нет столбца {part.strip()}')
+        if not multiple and len(chosen) != 1:
+            raise ValueError(f'correct_answer.matrix[{row_id}]: в строке нужен ровно один столбец')
+    return {'rows': rows, 'cols': cols, 'answer_type': answer_type}, {'matrix': cleaned}
+
+
+VALIDATORS = {
+    'single_choice': lambda options, correct: _choice(options, correct, multiple=False),
+    'multiple_choice': lambda options, correct: _choice(options, correct, multiple=True),
+    'text_input': lambda options, correct: _text(options, correct, numeric=False),
+    'number_input': lambda options, correct: _text(options, correct, numeric=True),
+    'matching': _matching,
+    'matrix': _matrix,
+}
+
+
+def validate_question(data):
+    """Проверенные поля вопроса (без test и order_number) или ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('строка должна быть объектом JSON')
+    question_type = data.get('question_type')
+    if question_type not in QUESTION_TYPES:
+        raise ValueError(f'неизвестный question_type «{question_type}»')
+    text = data.get('question_text')
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('пустой question_text')
+    points = data.get('points', 1)
+    if isinstance(points, bool) or not isinstance(points, int) or points < 0:
+        raise ValueError('points: нужно целое неотрицательное число')
+    options, correct = data.get('options') or {}, data.get('correct_answer') or {}
+    if not isinstance(options, dict) or not isinstance(correct, dict):
+        raise ValueError('options и correct_answer должны быть объектами')
+    options, correct = VALIDATORS[question_type](options, correct)
+    return {'question_type': question_type, 'question_text': text, 'points': points,
+            'options': options, 'correct_answer': correct}
+
+
+# ---------- Импорт ----------
+def _records(lines):
+    """(номер строки, объект JSON) для непустых строк"""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise QuestionBankError(number, f'некорректный JSON ({exc.msg})')
+
+
+def read_header(records):
+    try:
+        number, header = next(records)
+    except StopIteration:
+        raise QuestionBankError(1, 'пустой файл')
+    if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+        raise QuestionBankError(number, f'первая строка должна быть заголовком {FORMAT_NAME}')
+    version = header.get('version')
+    if not isinstance(version, int) or version > FORMAT_VERSION:
+        raise QuestionBankError(number, f'неподдерживаемая версия формата {version}')
+    return header
+
+
+def import_lines(test, lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Добавляет вопросы из строк JSONL в конец теста. Возвращает число
+    вопросов; при ошибке (QuestionBankError) ничего не записывается.
+    """
+    records = _records(lines)
+    read_header(records)
+    imported = points = 0
+    with transaction.atomic():
+        # Блокирует тест (на БД с SELECT ... FOR UPDATE): номера вопросов не пересекутся с параллельным импортом
+        next_order, content_version = Test.objects.select_for_update().values_list(
+            'next_order_number', 'content_version').get(pk=test.pk)
+        batch = []
+        for number, data in records:
+            try:
+                fields = validate_question(data)
+            except ValueError as exc:
+                raise QuestionBankError(number, str(exc))
+            batch.append(Question(test_id=test.pk, order_number=next_order + imported,
+                                  added_in=content_version + 1, **fields))
+            imported += 1
+            points += fields['points']
+            if len(batch) >= batch_size:
+                Question.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Question.objects.bulk_create(batch)
+        if imported:
+            # bulk_create обходит сигналы вопросов: итоги теста сдвигаются один раз
+            update_test_counters(test.pk, questions=imported, points=points,
+                                 order_number=next_order + imported - 1)
+    return imported
+
+
+def create_test_from_header(header, creator):
+    """Новый неактивный тест по метаданным заголовка банка"""
+    meta = header.get('test') or {}
+    now = timezone.now()
+    return Test.objects.create(
+        creator=creator,
+        title=str(meta.get('title') or 'Импортированный тест')[:255],
+        description=str(meta.get('description') or ''),
+        passing_threshold=float(meta.get('passing_threshold') or 70.0),
+        start_date=now,
+        end_date=now + timedelta(days=30),
+        is_active=False,
+    )
@@ -0,0 +1,146 @@
+"""
+Перепроверка сохранённых ответов после исправления ключа вопроса.
+
+Опубликованная строка вопроса неизменяема: правка ключа создаёт копию
+(см. Question.save), а ответы старых попыток остаются на прежних строках.
+Такие ответы проверяются ключом последней копии вопроса, но с баллами своей
+строки — сумма баллов версии попытки (TestVersion.total_points) не меняется.
+Ответы читаются пачками по первичному ключу, изменившиеся записываются через
+bulk_update, после чего баллы затронутых попыток пересчитываются одним
+агрегирующим запросом на пачку.
+
+Правка ключа сама перепроверку не выполняет: она ставит RegradeJob в той же
+транзакции, задание выполняет manage.py grading_worker (с повторами после
+ошибок). Только в режиме GRADING_MODE = 'sync' перепроверка идёт сразу после
+коммита правки в том же запросе.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from .answer_keys import compile_question
+from .models import Answer, Attempt, Question, RegradeJob, TestStats
+
+logger = logging.getLogger(__name__)
+
+REGRADE_CHUNK_SIZE = 2000
+ATTEMPT_BATCH_SIZE = 500
+
+# Поля вопроса, из которых собирается ключ; баллы вопроса в старых версиях не меняются
+KEY_FIELDS = ('question_type', 'options', 'correct_answer')
+
+
+def regrade_generation(test_id):
+    """
+    Поколение проверки теста: меняется при каждой перепроверке и входит в ключи
+    кэшей результатов. Потерянное значение заменяется новым — кэши просто пересчитаются.
+    """
+    return cache.get_or_set(f'testing:regrade_generation:{test_id}', time.time_ns, None)
+
+
+def bump_regrade_generation(test_id):
+    cache.set(f'testing:regrade_generation:{test_id}', time.time_ns(), None)
+
+
+def key_state(question):
+    return tuple(getattr(question, field) for field in KEY_FIELDS)
+
+
+def question_successors(test):
+    """{id заменённой строки вопроса: id её последней копии}"""
+    successors = dict(test.questions.filter(source__isnull=False).values_list('source_id', 'pk'))
+    latest = {}
+    for pk in successors:
+        current = successors[pk]
+        while current in successors:
+            current = successors[current]
+        latest[pk] = current
+    return latest
+
+
+def lineage_key(row, latest):
+    """Ключ для ответов на строку row: ключ последней копии latest с баллами row"""
+    if latest is None or latest.question_type != row.question_type:
+        return compile_question(row)
+    return compile_question(Question(
+        question_type=row.question_type, points=row.points,
+        options=latest.options, correct_answer=latest.correct_answer,
+    ))
+
+
+def schedule_regrade(question):
+    """Перепроверка ответов после правки ключа question: задание в очередь или сразу после коммита"""
+    if settings.GRADING_MODE == 'sync':
+        transaction.on_commit(lambda: regrade_question(question))
+    else:
+        RegradeJob.objects.create(question=question)
+
+
+def regrade_question(question, chunk_size=REGRADE_CHUNK_SIZE):
+    """
+    Перепроверяет ответы на вопрос и все его прежние строки ключом question;
+    возвращает число изменённых ответов
+    """
+    row_ids = [pk for pk, latest in question_successors(question.test).items() if latest == question.pk]
+    rows = Question.objects.filter(pk__in=row_ids + [question.pk]).only('id', 'question_type', 'points')
+
+    changed_count = 0
+    attempt_ids = set()
+    for row in rows:
+        key = lineage_key(row, question)
+        answers = Answer.objects.filter(question_id=row.pk).only(
+            'id', 'attempt_id', 'student_answer', 'answer_mask', 'is_correct', 'points_earned'
+        ).order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(answers.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            changed = []
+            for answer in chunk:
+                graded = key.evaluate(answer.student_answer)
+                if graded != (answer.is_correct, answer.points_earned, answer.answer_mask):
+                    answer.is_correct, answer.points_earned, answer.answer_mask = graded
+                    changed.append(answer)
+                    attempt_ids.add(answer.attempt_id)
+            if changed:
+                Answer.objects.bulk_update(changed, ['is_correct', 'points_earned', 'answer_mask'])
+                changed_count += len(changed)
+
+    recalculate_attempts(question.test, attempt_ids)
+    logger.info('regrade question=%s changed_answers=%s attempts=%s',
+                question.pk, changed_count, len(attempt_ids))
+    return changed_count
+
+
+def recalculate_attempts(test, attempt_ids, batch_size=ATTEMPT_BATCH_SIZE):
+    """
+    Пересчитывает по сохранённым ответам текущие итоги попыток теста,
+    а для завершённых попыток ещё и score/passed
+    """
+    attempt_ids = sorted(attempt_ids)
+    for start in range(0, len(attempt_ids), batch_size):
+        batch = attempt_ids[start:start + batch_size]
+        totals = (
+            Answer.objects.filter(attempt_id__in=batch)
+            .values('attempt_id', 'attempt__end_time', 'attempt__version__total_points')
+            .annotate(earned=Sum('points_earned'))
+            .order_by()
+        )
+        attempts = []
+        for row in totals:
+            attempt = Attempt(pk=row['attempt_id'], test=test, points_earned=row['earned'] or 0)
+            if row['attempt__end_time'] is not None:
+                attempt.apply_score(attempt.points_earned, row['attempt__version__total_points'])
+            attempts.append(attempt)
+        with transaction.atomic():
+            Attempt.objects.bulk_update(attempts, ['score', 'passed', 'points_earned'])
+    if attempt_ids:
+        TestStats.rebuild([test.pk])
+        bump_regrade_generation(test.pk)
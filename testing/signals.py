@@ -0,0 +1,94 @@
+"""Обработчики сигналов моделей"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .access_links import invalidate_access_link, invalidate_test_summary
+from .catalog import invalidate_catalog
+from .models import Question, Test
+from .regrade import KEY_FIELDS, key_state, schedule_regrade
+
+
+def update_test_counters(test_id, questions=0, points=0, order_number=None):
+    """
+    Одним UPDATE сдвигает денормализованные итоги теста и его content_version:
+    следующая попытка опубликует новую версию теста.
+    """
+    updates = {'content_version': F('content_version') + 1}
+    if questions:
+        updates['question_count'] = F('question_count') + questions
+    if points:
+        updates['total_points'] = F('total_points') + points
+    if order_number is not None:
+        updates['next_order_number'] = Greatest(F('next_order_number'), order_number + 1)
+    Test.objects.filter(pk=test_id).update(**updates)
+    if questions:
+        # question_count показывается на странице регистрации
+        transaction.on_commit(lambda: invalidate_test_summary(test_id))
+
+
+@receiver(pre_save, sender=Question)
+def question_pre_save(sender, instance, raw=False, **kwargs):
+    """
+    Запоминает прежние тест и баллы вопроса (у копии — заменённой строки)
+    и изменился ли ключ, по которому проверены уже сохранённые ответы
+    """
+    instance._previous = None
+    instance._needs_regrade = False
+    if raw:
+        return
+    previous_pk = getattr(instance, '_replaces', None)
+    if previous_pk is None and not instance._state.adding:
+        previous_pk = instance.pk
+    if previous_pk is not None:
+        previous = Question.objects.filter(pk=previous_pk).values_list('test_id', 'points', *KEY_FIELDS).first()
+        if previous is not None:
+            instance._previous = previous[:2]
+            instance._needs_regrade = previous[0] == instance.test_id and previous[2:] != key_state(instance)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._previous is None:
+        update_test_counters(instance.test_id, questions=1, points=instance.points,
+                             order_number=instance.order_number)
+    else:
+        old_test_id, old_points = instance._previous
+        if old_test_id != instance.test_id:
+            update_test_counters(old_test_id, questions=-1, points=-old_points)
+            update_test_counters(instance.test_id, questions=1, points=instance.points,
+                                 order_number=instance.order_number)
+        else:
+            update_test_counters(instance.test_id, points=instance.points - old_points,
+                                 order_number=instance.order_number)
+    if instance._needs_regrade:
+        schedule_regrade(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    update_test_counters(instance.test_id, questions=-1, points=-instance.points)
+
+
+@receiver(pre_save, sender=Test)
+def test_pre_save(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю ссылку доступа: её запись в кэше тоже нужно сбросить"""
+    instance._previous_access_link = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._previous_access_link = Test.objects.filter(pk=instance.pk).values_list(
+            'access_link', flat=True).first()
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def test_changed(sender, instance, raw=False, **kwargs):
+    """Каталог test_list и кэш ссылок доступа перечитываются после фиксации изменений теста"""
+    if raw:
+        return
+    links = (instance.access_link, getattr(instance, '_previous_access_link', None))
+    transaction.on_commit(invalidate_catalog)
+    transaction.on_commit(lambda: invalidate_access_link(*links))
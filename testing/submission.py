@@ -0,0 +1,261 @@
+"""Приём ответов студента: разбор формы, проверка в памяти и запись одной транзакцией"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .answer_keys import get_answer_key, translate_column_id
+from .metrics import ATTEMPTS_FINISHED, CALCULATE_SCORE_SECONDS, GRADING_SECONDS
+from .models import Attempt, Answer, Notification, TestStats
+
+logger = logging.getLogger(__name__)
+
+
+def parse_answer(question, data):
+    """Собирает student_answer для вопроса из POST-данных формы"""
+    field_name = f'question_{question.id}'
+
+    # ----- ОДИН ВЫБОР -----
+    if question.question_type == 'single_choice':
+        return {'answer': data.get(field_name)}
+
+    # ----- МНОЖЕСТВЕННЫЙ -----
+    if question.question_type == 'multiple_choice':
+        return {'answers': data.getlist(field_name)}
+
+    # ----- ТЕКСТ / ЧИСЛО -----
+    if question.question_type in ['text_input', 'number_input']:
+        return {'answer': data.get(field_name, '')}
+
+    # ----- СООТНЕСЕНИЕ -----
+    if question.question_type == 'matching':
+        pairs = {}
+        for left in question.options.get('left_items', []):
+            left_id = left['id']
+            key = f"match_{question.id}_{left_id}"
+            pairs[left_id] = data.get(key, '').strip().upper()
+        return {'pairs': pairs}
+
+    # ----- УПОРЯДОЧИВАНИЕ -----
+    if question.question_type == 'ordering':
+        return {'order': data.getlist(f'order_{question.id}')}
+
+    # ----- МАТРИЧНЫЙ ВОПРОС -----
+    if question.question_type == 'matrix':
+        matrix = {}
+        answer_type = question.options.get('answer_type', 'single')
+
+        for row in question.options.get('rows', []):
+            row_id = row['id']
+            row_field = f'matrix_{question.id}_{row_id}'
+            if answer_type == 'multiple':
+                selected_cols = data.getlist(row_field)
+            else:
+                selected_cols = [data.get(row_field, '')]
+            for col in selected_cols:
+                col = translate_column_id(col)
+                if col:
+                    matrix.setdefault(row_id, {})[col] = True
+        return {'matrix': matrix}
+
+    return {'answer': data.get(field_name, '')}
+
+
+def is_blank_answer(student_answer):
+    """Ответ из незаполненных полей формы: ничего не выбрано и не введено"""
+    return not any(any(value.values()) if isinstance(value, dict) else value
+                   for value in student_answer.values())
+
+
+def answer_form_fields(question_id, student_answer):
+    """Поля формы take_test, из которых parse_answer соберёт student_answer (обратное к parse_answer)"""
+    if 'answers' in student_answer:
+        return {f'question_{question_id}': list(student_answer['answers'])}
+    if 'pairs' in student_answer:
+        return {f'match_{question_id}_{left}': right for left, right in student_answer['pairs'].items()}
+    if 'matrix' in student_answer:
+        return {f'matrix_{question_id}_{row}': list(cols) for row, cols in student_answer['matrix'].items()}
+    return {f'question_{question_id}': student_answer.get('answer') or ''}
+
+
+def saved_form_values(attempt):
+    """Автосохранённые ответы попытки как значения полей формы: {имя поля: [значения]}"""
+    values = {}
+    for question_id, student_answer in Answer.objects.filter(attempt=attempt).values_list(
+            'question_id', 'student_answer'):
+        for name, value in answer_form_fields(question_id, student_answer).items():
+            values[name] = value if isinstance(value, list) else [value]
+    return values
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные на соединении внутри блока"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using=connection):
+    counter = QueryCounter()
+    with using.execute_wrapper(counter):
+        yield counter
+
+
+class SubmissionResult:
+    """Итог отправки: принята ли попытка, баллы и стоимость в запросах"""
+
+    def __init__(self, accepted, earned_points=0, total_points=0, answers_count=0,
+                 queries=0, duration=0.0):
+        self.accepted = accepted
+        self.earned_points = earned_points
+        self.total_points = total_points
+        self.answers_count = answers_count
+        self.queries = queries
+        self.duration = duration
+
+
+class AttemptClosed(Exception):
+    """Попытка уже завершена, ответы больше не принимаются"""
+
+
+def save_answer(attempt, question, data, idempotency_key=''):
+    """
+    Автосохранение ответа на один вопрос (upsert) с немедленной проверкой
+    и обновлением текущих итогов попытки.
+
+    Повтор запроса с тем же idempotency_key ничего не меняет и возвращает
+    уже сохранённый ответ.
+    """
+    key = get_answer_key(attempt.version)
+    student_answer = parse_answer(question, data)
+
+    with transaction.atomic():
+        # Блокирует строку попытки (на БД с поддержкой SELECT ... FOR UPDATE)
+        if not Attempt.objects.select_for_update().filter(pk=attempt.pk, end_time__isnull=True).exists():
+            raise AttemptClosed
+        answer = Answer.objects.filter(attempt=attempt, question_id=question.id).first()
+        if answer is None:
+            answer = Answer(attempt=attempt, question_id=question.id,
+                            student_answer=student_answer, idempotency_key=idempotency_key)
+            answer.grade(key.questions.get(question.id))
+            try:
+                # На SQLite FOR UPDATE не блокирует: параллельный первый автосейв
+                # мог вставить ту же строку, тогда ответ сохраняется как обновление
+                with transaction.atomic():
+                    answer.save()
+            except IntegrityError:
+                answer = Answer.objects.get(attempt=attempt, question_id=question.id)
+            else:
+                Attempt.objects.filter(pk=attempt.pk).update(
+                    points_earned=F('points_earned') + answer.points_earned,
+                    answered_count=F('answered_count') + 1,
+                )
+                return answer
+
+        if idempotency_key and answer.idempotency_key == idempotency_key:
+            return answer
+        previous_points = answer.points_earned
+        answer.student_answer = student_answer
+        answer.idempotency_key = idempotency_key
+        answer.grade(key.questions.get(question.id))
+        answer.save()
+
+        Attempt.objects.filter(pk=attempt.pk).update(
+            points_earned=F('points_earned') - previous_points + answer.points_earned,
+        )
+    return answer
+
+
+def submit_attempt(attempt, questions, data):
+    """Разбирает отправленную форму и сразу завершает попытку с проверкой"""
+    return finalize_attempt(attempt, {question.id: parse_answer(question, data) for question in questions})
+
+
+def finalize_attempt(attempt, student_answers):
+    """
+    Завершает попытку по ответам {question_id: student_answer}. Ответы,
+    уже сохранённые автосохранением, не трогаются, если отправленный ответ
+    совпадает с ними или пуст (например, форма открыта заново и не заполнена);
+    остальные проверяются в памяти и записываются одним bulk_create/bulk_update
+    вместе с итоговым баллом попытки в одной транзакции.
+
+    Если попытка уже была завершена (повторная отправка формы),
+    ничего не записывается и возвращается accepted=False.
+    """
+    started = time.perf_counter()
+    with count_queries() as counter:
+        key = get_answer_key(attempt.version)
+        total_points = attempt.version.total_points
+
+        with transaction.atomic():
+            with CALCULATE_SCORE_SECONDS.time():
+                saved = {answer.question_id: answer for answer in Answer.objects.filter(attempt=attempt).only(
+                    'id', 'question_id', 'student_answer', 'is_correct', 'points_earned')}
+                new_answers = []
+                changed_answers = []
+                earned_points = 0
+                for question_id, student_answer in student_answers.items():
+                    answer = saved.get(question_id)
+                    if answer is None:
+                        answer = Answer(attempt=attempt, question_id=question_id, student_answer=student_answer)
+                        answer.grade(key.questions.get(question_id))
+                        new_answers.append(answer)
+                    elif answer.student_answer != student_answer and not is_blank_answer(student_answer):
+                        answer.student_answer = student_answer
+                        answer.grade(key.questions.get(question_id))
+                        changed_answers.append(answer)
+                for answer in new_answers + list(saved.values()):
+                    earned_points += answer.points_earned
+
+                attempt.points_earned = earned_points
+                attempt.answered_count = len(saved) + len(new_answers)
+                attempt.apply_score(earned_points, total_points)
+
+            # Условный UPDATE закрывает попытку ровно один раз даже при двойной отправке;
+            # попытку из очереди проверки закрыла отправка, её ждёт только выставление балла
+            if attempt.grading_pending:
+                pending = Attempt.objects.filter(pk=attempt.pk, grading_pending=True)
+            else:
+                attempt.end_time = timezone.now()
+                pending = Attempt.objects.filter(pk=attempt.pk, end_time__isnull=True)
+            attempt.grading_pending = False
+            accepted = pending.update(
+                score=attempt.score,
+                passed=attempt.passed,
+                end_time=attempt.end_time,
+                points_earned=attempt.points_earned,
+                answered_count=attempt.answered_count,
+                grading_pending=False,
+            ) == 1
+            if accepted:
+                if new_answers:
+                    Answer.objects.bulk_create(new_answers)
+                if changed_answers:
+                    Answer.objects.bulk_update(
+                        changed_answers, ['student_answer', 'answer_mask', 'is_correct', 'points_earned'])
+                TestStats.record(attempt)
+                Notification.enqueue_for(attempt)
+                transaction.on_commit(ATTEMPTS_FINISHED.inc)
+
+    result = SubmissionResult(
+        accepted=accepted,
+        earned_points=earned_points,
+        total_points=total_points,
+        answers_count=len(new_answers) + len(changed_answers),
+        queries=counter.count,
+        duration=time.perf_counter() - started,
+    )
+    GRADING_SECONDS.observe(result.duration)
+    logger.info(
+        'submission attempt=%s accepted=%s written_answers=%s queries=%s duration=%.1fms',
+        attempt.pk, result.accepted, result.answers_count, result.queries, result.duration * 1000,
+    )
+    return result
@@ -0,0 +1,270 @@
+"""
+Генератор синтетических данных для нагрузочных замеров.
+
+Все случайные значения берутся из одного random.Random(seed), поэтому при
+одинаковом seed получается одинаковый набор тестов, вопросов и ответов.
+Запись идёт через bulk_create пачками (ответы — executemany); итоги тестов (счётчики вопросов,
+TestStats) выставляются явно, так как bulk_create обходит сигналы.
+
+Правильность ответов моделируется как в IRT: у студента есть «уровень»,
+у вопроса — «сложность», вероятность верного ответа — логистическая функция
+их разности. Получается реалистичное колоколообразное распределение баллов.
+"""
+import json
+import math
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .answer_keys import compile_question, translate_column_id
+from .models import Answer, Attempt, Question, Student, Test, TestStats, TestVersion, User
+from .submission import answer_form_fields
+
+DEFAULT_BATCH_SIZE = 5000
+
+INSTITUTIONS = ['МГУ', 'СПбГУ', 'МФТИ', 'ВШЭ', 'ИТМО', 'МИФИ', 'КФУ', 'НГУ', 'УрФУ', 'ТПУ']
+SPECIALIZATIONS = ['Информатика', 'Прикладная математика', 'Программная инженерия', 'Физика', 'Экономика']
+WORDS = ['python', 'django', 'список', 'словарь', 'кортеж', 'класс', 'функция', 'индекс', 'запрос', 'кэш']
+MATRIX_COLUMNS = ['A', 'B', 'C', 'D']
+
+# Доля вопросов каждого типа в сгенерированном тесте
+QUESTION_TYPE_WEIGHTS = [
+    ('single_choice', 30),
+    ('multiple_choice', 20),
+    ('text_input', 10),
+    ('number_input', 10),
+    ('matching', 10),
+    ('matrix', 20),
+]
+
+
+def make_question_content(question_type, rng):
+    """(options, correct_answer, points) для вопроса заданного типа"""
+    if question_type == 'single_choice':
+        options = [{'id': str(i), 'text': f'Вариант {i}: {rng.choice(WORDS)}'} for i in range(1, 5)]
+        return {'options': options}, {'answer': str(rng.randint(1, 4))}, 1
+    if question_type == 'multiple_choice':
+        options = [{'id': str(i), 'text': f'Вариант {i}: {rng.choice(WORDS)}'} for i in range(1, 6)]
+        answers = sorted(rng.sample([o['id'] for o in options], rng.randint(2, 3)))
+        return {'options': options}, {'answers': answers}, 2
+    if question_type == 'text_input':
+        return {}, {'answer': rng.choice(WORDS)}, 1
+    if question_type == 'number_input':
+        return {}, {'answer': str(rng.randint(0, 1000))}, 1
+    if question_type == 'matching':
+        left = [{'id': str(i), 'text': rng.choice(WORDS)} for i in range(1, 5)]
+        right = [{'id': letter, 'text': rng.choice(WORDS)} for letter in 'АБВГ']
+        targets = [item['id'] for item in right]
+        rng.shuffle(targets)
+        pairs = {item['id']: target for item, target in zip(left, targets)}
+        return {'left_items': left, 'right_items': right}, {'pairs': pairs}, 2
+    # Матрица: половина с одним ответом в строке, половина с несколькими
+    answer_type = rng.choice(['single', 'multiple'])
+    rows = [{'id': str(i), 'text': f'Утверждение {i}'} for i in range(1, 4)]
+    cols = [{'id': letter, 'text': f'Столбец {letter}'} for letter in MATRIX_COLUMNS]
+    matrix = {}
+    for row in rows:
+        count = rng.randint(1, 2) if answer_type == 'multiple' else 1
+        matrix[row['id']] = {col: True for col in rng.sample(MATRIX_COLUMNS, count)}
+    return {'rows': rows, 'cols': cols, 'answer_type': answer_type}, {'matrix': matrix}, 3
+
+
+def student_answer_for(question, correct, rng):
+    """student_answer в том виде, в каком его собирает submission.parse_answer"""
+    key = question.correct_answer or {}
+    options = question.options or {}
+    question_type = question.question_type
+    if question_type == 'single_choice':
+        if correct:
+            return {'answer': key['answer']}
+        wrong = [o['id'] for o in options['options'] if o['id'] != key['answer']]
+        return {'answer': rng.choice(wrong)}
+    if question_type == 'multiple_choice':
+        if correct:
+            return {'answers': list(key['answers'])}
+        ids = [o['id'] for o in options['options']]
+        answers = sorted(rng.sample(ids, rng.randint(1, len(ids))))
+        if answers == sorted(key['answers']):
+            answers = answers[:-1]
+        return {'answers': answers}
+    if question_type in ('text_input', 'number_input'):
+        return {'answer': key['answer'] if correct else f"{key['answer']}?"}
+    if question_type == 'matching':
+        pairs = dict(key['pairs'])
+        if not correct:
+            first, second = rng.sample(sorted(pairs), 2)
+            pairs[first], pairs[second] = pairs[second], pairs[first]
+        return {'pairs': pairs}
+    matrix = {
+        row: {translate_column_id(col): True for col in cols}
+        for row, cols in key['matrix'].items()
+    }
+    if not correct:
+        # Ошибка в части строк даёт частичный балл
+        for row in rng.sample(sorted(matrix), rng.randint(1, len(matrix))):
+            matrix[row] = {translate_column_id(rng.choice(MATRIX_COLUMNS)): True}
+    return {'matrix': matrix}
+
+
+def form_data_for(question, student_answer):
+    """POST-поля формы take_test, из которых parse_answer соберёт student_answer"""
+    return answer_form_fields(question.id, student_answer)
+
+
+def answer_form_data(questions, rng, correct_rate=1.0):
+    """POST-данные формы take_test для вопросов теста (нужен correct_answer, т. е. модель Question)"""
+    data = {}
+    for question in questions:
+        data.update(form_data_for(question, student_answer_for(question, rng.random() < correct_rate, rng)))
+    return data
+
+
+def _insert_answers(rows):
+    """
+    Вставка ответов одним executemany. bulk_create на SQLite ограничен 999
+    параметрами на INSERT и тратит основное время на подготовку полей модели;
+    для миллионов строк это в несколько раз медленнее.
+    """
+    fields = [Answer._meta.get_field(name) for name in
+              ('attempt', 'question', 'student_answer', 'answer_mask', 'is_correct', 'points_earned',
+               'idempotency_key')]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(Answer._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, (row + ('',) for row in rows))
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SyntheticDataGenerator:
+    """Создаёт преподавателей, тесты, студентов и попытки с ответами пачками bulk_create"""
+
+    def __init__(self, seed=1, batch_size=DEFAULT_BATCH_SIZE, prefix=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix or f'synthetic-{seed}'
+        self.now = timezone.now()
+        self.counts = {'tests': 0, 'questions': 0, 'students': 0, 'attempts': 0, 'answers': 0}
+        self._student_number = 0
+
+    def create_teachers(self, count):
+        teachers = [
+            User(username=f'{self.prefix}-teacher-{i}', email=f'{self.prefix}-teacher-{i}@example.com', role='teacher')
+            for i in range(count)
+        ]
+        return User.objects.bulk_create(teachers, batch_size=self.batch_size)
+
+    def create_test(self, creator, questions, title=None):
+        """Тест с questions вопросами всех типов (по QUESTION_TYPE_WEIGHTS)"""
+        number = self.counts['tests'] + 1
+        test = Test.objects.create(
+            creator=creator,
+            title=title or f'Синтетический тест {number}',
+            description='Сгенерировано testing.synthetic',
+            start_date=self.now - timedelta(days=self.rng.randint(1, 60)),
+            end_date=self.now + timedelta(days=self.rng.randint(7, 90)),
+            passing_threshold=self.rng.choice([50.0, 60.0, 70.0]),
+            is_active=True,
+        )
+        types, weights = zip(*QUESTION_TYPE_WEIGHTS)
+        rows = []
+        for order_number, question_type in enumerate(self.rng.choices(types, weights, k=questions), start=1):
+            options, correct_answer, points = make_question_content(question_type, self.rng)
+            rows.append(Question(
+                test=test, question_text=f'Вопрос {order_number}: {self.rng.choice(WORDS)}?',
+                question_type=question_type, options=options, correct_answer=correct_answer,
+                points=points, order_number=order_number, added_in=test.content_version + 1,
+            ))
+        Question.objects.bulk_create(rows, batch_size=self.batch_size)
+        # bulk_create обходит сигналы: итоги теста выставляются одним UPDATE
+        Test.objects.filter(pk=test.pk).update(
+            total_points=sum(q.points for q in rows), question_count=len(rows),
+            next_order_number=len(rows) + 1, content_version=F('content_version') + 1,
+        )
+        test.refresh_from_db()
+        # Сложность вопроса для модели правильности ответов
+        test.synthetic_difficulty = {q.pk: self.rng.gauss(0, 1) for q in rows}
+        self.counts['tests'] += 1
+        self.counts['questions'] += len(rows)
+        return test
+
+    def create_students(self, count):
+        students = []
+        for _ in range(count):
+            self._student_number += 1
+            email = f'{self.prefix}-student-{self._student_number}@example.com'
+            students.append(Student(
+                name=f'Студент {self._student_number}', email=email, email_normalized=email,
+                institution=self.rng.choice(INSTITUTIONS), specialization=self.rng.choice(SPECIALIZATIONS),
+            ))
+        created = Student.objects.bulk_create(students, batch_size=self.batch_size)
+        for student in created:
+            student.synthetic_ability = self.rng.gauss(0, 1)
+        self.counts['students'] += len(created)
+        return created
+
+    def create_attempts(self, test, students, finished=True, days=30):
+        """
+        Попытка каждого студента на тест. Для завершённых попыток ответы
+        проверяются скомпилированными ключами и пишутся пачками; итоговые
+        баллы, счётчики и TestStats согласованы с ответами.
+        """
+        version = TestVersion.objects.get(pk=TestVersion.current_id(test.pk))
+        questions = list(version.questions)
+        keys = {question.pk: compile_question(question) for question in questions}
+        difficulty = getattr(test, 'synthetic_difficulty', None) or {q.pk: 0.0 for q in questions}
+        span = days * 24 * 60 * 60
+
+        created = []
+        for chunk in _batches(students, self.batch_size):
+            attempts = [
+                Attempt(test=test, version=version, student=student,
+                        end_time=self.now - timedelta(seconds=self.rng.randrange(span)) if finished else None)
+                for student in chunk
+            ]
+            with transaction.atomic():
+                # Ответы и итоги считаются до вставки, чтобы попытки не пришлось обновлять
+                graded = self._answer_attempts(test, attempts, questions, keys, difficulty) if finished else []
+                Attempt.objects.bulk_create(attempts)
+                if graded:
+                    _insert_answers(
+                        (attempts[index].pk, question_id, json.dumps(student_answer), mask, is_correct, points)
+                        for index, question_id, student_answer, mask, is_correct, points in graded
+                    )
+                    self.counts['answers'] += len(graded)
+            created.extend(attempts)
+
+        if finished and created:
+            # start_time заполняется auto_now_add; попытка длится от 5 до 60 минут
+            Attempt.objects.filter(test=test, pk__range=(created[0].pk, created[-1].pk)).update(
+                start_time=F('end_time') - timedelta(minutes=self.rng.randint(5, 60)))
+            TestStats.rebuild([test.pk])
+        self.counts['attempts'] += len(created)
+        return created
+
+    def _answer_attempts(self, test, attempts, questions, keys, difficulty):
+        """Проверенные ответы (номер попытки, question_id, student_answer, маска, is_correct, баллы)"""
+        graded = []
+        rng = self.rng
+        for index, attempt in enumerate(attempts):
+            ability = getattr(attempt.student, 'synthetic_ability', 0.0)
+            earned = 0
+            for question in questions:
+                probability = 1 / (1 + math.exp(-1.7 * (ability - difficulty[question.pk])))
+                student_answer = student_answer_for(question, rng.random() < probability, rng)
+                is_correct, points, mask = keys[question.pk].evaluate(student_answer)
+                earned += points
+                graded.append((index, question.pk, student_answer, mask, is_correct, points))
+            attempt.points_earned = earned
+            attempt.answered_count = len(questions)
+            attempt.apply_score(earned, test.total_points)
+        return graded
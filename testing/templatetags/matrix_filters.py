@@ -41,6 +41,4 @@ def lists_equal(list1, list2):
         list1 = [", ".join(list1)]
     if len(list2) > 1:
         list2 = [", ".join(list2)]
-    print(list1)
-    print(list2)
     return sorted(list1) == sorted(list2)
\ No newline at end of file
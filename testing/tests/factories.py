@@ -0,0 +1,50 @@
+"""Общие данные для тестов: тесты, студенты и попытки через testing.synthetic"""
+from django.core.cache import caches
+from django.urls import reverse
+
+from testing.answer_keys import clear_answer_keys
+from testing.models import Attempt, User
+from testing.synthetic import SyntheticDataGenerator
+
+
+def clear_caches():
+    """Кэши процесса переживают откат БД между тестами, а id строк повторяются"""
+    for cache in caches.all():
+        cache.clear()
+    clear_answer_keys()
+
+
+def make_teacher(username='teacher'):
+    teacher = User.objects.create(username=username, role='teacher')
+    teacher.set_password('password')
+    teacher.save()
+    return teacher
+
+
+class TestFactory:
+    """Тесты нужного размера с открытыми и завершёнными попытками"""
+
+    def __init__(self, teacher, seed=1):
+        self.teacher = teacher
+        self.generator = SyntheticDataGenerator(seed=seed)
+
+    def test(self, questions):
+        return self.generator.create_test(self.teacher, questions)
+
+    def open_attempt(self, questions):
+        test = self.test(questions)
+        student = self.generator.create_students(1)[0]
+        return Attempt.objects.create(test=test, student=student)
+
+    def finished_attempt(self, questions):
+        test = self.test(questions)
+        return self.generator.create_attempts(test, self.generator.create_students(1))[0]
+
+    def take_test_url(self, questions):
+        return reverse('testing:take_test', args=[self.open_attempt(questions).pk])
+
+    def result_url(self, questions):
+        return reverse('testing:test_result', args=[self.finished_attempt(questions).pk])
+
+    def attempt_detail_url(self, questions):
+        return reverse('testing:attempt_detail', args=[self.finished_attempt(questions).pk])
@@ -0,0 +1,19 @@
+"""Запуск тестов: метрики пишутся во временный файл, а не в общий METRICS_DB"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.TemporaryDirectory(prefix='metrics-')
+        self.metrics_db = settings.METRICS_DB
+        settings.METRICS_DB = os.path.join(self.metrics_dir.name, 'metrics.sqlite3')
+
+    def teardown_test_environment(self, **kwargs):
+        settings.METRICS_DB = self.metrics_db
+        self.metrics_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
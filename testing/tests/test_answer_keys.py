@@ -0,0 +1,79 @@
+import copy
+import itertools
+
+from django.test import SimpleTestCase
+
+from testing.answer_keys import compile_question
+from testing.models import Question
+
+OPTIONS = {'options': [{'id': str(i), 'text': f'Вариант {i}'} for i in range(1, 5)]}
+MATRIX_OPTIONS = {
+    'rows': [{'id': str(i), 'text': f'Утверждение {i}'} for i in range(1, 4)],
+    'cols': [{'id': col, 'text': f'Столбец {col}'} for col in 'ABC'],
+}
+MATRIX_COLS = 'АБВ'
+
+
+def subsets(items):
+    return [list(combo) for size in range(len(items) + 1) for combo in itertools.combinations(items, size)]
+
+
+def keys(question_type, correct_answer, options, points=3):
+    """Ключ с масками и его копия, проверяющая только по множествам"""
+    key = compile_question(Question(question_type=question_type, points=points,
+                                    options=options, correct_answer=correct_answer))
+    set_key = copy.copy(key)
+    set_key.mask = None
+    return key, set_key
+
+
+def matrix_answers(per_row):
+    rows = [row['id'] for row in MATRIX_OPTIONS['rows']]
+    for selection in itertools.product(per_row, repeat=len(rows)):
+        yield {'matrix': {row: dict.fromkeys(cols, True) for row, cols in zip(rows, selection) if cols}}
+
+
+class MaskGradingTests(SimpleTestCase):
+    """Проверка по маскам даёт тот же результат, что проверка по множествам"""
+
+    def assert_same_grades(self, key, set_key, answers):
+        self.assertIsNotNone(key.mask)
+        for answer in answers:
+            with self.subTest(answer=answer):
+                self.assertEqual(key.evaluate(answer)[:2], set_key.evaluate(answer)[:2])
+
+    def test_single_choice(self):
+        answers = [{'answer': value} for value in ('1', '2', '4', None, '')]
+        self.assert_same_grades(*keys('single_choice', {'answer': '2'}, OPTIONS), answers)
+
+    def test_multiple_choice(self):
+        answers = [{'answers': values} for values in subsets(['1', '2', '3', '4'])]
+        self.assert_same_grades(*keys('multiple_choice', {'answers': ['1', '3']}, OPTIONS), answers)
+
+    def test_single_matrix(self):
+        correct = {'matrix': {'1': {'A': True}, '2': {'B': True}, '3': {'C': True}}}
+        answers = matrix_answers([[]] + [[col] for col in MATRIX_COLS])
+        self.assert_same_grades(*keys('matrix', correct, MATRIX_OPTIONS), answers)
+
+    def test_multiple_matrix_with_row_missing_from_key(self):
+        options = dict(MATRIX_OPTIONS, answer_type='multiple')
+        correct = {'matrix': {'1': {'A': True, 'B': True}, '2': {'C': True}}}
+        answers = matrix_answers(subsets(list(MATRIX_COLS)))
+        self.assert_same_grades(*keys('matrix', correct, options), answers)
+
+    def test_legacy_comma_matrix_key(self):
+        correct = {'matrix': {'1': {'A, B': True}, '2': {'C': True}}}
+        answers = matrix_answers(subsets(list(MATRIX_COLS)))
+        self.assert_same_grades(*keys('matrix', correct, MATRIX_OPTIONS), answers)
+
+    def test_multiple_matrix_partial_and_extra_marks(self):
+        options = dict(MATRIX_OPTIONS, answer_type='multiple')
+        key, set_key = keys('matrix', {'matrix': {'1': {'A': True, 'B': True}, '2': {'C': True}}}, options)
+        # Строка 1: А верно, В лишняя (+1 − 1); строка 2 верно (+1); строка 3 не в ключе и не учитывается
+        answer = {'matrix': {'1': {'А': True, 'В': True}, '2': {'В': True}, '3': {'А': True}}}
+        for grading_key in (key, set_key):
+            self.assertEqual(grading_key.evaluate(answer)[:2], (False, 1.0))
+        # Лишних отметок больше, чем верных: балл не уходит ниже нуля
+        answer = {'matrix': {'1': {'В': True}, '2': {'А': True, 'Б': True}}}
+        for grading_key in (key, set_key):
+            self.assertEqual(grading_key.evaluate(answer)[:2], (False, 0))
@@ -0,0 +1,93 @@
+import csv
+import io
+import tracemalloc
+import zipfile
+
+from django.test import TestCase
+from django.urls import reverse
+
+from testing.export import EXPORT_FORMATS, attempt_rows, answer_rows
+from testing.models import Attempt
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class ExportResultsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        teacher = make_teacher()
+        self.attempt = TestFactory(teacher).finished_attempt(2)
+        student = self.attempt.student
+        student.name = '=HYPERLINK("http://evil.example")'
+        student.institution = '@SUM(A1)'
+        student.specialization = 'Информатика'
+        student.save()
+        self.client.force_login(teacher)
+        self.url = reverse('testing:export_results', args=[self.attempt.test_id, 'attempts'])
+
+    def export(self, file_format):
+        response = self.client.get(self.url, {'format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_rows(self):
+        content = self.export('csv').decode('utf-8-sig')
+        header, row = csv.reader(io.StringIO(content))
+        self.assertEqual(header[:3], ['ID попытки', 'Студент', 'Email'])
+        attempt = Attempt.objects.select_related('student').get(pk=self.attempt.pk)
+        self.assertEqual(row, [
+            str(attempt.pk), '\'=HYPERLINK("http://evil.example")', attempt.student.email,
+            "'@SUM(A1)", 'Информатика', attempt.start_time.isoformat(), attempt.end_time.isoformat(),
+            str(attempt.points_earned), str(round(attempt.score, 2)), 'да' if attempt.passed else 'нет',
+        ])
+
+    def test_xlsx_escapes_formulas(self):
+        with zipfile.ZipFile(io.BytesIO(self.export('xlsx'))) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">\'=HYPERLINK("http://evil.example")</t>', sheet)
+        self.assertIn('<t xml:space="preserve">\'@SUM(A1)</t>', sheet)
+        self.assertNotIn('>=HYPERLINK', sheet)
+
+
+class ExportMemoryTests(TestCase):
+    """Пик памяти выгрузки не растёт с числом строк"""
+
+    CHUNK_SIZE = 50
+
+    def setUp(self):
+        clear_caches()
+        factory = TestFactory(make_teacher())
+        self.generator = factory.generator
+        self.small = factory.test(5)
+        self.large = factory.test(5)
+        self.generator.create_attempts(self.small, self.generator.create_students(100))
+        self.generator.create_attempts(self.large, self.generator.create_students(1000))
+
+    def peak_memory(self, rows, file_format):
+        stream, _ = EXPORT_FORMATS[file_format]
+        tracemalloc.start()
+        try:
+            written = sum(len(chunk) for chunk in stream(rows))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(written, 0)
+        return peak
+
+    def assert_bounded(self, make_rows, file_format):
+        # Первый проход прогревает кэши запросов и модулей, его пик не сравнивается
+        self.peak_memory(make_rows(self.small, chunk_size=self.CHUNK_SIZE), file_format)
+        small = self.peak_memory(make_rows(self.small, chunk_size=self.CHUNK_SIZE), file_format)
+        large = self.peak_memory(make_rows(self.large, chunk_size=self.CHUNK_SIZE), file_format)
+        # В 10 раз больше строк, но память ограничена размером пачки
+        self.assertLess(large, small * 1.5 + 256 * 1024)
+
+    def test_attempts(self):
+        for file_format in EXPORT_FORMATS:
+            with self.subTest(file_format=file_format):
+                self.assert_bounded(attempt_rows, file_format)
+
+    def test_answers(self):
+        for file_format in EXPORT_FORMATS:
+            with self.subTest(file_format=file_format):
+                self.assert_bounded(answer_rows, file_format)
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from testing import grading_queue
+from testing.delivery import get_delivery_payload
+from testing.grading_queue import claim_jobs, enqueue_attempt, retry_failed_jobs, run_job, run_regrade_job
+from testing.models import Answer, Attempt, GradingJob, RegradeJob
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class GradingQueueTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.attempt = TestFactory(make_teacher()).open_attempt(3)
+        enqueue_attempt(self.attempt, get_delivery_payload(self.attempt.version), QueryDict())
+        self.job = GradingJob.objects.get(attempt=self.attempt)
+        self.url = reverse('testing:test_result', args=[self.attempt.pk])
+
+    def fail_job(self, tries):
+        with mock.patch.object(grading_queue, 'finalize_attempt', side_effect=RuntimeError('boom')):
+            for _ in range(tries):
+                GradingJob.objects.filter(pk=self.job.pk).update(next_try_at=self.job.created_at)
+                for job_id in claim_jobs(10):
+                    run_job(job_id)
+        self.job.refresh_from_db()
+
+    def test_failed_job_waits_for_backoff(self):
+        self.fail_job(1)
+        self.assertEqual((self.job.status, self.job.tries), ('queued', 1))
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_result_page_does_not_retry_failed_job(self):
+        self.fail_job(grading_queue.MAX_TRIES)
+        self.assertEqual(self.job.status, 'failed')
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertContains(response, 'Не удалось проверить ответы')
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.tries), ('failed', grading_queue.MAX_TRIES))
+
+        self.assertEqual(retry_failed_jobs(GradingJob.objects.all()), 1)
+        self.assertTrue(run_job(claim_jobs(10)[0]))
+        self.attempt.refresh_from_db()
+        self.assertFalse(self.attempt.grading_pending)
+        self.assertContains(self.client.get(self.url), self.attempt.test.title)
+
+
+class RegradeQueueTests(TestCase):
+    """Правка ключа опубликованного вопроса перепроверяет ответы в фоне"""
+
+    def setUp(self):
+        clear_caches()
+        factory = TestFactory(make_teacher())
+        test = factory.test(3)
+        factory.generator.create_attempts(test, factory.generator.create_students(10))
+        self.answer = Answer.objects.filter(attempt__test=test, is_correct=False).select_related('question').first()
+
+    def fix_key(self):
+        # Ответ студента становится правильным ответом
+        question = self.answer.question
+        question.correct_answer = self.answer.student_answer
+        question.save()
+
+    def attempt_points(self):
+        return Attempt.objects.get(pk=self.answer.attempt_id).points_earned
+
+    @override_settings(GRADING_MODE='async')
+    def test_key_change_is_queued(self):
+        points = self.attempt_points()
+        self.fix_key()
+        self.answer.refresh_from_db()
+        self.assertFalse(self.answer.is_correct)
+
+        job_ids = claim_jobs(10, RegradeJob)
+        self.assertEqual(len(job_ids), 1)
+        self.assertTrue(run_regrade_job(job_ids[0]))
+        self.answer.refresh_from_db()
+        self.assertTrue(self.answer.is_correct)
+        self.assertEqual(self.attempt_points(), points + self.answer.points_earned)
+        self.assertEqual(RegradeJob.objects.get().status, 'done')
+
+    @override_settings(GRADING_MODE='async')
+    def test_failed_regrade_is_retried(self):
+        self.fix_key()
+        with mock.patch.object(grading_queue, 'regrade_question', side_effect=RuntimeError('boom')):
+            self.assertFalse(run_regrade_job(claim_jobs(10, RegradeJob)[0]))
+        job = RegradeJob.objects.get()
+        self.assertEqual((job.status, job.tries), ('queued', 1))
+        self.assertEqual(claim_jobs(10, RegradeJob), [])
+
+        RegradeJob.objects.update(next_try_at=job.created_at)
+        self.assertTrue(run_regrade_job(claim_jobs(10, RegradeJob)[0]))
+        self.answer.refresh_from_db()
+        self.assertTrue(self.answer.is_correct)
+
+    @override_settings(GRADING_MODE='sync')
+    def test_sync_mode_regrades_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fix_key()
+        self.answer.refresh_from_db()
+        self.assertTrue(self.answer.is_correct)
+        self.assertFalse(RegradeJob.objects.exists())
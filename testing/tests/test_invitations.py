@@ -0,0 +1,41 @@
+import io
+from unittest import mock
+
+from django.test import TestCase
+
+from testing import invitations
+from testing.invitations import _existing_students, import_candidates
+from testing.models import Invitation, Student
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+CSV = 'email,name\na@example.com,А\nb@example.com,Б\nc@example.com,В\n'
+
+
+class ImportCandidatesTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.test = TestFactory(make_teacher()).test(2)
+
+    def test_counts_rows_inserted_by_concurrent_registration_as_skipped(self):
+        def register_after_read(emails):
+            existing = _existing_students(emails)
+            # Студент успел зарегистрироваться между чтением существующих и вставкой
+            Student.objects.create(name='Б', email='B@example.com')
+            return existing
+
+        with mock.patch.object(invitations, '_existing_students', register_after_read):
+            report = import_candidates(self.test, io.StringIO(CSV))
+
+        self.assertEqual(report.students_created, 2)
+        self.assertEqual(report.students_skipped, 1)
+        self.assertEqual(report.invitations_created, 3)
+        self.assertEqual(report.invitations_skipped, 0)
+        self.assertEqual(Student.objects.filter(email_normalized__endswith='@example.com').count(), 3)
+        self.assertEqual(Invitation.objects.filter(test=self.test).count(), 3)
+
+    def test_repeat_import_creates_nothing(self):
+        import_candidates(self.test, io.StringIO(CSV))
+        report = import_candidates(self.test, io.StringIO(CSV))
+        self.assertEqual((report.students_created, report.students_skipped), (0, 0))
+        self.assertEqual((report.invitations_created, report.invitations_skipped), (0, 0))
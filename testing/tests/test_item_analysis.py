@@ -0,0 +1,46 @@
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from testing.item_analysis import _fill_chunk, load_score_matrix
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class LoadScoreMatrixTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.factory = TestFactory(make_teacher())
+        self.test = self.factory.test(4)
+        self.generator = self.factory.generator
+        self.generator.create_attempts(self.test, self.generator.create_students(5))
+
+    def test_attempt_finished_between_reads_is_ignored(self):
+        expected = load_score_matrix(self.test)
+        fromiter = np.fromiter
+
+        def snapshot_then_finish_attempt(*args, **kwargs):
+            attempt_ids = fromiter(*args, **kwargs)
+            self.generator.create_attempts(self.test, self.generator.create_students(1))
+            return attempt_ids
+
+        with mock.patch.object(np, 'fromiter', side_effect=snapshot_then_finish_attempt):
+            question_ids, points, scores, correct = load_score_matrix(self.test)
+
+        self.assertEqual(scores.shape, (5, 4))
+        np.testing.assert_array_equal(scores, expected[2])
+        np.testing.assert_array_equal(correct, expected[3])
+
+    def test_fill_chunk_skips_attempts_outside_snapshot(self):
+        attempt_ids = np.array([10, 20, 30], dtype=np.int64)
+        question_ids = np.array([7, 5], dtype=np.int64)
+        order = np.argsort(question_ids)
+        scores = np.zeros((3, 2), dtype=np.float32)
+        correct = np.zeros(scores.shape, dtype=bool)
+
+        chunk = [(20, 5, 2.0, True), (15, 5, 9.0, True), (40, 7, 9.0, True), (30, 7, 1.0, False)]
+        _fill_chunk(chunk, attempt_ids, question_ids[order], order, scores, correct)
+
+        np.testing.assert_array_equal(scores, [[0, 0], [0, 2], [1, 0]])
+        np.testing.assert_array_equal(correct, [[False, False], [False, True], [False, False]])
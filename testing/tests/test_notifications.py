@@ -0,0 +1,139 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from testing import notifications
+from testing.delivery import get_delivery_payload
+from testing.models import Attempt, Notification
+from testing.notifications import (LocmemTelegramSender, NotificationDispatcher, NotificationError,
+                                   claim_notifications, retry_delay)
+from testing.submission import submit_attempt
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class DownTelegramSender:
+    """Telegram недоступен: каждая отправка — временная ошибка"""
+
+    def send(self, recipient, text):
+        raise NotificationError('Telegram: сервис недоступен')
+
+
+@override_settings(NOTIFICATION_TELEGRAM_SENDER='testing.notifications.LocmemTelegramSender',
+                   NOTIFICATION_RATE_LIMITS={}, NOTIFICATION_RETRY_BASE_DELAY=30)
+class NotificationDispatcherTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        LocmemTelegramSender.outbox.clear()
+        self.factory = TestFactory(make_teacher())
+
+    def finished_attempt(self, channels, telegram='@student'):
+        attempt = self.factory.open_attempt(2)
+        attempt.test.notification_type = channels
+        attempt.test.save(update_fields=['notification_type'])
+        attempt.student.telegram = telegram
+        attempt.student.save(update_fields=['telegram'])
+        submit_attempt(attempt, get_delivery_payload(attempt.version), QueryDict())
+        return attempt
+
+    def notification(self, attempt, channel):
+        return Notification.objects.get(attempt=attempt, channel=channel)
+
+    def make_due(self):
+        Notification.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_batch_uses_one_email_connection(self):
+        attempts = [self.finished_attempt(['email']) for _ in range(3)]
+
+        with mock.patch.object(notifications, 'get_connection', wraps=notifications.get_connection) as connect:
+            sent = NotificationDispatcher().send_batch(claim_notifications(10))
+
+        self.assertEqual(sent, 3)
+        connect.assert_called_once()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         sorted(attempt.student.email for attempt in attempts))
+        self.assertFalse(Notification.objects.exclude(status='sent').exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        attempt = self.finished_attempt(['telegram'])
+
+        started = timezone.now()
+        self.assertEqual(NotificationDispatcher(DownTelegramSender()).send_batch(claim_notifications(10)), 0)
+        notification = self.notification(attempt, 'telegram')
+        self.assertEqual((notification.status, notification.tries), ('pending', 1))
+        self.assertGreaterEqual(notification.next_attempt_at, started + retry_delay(1))
+        self.assertLess(notification.next_attempt_at, timezone.now() + retry_delay(1))
+        self.assertEqual(claim_notifications(10), [])
+
+        self.make_due()
+        NotificationDispatcher(DownTelegramSender()).send_batch(claim_notifications(10))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.tries), ('pending', 2))
+        self.assertGreaterEqual(notification.next_attempt_at - timezone.now(), retry_delay(2) - timedelta(seconds=5))
+
+        self.make_due()
+        self.assertEqual(NotificationDispatcher().send_batch(claim_notifications(10)), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sent')
+        self.assertEqual([recipient for recipient, _ in LocmemTelegramSender.outbox], ['@student'])
+
+    def test_permanent_error_is_not_retried(self):
+        attempt = self.finished_attempt(['telegram'], telegram='')
+
+        NotificationDispatcher().send_batch(claim_notifications(10))
+        notification = self.notification(attempt, 'telegram')
+        self.assertEqual((notification.status, notification.tries), ('failed', 1))
+
+        Notification.objects.update(next_attempt_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(claim_notifications(10), [])
+        self.assertEqual(LocmemTelegramSender.outbox, [])
+
+    def test_result_sent_after_every_channel(self):
+        attempt = self.finished_attempt(['email', 'telegram'])
+
+        NotificationDispatcher(DownTelegramSender()).send_batch(claim_notifications(10))
+        self.assertEqual(self.notification(attempt, 'email').status, 'sent')
+        self.assertFalse(Attempt.objects.get(pk=attempt.pk).result_sent)
+
+        self.make_due()
+        NotificationDispatcher().send_batch(claim_notifications(10))
+        self.assertTrue(Attempt.objects.get(pk=attempt.pk).result_sent)
+
+    def test_result_not_sent_when_a_channel_failed(self):
+        attempt = self.finished_attempt(['email', 'telegram'], telegram='')
+
+        NotificationDispatcher().send_batch(claim_notifications(10))
+        self.assertEqual(self.notification(attempt, 'telegram').status, 'failed')
+        self.assertFalse(Attempt.objects.get(pk=attempt.pk).result_sent)
+
+
+class OutboxTransactionTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.attempt = TestFactory(make_teacher()).open_attempt(2)
+        self.attempt.test.notification_type = ['email', 'telegram']
+        self.attempt.test.save(update_fields=['notification_type'])
+        self.questions = get_delivery_payload(self.attempt.version)
+
+    def test_finalize_writes_outbox(self):
+        submit_attempt(self.attempt, self.questions, QueryDict())
+        self.assertEqual(sorted(Notification.objects.filter(attempt=self.attempt).values_list('channel', flat=True)),
+                         ['email', 'telegram'])
+
+    def test_outbox_rolls_back_with_attempt(self):
+        enqueue_for = Notification.enqueue_for
+
+        def enqueue_then_fail(attempt):
+            enqueue_for(attempt)
+            raise RuntimeError('boom')
+
+        with mock.patch.object(Notification, 'enqueue_for', side_effect=enqueue_then_fail):
+            with self.assertRaises(RuntimeError):
+                submit_attempt(self.attempt, self.questions, QueryDict())
+
+        self.assertFalse(Notification.objects.filter(attempt=self.attempt).exists())
+        self.assertIsNone(Attempt.objects.get(pk=self.attempt.pk).end_time)
@@ -0,0 +1,44 @@
+import base64
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from testing.pagination import encode_cursor
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+def raw_cursor(payload):
+    """Курсор в правильном base64, но с произвольным содержимым"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.factory = TestFactory(make_teacher())
+        for _ in range(3):
+            self.factory.test(2)
+        self.client.force_login(self.factory.teacher)
+        self.url = reverse('testing:teacher_tests')
+
+    def test_valid_cursor(self):
+        test = self.factory.teacher.created_tests.order_by('-created_at', '-id').first()
+        cursor = encode_cursor([test.created_at.isoformat(), test.pk], 'next')
+        self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 200)
+
+    def test_malformed_cursor_is_not_found(self):
+        cursors = [
+            'not-base64!',
+            raw_cursor({'d': 'next', 'v': ['2024-01-01T00:00:00+00:00', [1, 2]]}),
+            raw_cursor({'d': 'next', 'v': [{'year': 2024}, 1]}),
+            raw_cursor({'d': 'next', 'v': [['2024'], 1]}),
+            raw_cursor({'d': 'next', 'v': [None, 1]}),
+            raw_cursor({'d': 'next', 'v': ['2024-01-01T00:00:00+00:00', None]}),
+            raw_cursor({'d': 'next', 'v': ['2024-01-01T00:00:00+00:00']}),
+            raw_cursor({'d': 'sideways', 'v': ['2024-01-01T00:00:00+00:00', 1]}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 404)
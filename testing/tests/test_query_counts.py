@@ -0,0 +1,23 @@
+from django.test import TestCase
+
+from testing.profiling import assert_queries_independent_of_questions
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class QueryCountTests(TestCase):
+    """Число SQL-запросов страниц попытки не зависит от числа вопросов (нет N+1)"""
+
+    def setUp(self):
+        clear_caches()
+        self.factory = TestFactory(make_teacher())
+        self.client.force_login(self.factory.teacher)
+
+    def test_take_test(self):
+        assert_queries_independent_of_questions(self.client, self.factory.take_test_url)
+
+    def test_result(self):
+        assert_queries_independent_of_questions(self.client, self.factory.result_url)
+
+    def test_attempt_detail(self):
+        assert_queries_independent_of_questions(self.client, self.factory.attempt_detail_url)
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from testing.models import Question, Test
+from testing.question_bank import (QUESTION_FIELDS, QUESTION_TYPES, QuestionBankError, export_lines,
+                                   import_lines)
+from testing.synthetic import make_question_content
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+def question_rows(test):
+    return list(test.questions.current().order_by('order_number').values_list(*QUESTION_FIELDS))
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.teacher = make_teacher()
+        self.factory = TestFactory(self.teacher)
+        self.source = self.factory.test(0)
+        rng = random.Random(1)
+        for order_number, question_type in enumerate(QUESTION_TYPES, start=1):
+            options, correct_answer, points = make_question_content(question_type, rng)
+            Question.objects.create(
+                test=self.source, question_type=question_type, question_text=f'Вопрос {order_number}',
+                options=options, correct_answer=correct_answer, points=points, order_number=order_number,
+            )
+        self.source.refresh_from_db()
+        self.lines = list(export_lines(self.source))
+
+    def test_round_trip_every_question_type(self):
+        target = self.factory.test(0)
+
+        self.assertEqual(import_lines(target, self.lines), len(QUESTION_TYPES))
+        self.assertEqual(question_rows(target), question_rows(self.source))
+        self.assertEqual({row[0] for row in question_rows(target)}, set(QUESTION_TYPES))
+
+    def test_bad_row_rolls_back_and_reports_line(self):
+        target = self.factory.test(2)
+        before = question_rows(target)
+        bad = json.loads(self.lines[3])
+        bad['correct_answer'] = {}
+        lines = self.lines[:3] + [json.dumps(bad, ensure_ascii=False)] + self.lines[4:]
+
+        with self.assertRaises(QuestionBankError) as raised:
+            import_lines(target, lines)
+        self.assertEqual(raised.exception.line, 4)
+        self.assertEqual(question_rows(target), before)
+
+        with self.assertRaises(QuestionBankError) as raised:
+            import_lines(target, self.lines[:2] + ['{not json'])
+        self.assertEqual(raised.exception.line, 3)
+        self.assertEqual(question_rows(target), before)
+
+    def test_counters_move_once(self):
+        target = self.factory.test(3)
+        imported_points = sum(row[2] for row in question_rows(self.source))
+
+        import_lines(target, self.lines)
+
+        after = Test.objects.get(pk=target.pk)
+        self.assertEqual(after.question_count, target.question_count + len(QUESTION_TYPES))
+        self.assertEqual(after.total_points, target.total_points + imported_points)
+        self.assertEqual(after.next_order_number, target.next_order_number + len(QUESTION_TYPES))
+        self.assertEqual(after.content_version, target.content_version + 1)
+        self.assertEqual(
+            list(after.questions.current().order_by('order_number').values_list('order_number', flat=True)),
+            list(range(1, after.next_order_number)),
+        )
+
+
+class ImportQuestionsCommandTests(TestCase):
+    def setUp(self):
+        make_teacher()
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def write(self, *lines):
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            stream.write('\n'.join(lines) + '\n')
+
+    def test_new_test_rolls_back_with_failed_import(self):
+        header = json.dumps({'format': 'testing.question_bank', 'version': 1, 'test': {'title': 'Банк'}})
+        self.write(header, json.dumps({'question_type': 'unknown', 'question_text': 'Вопрос'}))
+
+        with self.assertRaisesMessage(CommandError, 'строка 2'):
+            call_command('import_questions', self.path, new_test='teacher')
+        self.assertFalse(Test.objects.exists())
+
+    def test_new_test_reports_malformed_header(self):
+        self.write('{"format": ')
+
+        with self.assertRaisesMessage(CommandError, 'строка 1: некорректный JSON'):
+            call_command('import_questions', self.path, new_test='teacher')
+        self.assertFalse(Test.objects.exists())
@@ -0,0 +1,74 @@
+import random
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from testing.models import Answer, Attempt
+from testing.submission import save_answer, submit_attempt
+from testing.synthetic import form_data_for, student_answer_for
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+def form(question, correct):
+    data = form_data_for(question, student_answer_for(question, correct, random.Random(1)))
+    return QueryDict(urlencode(data, doseq=True))
+
+
+class SaveAnswerTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.attempt = TestFactory(make_teacher()).open_attempt(2)
+        self.question = self.attempt.version.questions.order_by('order_number').first()
+
+    def test_concurrent_first_save_becomes_update(self):
+        # Параллельный первый автосейв уже вставил строку, а этот запрос её ещё не видел
+        save_answer(self.attempt, self.question, form(self.question, correct=False), 'first')
+        real_first = QuerySet.first
+
+        def unseen_answer(queryset):
+            return None if queryset.model is Answer else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', unseen_answer):
+            answer = save_answer(self.attempt, self.question, form(self.question, correct=True), 'second')
+
+        self.assertEqual(Answer.objects.filter(attempt=self.attempt).count(), 1)
+        answer.refresh_from_db()
+        self.assertEqual(answer.idempotency_key, 'second')
+        self.assertTrue(answer.is_correct)
+        attempt = Attempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(attempt.answered_count, 1)
+        self.assertEqual(attempt.points_earned, answer.points_earned)
+
+
+class SubmitAfterReloadTests(TestCase):
+    """Перезагрузка страницы и отправка пустой формы не теряют автосохранённые ответы"""
+
+    def setUp(self):
+        clear_caches()
+        self.attempt = TestFactory(make_teacher()).open_attempt(3)
+        self.questions = list(self.attempt.version.questions.order_by('order_number'))
+        for question in self.questions:
+            save_answer(self.attempt, question, form(question, correct=True))
+
+    def test_blank_submission_keeps_saved_answers(self):
+        result = submit_attempt(self.attempt, self.questions, QueryDict())
+
+        self.assertTrue(result.accepted)
+        self.assertEqual(result.answers_count, 0)
+        attempt = Attempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(attempt.points_earned, sum(question.points for question in self.questions))
+        self.assertTrue(all(Answer.objects.filter(attempt=attempt).values_list('is_correct', flat=True)))
+
+    def test_take_test_fills_in_saved_answers(self):
+        response = self.client.get(reverse('testing:take_test', args=[self.attempt.pk]))
+
+        saved = response.context['saved_answers']
+        for question in self.questions:
+            for name, value in form(question, correct=True).lists():
+                self.assertEqual(saved[name], value)
+        self.assertContains(response, 'id="saved-answers"')
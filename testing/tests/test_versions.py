@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from testing.models import Question, Test
+
+from .factories import TestFactory, clear_caches, make_teacher
+
+
+class QuestionCopyOnWriteTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        # Попытка публикует версию теста: его вопросы становятся неизменяемыми
+        self.test = TestFactory(make_teacher()).open_attempt(2).test
+        self.question = self.test.questions.current().first()
+        self.version = Test.objects.get(pk=self.test.pk).content_version
+
+    def content_version(self):
+        return Test.objects.get(pk=self.test.pk).content_version
+
+    def test_unchanged_save_keeps_row_and_version(self):
+        old_pk = self.question.pk
+        self.question.refresh_from_db()
+        self.question.save()
+
+        self.assertEqual(self.question.pk, old_pk)
+        self.assertIsNone(Question.objects.get(pk=self.question.pk).removed_in)
+        self.assertEqual(self.content_version(), self.version)
+        self.assertEqual(self.test.questions.count(), 2)
+
+    def test_change_copies_published_row(self):
+        old_pk = self.question.pk
+        self.question.question_text = 'Исправленный вопрос'
+        self.question.save()
+
+        self.assertNotEqual(self.question.pk, old_pk)
+        self.assertEqual(Question.objects.get(pk=old_pk).removed_in, self.version + 1)
+        self.assertEqual(self.question.source_id, old_pk)
+        self.assertEqual(self.content_version(), self.version + 1)
+
+    def test_update_fields_on_published_row(self):
+        old_pk = self.question.pk
+        self.question.question_text = 'Исправленный вопрос'
+        self.question.save(update_fields=['question_text'])
+
+        copy = Question.objects.get(pk=self.question.pk)
+        self.assertNotEqual(copy.pk, old_pk)
+        self.assertEqual(copy.question_text, 'Исправленный вопрос')
+        self.assertEqual(copy.correct_answer, Question.objects.get(pk=old_pk).correct_answer)
@@ -8,8 +8,11 @@ urlpatterns = [
     # Публичные URL
     path('', views.test_list, name='test_list'),
     path('test/<str:access_link>/', views.test_detail, name='test_detail'),
+    path('invite/<str:token>/', views.accept_invitation, name='accept_invitation'),
     path('attempt/<int:attempt_id>/take/', views.take_test, name='take_test'),
+    path('attempt/<int:attempt_id>/answer/', views.save_answer, name='save_answer'),
     path('attempt/<int:attempt_id>/result/', views.test_result, name='test_result'),
+    path('metrics/', views.metrics, name='metrics'),
 
     # Авторизация
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -19,10 +22,16 @@ urlpatterns = [
     # Преподавательская панель
     path('teacher/dashboard/', views.teacher_dashboard, name='teacher_dashboard'),
     path('teacher/tests/', views.teacher_tests, name='teacher_tests'),
+    path('teacher/performance/', views.performance_report, name='performance_report'),
     path('teacher/test/create/', views.create_test, name='create_test'),
     path('teacher/test/<int:test_id>/edit/', views.edit_test, name='edit_test'),
     path('teacher/test/<int:test_id>/questions/', views.add_questions, name='add_questions'),
+    path('teacher/test/<int:test_id>/questions/import/', views.import_questions, name='import_questions'),
+    path('teacher/test/<int:test_id>/questions/export/', views.export_questions, name='export_questions'),
     path('teacher/test/<int:test_id>/statistics/', views.test_statistics, name='test_statistics'),
     path('teacher/test/<int:test_id>/attempts/', views.test_attempts, name='test_attempts'),
+    path('teacher/test/<int:test_id>/export/<str:kind>/', views.export_results, name='export_results'),
+    path('teacher/test/<int:test_id>/invitations/', views.test_invitations, name='test_invitations'),
+    path('teacher/test/<int:test_id>/invitations/links/', views.invitation_links, name='invitation_links'),
     path('teacher/attempt/<int:attempt_id>/', views.attempt_detail, name='attempt_detail'),
 ]
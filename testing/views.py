@@ -1,13 +1,33 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404, StreamingHttpResponse
 from django.contrib.auth import login
+from django.urls import reverse
 from django.core.exceptions import PermissionDenied
-
-from .models import Test, Question, Student, Attempt, Answer, User
-from .forms import StudentRegistrationForm, TestForm, QuestionForm, TeacherRegistrationForm
+from django.views.decorators.http import require_POST
+from django.db.models import Sum
+
+from .models import Test, Question, Student, Attempt, GradingJob, User, TestStats
+from .forms import (StudentRegistrationForm, TestForm, QuestionForm, TeacherRegistrationForm, AttemptFilterForm,
+                    CandidateImportForm, QuestionBankImportForm)
+from .access_links import resolve_access_link
+from .catalog import get_catalog
+from .delivery import get_delivery_payload
+from .export import EXPORT_FORMATS, EXPORT_KINDS, stream_csv
+from .grading_queue import enqueue_attempt
+from .group_commit import submit_attempt_grouped
+from .invitations import find_invitation, import_candidates, invitation_link_rows, open_invitation, text_stream
+from .item_analysis import get_item_analysis
+from .metrics import ATTEMPTS_STARTED, TAKE_TEST_POST_SECONDS, render as render_metrics
+from .pagination import InvalidCursor, paginate_keyset
+from .profiling import endpoint_report, reset_endpoint_report
+from .question_bank import QuestionBankError, export_lines, import_lines
+from .regrade import regrade_generation
+from .submission import AttemptClosed, save_answer as save_answer_to_attempt, saved_form_values, submit_attempt
+import hmac
 import json
 
 # --- Утилиты ---
@@ -23,17 +43,41 @@ def teacher_required(view_func):
     return _wrapped
 
 
+# Порядок списков попыток; совпадает с индексами attempts по (test, end_time, id)
+ATTEMPT_PAGE_ORDERING = ('-end_time', '-id')
+
+
+def finished_attempts(test):
+    return test.attempts.filter(end_time__isnull=False).select_related('student')
+
+
+def keyset_page(request, queryset, ordering):
+    """Страница по курсору из ?cursor=; испорченный курсор — 404"""
+    try:
+        return paginate_keyset(queryset, ordering, request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404
+
+
+def page_query(request):
+    """Параметры запроса без курсора — для ссылок на соседние страницы"""
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    return query.urlencode()
+
+
 # ---------- Публичные view (как было) ----------
 def test_list(request):
-    """Список активных тестов"""
-    tests = Test.objects.filter(is_active=True)
-    context = {'tests': tests}
+    """Список доступных сейчас тестов (кэшированный каталог)"""
+    context = {'tests': get_catalog()}
     return render(request, 'test_list.html', context)
 
 
 def test_detail(request, access_link):
     """Детали теста и регистрация студента"""
-    test = get_object_or_404(Test, access_link=access_link)
+    test = resolve_access_link(access_link)
+    if test is None:
+        raise Http404
 
     if not test.is_available():
         messages.error(request, 'Тест недоступен в данный момент')
@@ -43,8 +87,9 @@ def test_detail(request, access_link):
         form = StudentRegistrationForm(request.POST)
         if form.is_valid():
             student, created = Student.objects.get_or_create(
-                email=form.cleaned_data['email'],
+                email_normalized=Student.normalize_email(form.cleaned_data['email']),
                 defaults={
+                    'email': form.cleaned_data['email'],
                     'name': form.cleaned_data['name'],
                     'telegram': form.cleaned_data.get('telegram', ''),
                     'institution': form.cleaned_data.get('institution', ''),
@@ -53,7 +98,8 @@ def test_detail(request, access_link):
             )
 
             # Создаем новую попытку
-            attempt = Attempt.objects.create(test=test, student=student)
+            attempt = Attempt.objects.create(test_id=test.id, student=student)
+            ATTEMPTS_STARTED.inc()
             # Сохраняем идентификатор email в сессии для защиты от чужих попыток (опционально)
             request.session['last_attempt_student_email'] = student.email
             return redirect('testing:take_test', attempt_id=attempt.id)
@@ -67,8 +113,21 @@ def test_detail(request, access_link):
     return render(request, 'test_detail.html', context)
 
 
+def accept_invitation(request, token):
+    """Персональная ссылка кандидата: попытка без формы регистрации"""
+    invitation = find_invitation(token)
+    if invitation is None:
+        raise Http404
+    if not invitation.test.is_available():
+        messages.error(request, 'Тест недоступен в данный момент')
+        return redirect('testing:test_list')
+    invitation = open_invitation(invitation)
+    request.session['last_attempt_student_email'] = invitation.student.email
+    return redirect('testing:take_test', attempt_id=invitation.attempt_id)
+
+
 def take_test(request, attempt_id):
-    attempt = get_object_or_404(Attempt, id=attempt_id)
+    attempt = get_object_or_404(Attempt.objects.select_related('test', 'version', 'student'), id=attempt_id)
 
     if attempt.end_time:
         return redirect('testing:test_result', attempt_id=attempt.id)
@@ -77,136 +136,89 @@ def take_test(request, attempt_id):
         if request.session['last_attempt_student_email'] != attempt.student.email:
             return HttpResponseForbidden('Эта попытка не для текущего пользователя сессии.')
 
-    questions = attempt.test.questions.all().order_by('order_number')
-    translate_dict = {
-        "A": "А",
-        "B": "Б",
-        "C": "В",
-        "D": "Г",
-        "E": "Д",
-        "F": "Е"
-    }
-    for question in questions:
-        for col in question.options.get("cols", []):
-            for k, v in translate_dict.items():
-                col["id"] = col["id"].replace(k, v)
-
-        correct = question.correct_answer.get("matrix", {})
-        for k, v in correct.items():
-            for k_1, v_1 in v.items():
-                if "," in k_1:
-                    question.options["answer_type"] = "multiple"
-                    #answer_type = question.options.get('answer_type', 'single')
-        print(question.options)
+    questions = get_delivery_payload(attempt.version)
 
     if request.method == 'POST':
-
-        for question in questions:
-            field_name = f'question_{question.id}'
-
-            # ----- ОДИН ВЫБОР -----
-            if question.question_type == 'single_choice':
-                answer_data = {'answer': request.POST.get(field_name)}
-
-            # ----- МНОЖЕСТВЕННЫЙ -----
-            elif question.question_type == 'multiple_choice':
-                answer_data = {'answers': request.POST.getlist(field_name)}
-
-            # ----- ТЕКСТ / ЧИСЛО -----
-            elif question.question_type in ['text_input', 'number_input']:
-                answer_data = {'answer': request.POST.get(field_name, '')}
-
-            # ----- НОВЫЙ ТИП: СООТНЕСЕНИЕ -----
-            elif question.question_type == 'matching':
-                pairs = {}
-                for left in question.options.get('left_items', []):
-                    left_id = left['id']
-                    key = f"match_{question.id}_{left_id}"
-                    pairs[left_id] = request.POST.get(key, '').strip().upper()
-                answer_data = {'pairs': pairs}
-
-            # ----- УПОРЯДОЧИВАНИЕ (если будет) -----
-            elif question.question_type == 'ordering':
-                order = request.POST.getlist(f'order_{question.id}')
-                answer_data = {'order': order}
-
-            # ----- МАТРИЧНЫЙ ВОПРОС -----
-            elif question.question_type == 'matrix':
-                translate_dict = {
-                    "A": "А",
-                    "B": "Б",
-                    "C": "В",
-                    "D": "Г",
-                    "E": "Д",
-                    "F": "Е"
-                }
-                matrix = {}
-                answer_type = question.options.get('answer_type', 'single')
-
-                # Собираем ответы по каждой строке
-                for row in question.options.get('rows', []):
-                    row_id = row['id']
-
-                    if answer_type == 'multiple':
-                        # ДОБАВЛЕНО: для множественного выбора используем getlist
-                        field_name = f'matrix_{question.id}_{row_id}'
-                        selected_cols = request.POST.getlist(field_name)
-                        if selected_cols:
-                            if row_id not in matrix:
-                                matrix[row_id] = {}
-                            for col in selected_cols:
-                                for k, v in translate_dict.items():
-                                    col = col.replace(k, v)
-                                matrix[row_id][col] = True
-                    else:
-                        # Для одиночного выбора (старая логика)
-                        field_name = f'matrix_{question.id}_{row_id}'
-                        selected_col = request.POST.get(field_name, '')
-                        for k, v in translate_dict.items():
-                            selected_col = selected_col.replace(k, v)
-                        if selected_col:
-                            if row_id not in matrix:
-                                matrix[row_id] = {}
-                            matrix[row_id][selected_col] = True
-
-                answer_data = {'matrix': matrix}
-
+        with TAKE_TEST_POST_SECONDS.time(mode=settings.GRADING_MODE):
+            if settings.GRADING_MODE == 'async':
+                enqueue_attempt(attempt, questions, request.POST)
+            elif settings.GRADING_MODE == 'group':
+                submit_attempt_grouped(attempt, questions, request.POST)
             else:
-                answer_data = {'answer': request.POST.get(field_name, '')}
-
-            answer = Answer.objects.create(
-                attempt=attempt,
-                question=question,
-                student_answer=answer_data
-            )
-            answer.check_answer()
-
-        attempt.calculate_score()
+                submit_attempt(attempt, questions, request.POST)
         return redirect('testing:test_result', attempt_id=attempt.id)
 
+    # Блоки вопросов кэшируются общими для всех, автосохранённые ответы подставляет скрипт
     return render(request, 'take_test.html', {
         'attempt': attempt,
         'test': attempt.test,
         'questions': questions,
+        'saved_answers': saved_form_values(attempt),
     })
 
 
+@require_POST
+def save_answer(request, attempt_id):
+    """Автосохранение ответа на один вопрос (JSON-ответ)"""
+    attempt = get_object_or_404(Attempt.objects.select_related('test', 'version', 'student'), id=attempt_id)
+
+    if 'last_attempt_student_email' in request.session:
+        if request.session['last_attempt_student_email'] != attempt.student.email:
+            return JsonResponse({'error': 'forbidden'}, status=403)
+
+    try:
+        question_id = int(request.POST.get('question_id', ''))
+    except ValueError:
+        return JsonResponse({'error': 'question_id required'}, status=400)
+    question = next((q for q in get_delivery_payload(attempt.version) if q.id == question_id), None)
+    if question is None:
+        return JsonResponse({'error': 'unknown question'}, status=404)
+
+    idempotency_key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key', '')
+    try:
+        save_answer_to_attempt(attempt, question, request.POST, idempotency_key[:64])
+    except AttemptClosed:
+        return JsonResponse({'error': 'attempt closed'}, status=409)
+
+    # Правильность ответа студенту не сообщается
+    attempt.refresh_from_db(fields=['answered_count'])
+    return JsonResponse({'saved': True, 'question_id': question_id, 'answered_count': attempt.answered_count})
+
+
+def metrics(request):
+    """
+    Метрики Prometheus. Доступ — по заголовку Authorization: Bearer <METRICS_TOKEN>
+    (для сборщика) или администратору, вошедшему в систему.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    by_token = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    by_user = request.user.is_authenticated and (request.user.is_superuser or request.user.role == 'admin')
+    if not by_token and not by_user:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 def test_result(request, attempt_id):
     """Результаты теста"""
     attempt = get_object_or_404(Attempt, id=attempt_id)
 
-    # Получаем все ответы с вопросами
-    answers = attempt.answers.select_related('question').all()
-    answers_list = []
-    for answer in answers:
-        answers_list.append(answer)
+    if attempt.grading_pending:
+        # Только чтение: повторы проверки — дело обработчика очереди и администратора
+        return render(request, 'result_pending.html', {
+            'attempt': attempt, 'test': attempt.test,
+            'grading_failed': GradingJob.objects.filter(attempt=attempt, status='failed').exists(),
+        })
 
+    # Ответы с вопросами читаются лениво: при попадании в кэш фрагмента запроса нет
     context = {
         'attempt': attempt,
         'test': attempt.test,
         'student': attempt.student,
-        'answers': answers_list,
+        'answers': attempt.answers.select_related('question'),
+        'regrade_generation': regrade_generation(attempt.test_id),
     }
     return render(request, 'result.html', context)
 
@@ -234,7 +246,8 @@ def teacher_register(request):
 def teacher_dashboard(request):
     """Преподавательская панель (обзор)."""
     tests_count = Test.objects.filter(creator=request.user).count()
-    attempts_count = Attempt.objects.filter(test__creator=request.user, end_time__isnull=False).count()
+    attempts_count = TestStats.objects.filter(test__creator=request.user).aggregate(
+        total=Sum('attempts_count'))['total'] or 0
     context = {
         'tests_count': tests_count,
         'attempts_count': attempts_count,
@@ -246,8 +259,26 @@ def teacher_dashboard(request):
 @teacher_required
 def teacher_tests(request):
     """Список тестов текущего преподавателя."""
-    tests = Test.objects.filter(creator=request.user).order_by('-created_at')
-    return render(request, 'teacher/tests_list.html', {'tests': tests})
+    tests = keyset_page(request, Test.objects.filter(creator=request.user), ('-created_at', '-id'))
+    return render(request, 'teacher/tests_list.html', {'tests': tests, 'page_query': page_query(request)})
+
+
+@login_required
+@teacher_required
+def performance_report(request):
+    """Самые медленные и «тяжёлые» по SQL endpoint'ы (данные RequestProfilingMiddleware)."""
+    if request.method == 'POST':
+        reset_endpoint_report()
+        messages.success(request, 'Статистика сброшена')
+        return redirect('testing:performance_report')
+    order_by = request.GET.get('order', 'avg_time')
+    if order_by not in ('avg_time', 'max_time', 'avg_queries', 'max_queries', 'max_duplicates', 'requests'):
+        order_by = 'avg_time'
+    return render(request, 'teacher/performance.html', {
+        'endpoints': endpoint_report(order_by)[:50],
+        'order_by': order_by,
+        'profiling_enabled': settings.REQUEST_PROFILING,
+    })
 
 
 @login_required
@@ -290,10 +321,10 @@ def edit_test(request, test_id):
 def add_questions(request, test_id):
     """Добавление вопросов к тесту — только автор теста."""
     test = get_object_or_404(Test, id=test_id, creator=request.user)
-    questions = test.questions.all()
+    questions = test.questions.current()
 
-    # Вычисляем следующий номер вопроса для отображения
-    next_order = questions.count() + 1
+    # Следующий номер вопроса для отображения
+    next_order = test.next_order_number
 
     if request.method == 'POST':
         form = QuestionForm(request.POST, test=test)
@@ -309,6 +340,7 @@ def add_questions(request, test_id):
     context = {
         'test': test,
         'form': form,
+        'import_form': QuestionBankImportForm(),
         'questions': questions,
         'next_order': next_order,
     }
@@ -317,22 +349,52 @@ def add_questions(request, test_id):
 
 @login_required
 @teacher_required
-def test_statistics(request, test_id):
-    """Статистика по тесту (как раньше) — доступен автору."""
+@require_POST
+def import_questions(request, test_id):
+    """Импорт банка вопросов JSONL в конец теста: всё или ничего (только автор)."""
+    test = get_object_or_404(Test, id=test_id, creator=request.user)
+    form = QuestionBankImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, 'Выберите файл банка вопросов')
+    else:
+        try:
+            imported = import_lines(test, text_stream(form.cleaned_data['file']))
+        except (QuestionBankError, UnicodeDecodeError) as exc:
+            messages.error(request, f'Импорт не выполнен, {exc}')
+        else:
+            messages.success(request, f'Импортировано вопросов: {imported}')
+    return redirect('testing:add_questions', test_id=test.id)
+
+
+@login_required
+@teacher_required
+def export_questions(request, test_id):
+    """Потоковая выгрузка вопросов теста в JSONL (только автор)."""
     test = get_object_or_404(Test, id=test_id, creator=request.user)
-    attempts = test.attempts.filter(end_time__isnull=False).select_related('student')
+    response = StreamingHttpResponse(export_lines(test), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="test_{test.id}_questions.jsonl"'
+    return response
 
-    total_attempts = attempts.count()
-    passed_attempts = attempts.filter(passed=True).count()
-    from django.db import models as dj_models
-    avg_score = attempts.aggregate(dj_models.Avg('score'))['score__avg'] or 0
+
+@login_required
+@teacher_required
+def test_statistics(request, test_id):
+    """Статистика по тесту — доступен автору. Итоги читаются из накопительной TestStats."""
+    test = get_object_or_404(Test, id=test_id, creator=request.user)
+    stats = TestStats.objects.filter(test=test).first() or TestStats(test=test)
+    filter_form = AttemptFilterForm(request.GET)
+    attempts = keyset_page(request, filter_form.filter(finished_attempts(test)), ATTEMPT_PAGE_ORDERING)
 
     context = {
         'test': test,
+        'stats': stats,
         'attempts': attempts,
-        'total_attempts': total_attempts,
-        'passed_attempts': passed_attempts,
-        'avg_score': round(avg_score, 2),
+        'filter_form': filter_form,
+        'page_query': page_query(request),
+        'total_attempts': stats.attempts_count,
+        'passed_attempts': stats.passed_count,
+        'avg_score': round(stats.avg_score, 2),
+        'item_analysis': get_item_analysis(test, stats.attempts_count),
     }
     return render(request, 'admin/test_statistics.html', context)
 
@@ -342,8 +404,53 @@ def test_statistics(request, test_id):
 def test_attempts(request, test_id):
     """Список завершённых попыток по тесту (только автор)."""
     test = get_object_or_404(Test, id=test_id, creator=request.user)
-    attempts = test.attempts.filter(end_time__isnull=False).select_related('student').order_by('-end_time')
-    return render(request, 'teacher/test_attempts.html', {'test': test, 'attempts': attempts})
+    filter_form = AttemptFilterForm(request.GET)
+    attempts = keyset_page(request, filter_form.filter(finished_attempts(test)), ATTEMPT_PAGE_ORDERING)
+    return render(request, 'teacher/test_attempts.html', {
+        'test': test,
+        'attempts': attempts,
+        'filter_form': filter_form,
+        'page_query': page_query(request),
+    })
+
+
+@login_required
+@teacher_required
+def test_invitations(request, test_id):
+    """Массовая предрегистрация кандидатов из CSV и выгрузка их персональных ссылок (только автор)."""
+    test = get_object_or_404(Test, id=test_id, creator=request.user)
+    report = None
+    if request.method == 'POST':
+        form = CandidateImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                report = import_candidates(test, text_stream(form.cleaned_data['file']))
+            except (ValueError, UnicodeDecodeError) as exc:
+                form.add_error('file', f'Не удалось прочитать CSV: {exc}')
+    else:
+        form = CandidateImportForm()
+    return render(request, 'teacher/invitations.html', {
+        'test': test,
+        'form': form,
+        'report': report,
+        'invitations_count': test.invitations.count(),
+        'used_count': test.invitations.filter(attempt__isnull=False).count(),
+    })
+
+
+@login_required
+@teacher_required
+def invitation_links(request, test_id):
+    """CSV со ссылками приглашений для рассылки (только автор)."""
+    test = get_object_or_404(Test, id=test_id, creator=request.user)
+
+    def build_url(token):
+        return request.build_absolute_uri(reverse('testing:accept_invitation', args=[token]))
+
+    response = StreamingHttpResponse(stream_csv(invitation_link_rows(test, build_url)),
+                                     content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="test_{test.id}_invitations.csv"'
+    return response
 
 
 @login_required
@@ -371,3 +478,17 @@ def attempt_detail(request, attempt_id):
         'attempt': attempt,
         'answers': answers,
     })
+
+
+@login_required
+@teacher_required
+def export_results(request, test_id, kind):
+    """Потоковая выгрузка попыток или ответов теста в CSV/XLSX (только автор)."""
+    test = get_object_or_404(Test, id=test_id, creator=request.user)
+    file_format = request.GET.get('format', 'csv')
+    if kind not in EXPORT_KINDS or file_format not in EXPORT_FORMATS:
+        raise Http404
+    stream, content_type = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(stream(EXPORT_KINDS[kind](test)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="test_{test.id}_{kind}.{file_format}"'
+    return response